@@ -0,0 +1,137 @@
+"""
+Latency benchmark for the in-process BM25 keyword index and RRF hybrid search.
+
+Indexes synthetic chunks (Zipf-distributed vocabulary, so common terms have very long
+postings) into a BM25Index and reports indexing throughput, checkpoint and reload time, and
+p50/p95 keyword query latency with and without a source filter. Then loads a smaller set of
+chunks with embeddings into a ChromaDBAdapter and compares vector, keyword and hybrid search.
+
+Usage:
+    uv run python benchmarks/bm25_benchmark.py --chunks 1000000 --hybrid-chunks 100000
+"""
+from pathlib import Path
+import argparse
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.append(str(Path(__file__).resolve().parent.parent / "src"))
+
+from bm25_index import BM25Index
+from vector_db_adapter import ChromaDBAdapter
+
+
+def make_texts(count: int, words_per_chunk: int, vocabulary: int, rng: np.random.Generator):
+    """Build synthetic chunk texts whose word frequencies follow a Zipf distribution."""
+    words = rng.zipf(1.2, size=(count, words_per_chunk)) % vocabulary
+    return [" ".join(f"w{word}" for word in row) for row in words]
+
+
+def percentiles(samples):
+    ordered = sorted(samples)
+    return statistics.median(ordered) * 1000, ordered[int(len(ordered) * 0.95) - 1] * 1000
+
+
+def timed(fn, calls):
+    samples = []
+    for args in calls:
+        began = time.perf_counter()
+        fn(*args)
+        samples.append(time.perf_counter() - began)
+    return samples
+
+
+def report(label, samples):
+    p50, p95 = percentiles(samples)
+    print(f"{label}: p50 {p50:.1f} ms / p95 {p95:.1f} ms")
+
+
+def benchmark_index(args, sources, queries):
+    rng = np.random.default_rng(args.seed)
+    with tempfile.TemporaryDirectory() as directory:
+        index = BM25Index(directory, checkpoint_ops=args.chunks + 1)
+        began = time.perf_counter()
+        for start in range(0, args.chunks, args.batch_size):
+            count = min(args.batch_size, args.chunks - start)
+            index.add(
+                [f"chunk-{start + i}" for i in range(count)],
+                make_texts(count, args.words_per_chunk, args.vocabulary, rng),
+                [sources[(start + i) % len(sources)] for i in range(count)]
+            )
+        elapsed = time.perf_counter() - began
+        print(f"indexed {args.chunks} chunks in {elapsed:.1f} s ({args.chunks / elapsed:.0f} chunks/s)")
+
+        began = time.perf_counter()
+        index.checkpoint()
+        print(f"checkpoint: {time.perf_counter() - began:.1f} s")
+        began = time.perf_counter()
+        index.close()
+        index = BM25Index(directory)
+        print(f"reload: {time.perf_counter() - began:.1f} s")
+
+        report("keyword unfiltered", timed(index.search, [(query, args.limit) for query in queries]))
+        report("keyword filtered", timed(
+            index.search, [(query, args.limit, sources[i % len(sources)]) for i, query in enumerate(queries)]
+        ))
+        index.close()
+
+
+def benchmark_hybrid(args, sources, queries):
+    rng = np.random.default_rng(args.seed)
+    embeddings = rng.standard_normal((len(queries), args.dim), dtype=np.float32).tolist()
+    with tempfile.TemporaryDirectory() as directory:
+        adapter = ChromaDBAdapter(directory)
+        for start in range(0, args.hybrid_chunks, args.batch_size):
+            count = min(args.batch_size, args.hybrid_chunks - start)
+            vectors = rng.standard_normal((count, args.dim), dtype=np.float32)
+            texts = make_texts(count, args.words_per_chunk, args.vocabulary, rng)
+            rows = []
+            for i in range(count):
+                source = sources[(start + i) % len(sources)]
+                url = f"https://{source}/page-{(start + i) // 20}"
+                rows.append({
+                    "url": url,
+                    "chunk_number": start + i,
+                    "content": texts[i],
+                    "metadata": {"url": url, "source": source, "chunk_index": start + i},
+                    "source_id": source,
+                    "embedding": vectors[i]
+                })
+            adapter.upsert_rows(rows)
+
+        report("vector", timed(adapter.search_similar, [(embedding, args.limit) for embedding in embeddings]))
+        report("keyword", timed(adapter.keyword_search, [(query, args.limit) for query in queries]))
+        report("hybrid (RRF)", timed(
+            adapter.hybrid_search, [(query, embedding, args.limit) for query, embedding in zip(queries, embeddings)]
+        ))
+        adapter.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark BM25 keyword search and RRF hybrid search")
+    parser.add_argument("--chunks", type=int, default=1_000_000, help="Chunks in the BM25-only benchmark")
+    parser.add_argument("--hybrid-chunks", type=int, default=100_000, help="Chunks stored in ChromaDB for the hybrid benchmark (0 to skip)")
+    parser.add_argument("--words-per-chunk", type=int, default=200)
+    parser.add_argument("--vocabulary", type=int, default=200_000)
+    parser.add_argument("--sources", type=int, default=50)
+    parser.add_argument("--dim", type=int, default=1536, help="Embedding dimension")
+    parser.add_argument("--batch-size", type=int, default=5_000)
+    parser.add_argument("--queries", type=int, default=200, help="Queries per mode")
+    parser.add_argument("--limit", type=int, default=10, help="Results per query")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    sources = [f"source-{i}.example.com" for i in range(args.sources)]
+    # Three-word queries mixing common and rare terms
+    queries = make_texts(args.queries, 3, args.vocabulary, np.random.default_rng(args.seed + 1))
+
+    benchmark_index(args, sources, queries)
+    if args.hybrid_chunks:
+        benchmark_hybrid(args, sources, queries)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Insert throughput benchmark for the ChromaDB adapter.
+
+Writes synthetic chunks with random embeddings into a temporary ChromaDB directory and
+reports rows per second for each write concurrency, then re-writes the same chunks to
+check that upserts with deterministic IDs do not grow the collection.
+
+Usage:
+    uv run python benchmarks/chroma_insert_benchmark.py --chunks 100000 --concurrency 1 4
+"""
+from pathlib import Path
+import argparse
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.append(str(Path(__file__).resolve().parent.parent / "src"))
+
+from vector_db_adapter import ChromaDBAdapter
+
+
+def make_rows(start: int, count: int, dim: int, rng: np.random.Generator):
+    """Build synthetic crawled_pages rows for chunk numbers start..start+count."""
+    embeddings = rng.standard_normal((count, dim), dtype=np.float32)
+    embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+    rows = []
+    for i in range(count):
+        chunk_number = start + i
+        url = f"https://bench.example.com/page-{chunk_number // 20}"
+        rows.append({
+            "url": url,
+            "chunk_number": chunk_number,
+            "content": f"Synthetic chunk {chunk_number} " + "lorem ipsum " * 80,
+            "metadata": {"url": url, "source": "bench.example.com", "chunk_index": chunk_number},
+            "source_id": "bench.example.com",
+            "embedding": embeddings[i]
+        })
+    return rows
+
+
+def run(adapter: ChromaDBAdapter, chunks: int, dim: int, write_size: int, seed: int) -> float:
+    """Insert all chunks in calls of write_size rows and return rows per second."""
+    rng = np.random.default_rng(seed)
+    elapsed = 0.0
+    for start in range(0, chunks, write_size):
+        rows = make_rows(start, min(write_size, chunks - start), dim, rng)
+        began = time.perf_counter()
+        adapter.upsert_rows(rows)
+        elapsed += time.perf_counter() - began
+    return chunks / elapsed if elapsed else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark ChromaDB adapter insert throughput")
+    parser.add_argument("--chunks", type=int, default=100_000, help="Number of chunks to insert")
+    parser.add_argument("--dim", type=int, default=1536, help="Embedding dimension")
+    parser.add_argument("--write-size", type=int, default=10_000, help="Rows passed to each upsert_rows call")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4], help="Write concurrencies to compare")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    for concurrency in args.concurrency:
+        with tempfile.TemporaryDirectory() as directory:
+            adapter = ChromaDBAdapter(directory, write_concurrency=concurrency)
+            insert_rate = run(adapter, args.chunks, args.dim, args.write_size, args.seed)
+            rewrite_rate = run(adapter, args.chunks, args.dim, args.write_size, args.seed)
+            count = adapter.collection.count()
+            print(
+                f"concurrency={concurrency} max_batch_size={adapter.max_batch_size}: "
+                f"insert {insert_rate:,.0f} rows/s, re-upsert {rewrite_rate:,.0f} rows/s, "
+                f"collection size {count:,} (expected {args.chunks:,})"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Query latency benchmark for ChromaDB per-source sharding.
+
+Loads the same synthetic chunks, spread over a number of sources, into an unsharded and a
+sharded ChromaDBAdapter and reports p50/p95 latency of source-filtered and unfiltered
+searches for each. With sharding, filtered latency should stay flat as sources are added.
+
+Usage:
+    uv run python benchmarks/chroma_shard_query_benchmark.py --sources 50 --chunks-per-source 2000
+"""
+from pathlib import Path
+import argparse
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.append(str(Path(__file__).resolve().parent.parent / "src"))
+
+from vector_db_adapter import ChromaDBAdapter
+
+
+def make_rows(source: str, count: int, dim: int, rng: np.random.Generator):
+    """Build synthetic crawled_pages rows for one source."""
+    embeddings = rng.standard_normal((count, dim), dtype=np.float32)
+    embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+    rows = []
+    for i in range(count):
+        url = f"https://{source}/page-{i // 20}"
+        rows.append({
+            "url": url,
+            "chunk_number": i,
+            "content": f"Synthetic chunk {i} of {source}",
+            "metadata": {"url": url, "source": source, "chunk_index": i},
+            "source_id": source,
+            "embedding": embeddings[i]
+        })
+    return rows
+
+
+def percentiles(samples):
+    ordered = sorted(samples)
+    return statistics.median(ordered) * 1000, ordered[int(len(ordered) * 0.95) - 1] * 1000
+
+
+def measure(adapter: ChromaDBAdapter, queries: np.ndarray, sources, limit: int):
+    """Return (filtered, unfiltered) latency samples in seconds."""
+    filtered, unfiltered = [], []
+    for i, query in enumerate(queries):
+        began = time.perf_counter()
+        adapter.search_similar(query.tolist(), limit, source_filter=sources[i % len(sources)])
+        filtered.append(time.perf_counter() - began)
+        began = time.perf_counter()
+        adapter.search_similar(query.tolist(), limit)
+        unfiltered.append(time.perf_counter() - began)
+    return filtered, unfiltered
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark ChromaDB filtered search with and without source sharding")
+    parser.add_argument("--sources", type=int, default=50, help="Number of sources")
+    parser.add_argument("--chunks-per-source", type=int, default=2_000, help="Chunks stored per source")
+    parser.add_argument("--dim", type=int, default=1536, help="Embedding dimension")
+    parser.add_argument("--queries", type=int, default=200, help="Queries per mode")
+    parser.add_argument("--limit", type=int, default=10, help="Results per query")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    sources = [f"source-{i}.example.com" for i in range(args.sources)]
+    queries = np.random.default_rng(args.seed + 1).standard_normal((args.queries, args.dim), dtype=np.float32)
+
+    for shard_by_source in (False, True):
+        with tempfile.TemporaryDirectory() as directory:
+            adapter = ChromaDBAdapter(directory, shard_by_source=shard_by_source)
+            rng = np.random.default_rng(args.seed)
+            for source in sources:
+                adapter.upsert_rows(make_rows(source, args.chunks_per_source, args.dim, rng))
+            filtered, unfiltered = measure(adapter, queries, sources, args.limit)
+            adapter.close()
+            label = "sharded" if shard_by_source else "unsharded"
+            print(
+                f"{label}: filtered p50 {percentiles(filtered)[0]:.1f} ms / p95 {percentiles(filtered)[1]:.1f} ms, "
+                f"unfiltered p50 {percentiles(unfiltered)[0]:.1f} ms / p95 {percentiles(unfiltered)[1]:.1f} ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+-- Upgrade a database created with an earlier version of crawled_pages.sql in place.
+-- Unlike crawled_pages.sql this script drops nothing and can be run any number of times.
+
+-- Source statistics maintained incrementally by apply_source_updates
+alter table sources add column if not exists chunk_count integer not null default 0;
+alter table sources add column if not exists code_example_count integer not null default 0;
+
+-- Create an index on the normalized code hash for deduplicating code examples across pages
+create index if not exists idx_code_examples_code_hash on code_examples ((metadata->>'code_hash'));
+
+-- Bulk-upsert sources from one ingestion: updates maps source_id to an optional "summary" and
+-- deltas of "chunk_count", "code_example_count" and "total_word_count" added to the stored counts
+create or replace function apply_source_updates(updates jsonb)
+returns void
+language sql
+as $$
+  insert into sources (source_id, summary, total_word_count, chunk_count, code_example_count)
+  select
+    key,
+    value->>'summary',
+    greatest(0, coalesce((value->>'total_word_count')::integer, 0)),
+    greatest(0, coalesce((value->>'chunk_count')::integer, 0)),
+    greatest(0, coalesce((value->>'code_example_count')::integer, 0))
+  from jsonb_each(updates)
+  on conflict (source_id) do update set
+    summary = coalesce(excluded.summary, sources.summary),
+    total_word_count = greatest(0, sources.total_word_count + coalesce((updates->excluded.source_id->>'total_word_count')::integer, 0)),
+    chunk_count = greatest(0, sources.chunk_count + coalesce((updates->excluded.source_id->>'chunk_count')::integer, 0)),
+    code_example_count = greatest(0, sources.code_example_count + coalesce((updates->excluded.source_id->>'code_example_count')::integer, 0)),
+    updated_at = timezone('utc'::text, now());
+$$;
+
+-- Recompute source statistics from the stored rows (all sources when source_ids is null),
+-- aggregating server-side with the source_id indexes
+create or replace function recompute_source_stats(source_ids text[] default null)
+returns void
+language sql
+as $$
+  update sources
+  set
+    chunk_count = coalesce(pages.chunk_count, 0),
+    total_word_count = coalesce(pages.word_count, 0),
+    code_example_count = coalesce(code.code_example_count, 0),
+    updated_at = timezone('utc'::text, now())
+  from sources as selected
+  left join (
+    select source_id, count(*) as chunk_count, sum((metadata->>'word_count')::integer) as word_count
+    from crawled_pages
+    where source_ids is null or source_id = any(source_ids)
+    group by source_id
+  ) as pages on pages.source_id = selected.source_id
+  left join (
+    select source_id, count(*) as code_example_count
+    from code_examples
+    where source_ids is null or source_id = any(source_ids)
+    group by source_id
+  ) as code on code.source_id = selected.source_id
+  where sources.source_id = selected.source_id
+    and (source_ids is null or selected.source_id = any(source_ids));
+$$;
+
+-- Full-text search vectors and their GIN indexes for keyword and hybrid search
+alter table crawled_pages add column if not exists fts tsvector generated always as (to_tsvector('english', content)) stored;
+alter table code_examples add column if not exists fts tsvector generated always as (to_tsvector('english', content || ' ' || summary)) stored;
+create index if not exists idx_crawled_pages_fts on crawled_pages using gin (fts);
+create index if not exists idx_code_examples_fts on code_examples using gin (fts);
+
+-- Hybrid search for crawled_pages in one call: the top match_count * 2 rows by vector distance and by
+-- full-text rank (GIN-indexed fts column, websearch syntax) are fused with reciprocal rank fusion
+create or replace function hybrid_search_crawled_pages (
+  query_text text,
+  query_embedding vector(1536),
+  match_count int default 10,
+  source_filter text default null,
+  rrf_k int default 60
+) returns table (
+  id bigint,
+  url varchar,
+  chunk_number integer,
+  content text,
+  metadata jsonb,
+  source_id text,
+  similarity float,
+  rrf_score float
+)
+language sql stable
+as $$
+  with semantic as (
+    select id, row_number() over (order by embedding <=> query_embedding) as rank_ix
+    from crawled_pages
+    where source_filter is null or source_id = source_filter
+    order by embedding <=> query_embedding
+    limit match_count * 2
+  ),
+  keyword as (
+    select id, row_number() over (order by ts_rank_cd(fts, websearch_to_tsquery('english', query_text)) desc) as rank_ix
+    from crawled_pages
+    where fts @@ websearch_to_tsquery('english', query_text)
+      and (source_filter is null or source_id = source_filter)
+    order by ts_rank_cd(fts, websearch_to_tsquery('english', query_text)) desc
+    limit match_count * 2
+  )
+  select
+    t.id,
+    t.url,
+    t.chunk_number,
+    t.content,
+    t.metadata,
+    t.source_id,
+    1 - (t.embedding <=> query_embedding) as similarity,
+    coalesce(1.0 / (rrf_k + semantic.rank_ix), 0.0) + coalesce(1.0 / (rrf_k + keyword.rank_ix), 0.0) as rrf_score
+  from semantic
+  full outer join keyword on semantic.id = keyword.id
+  join crawled_pages t on t.id = coalesce(semantic.id, keyword.id)
+  order by rrf_score desc
+  limit match_count;
+$$;
+
+-- Hybrid search for code_examples in one call: the top match_count * 2 rows by vector distance and by
+-- full-text rank (GIN-indexed fts column, websearch syntax) are fused with reciprocal rank fusion
+create or replace function hybrid_search_code_examples (
+  query_text text,
+  query_embedding vector(1536),
+  match_count int default 10,
+  source_filter text default null,
+  rrf_k int default 60
+) returns table (
+  id bigint,
+  url varchar,
+  chunk_number integer,
+  content text,
+  summary text,
+  metadata jsonb,
+  source_id text,
+  similarity float,
+  rrf_score float
+)
+language sql stable
+as $$
+  with semantic as (
+    select id, row_number() over (order by embedding <=> query_embedding) as rank_ix
+    from code_examples
+    where source_filter is null or source_id = source_filter
+    order by embedding <=> query_embedding
+    limit match_count * 2
+  ),
+  keyword as (
+    select id, row_number() over (order by ts_rank_cd(fts, websearch_to_tsquery('english', query_text)) desc) as rank_ix
+    from code_examples
+    where fts @@ websearch_to_tsquery('english', query_text)
+      and (source_filter is null or source_id = source_filter)
+    order by ts_rank_cd(fts, websearch_to_tsquery('english', query_text)) desc
+    limit match_count * 2
+  )
+  select
+    t.id,
+    t.url,
+    t.chunk_number,
+    t.content,
+    t.summary,
+    t.metadata,
+    t.source_id,
+    1 - (t.embedding <=> query_embedding) as similarity,
+    coalesce(1.0 / (rrf_k + semantic.rank_ix), 0.0) + coalesce(1.0 / (rrf_k + keyword.rank_ix), 0.0) as rrf_score
+  from semantic
+  full outer join keyword on semantic.id = keyword.id
+  join code_examples t on t.id = coalesce(semantic.id, keyword.id)
+  order by rrf_score desc
+  limit match_count;
+$$;
+
+-- Fill the counters of the existing sources from the stored rows
+select recompute_source_stats();
@@ -0,0 +1,98 @@
+"""
+Non-blocking storage layer for the MCP server.
+
+Vector database clients (supabase-py, ChromaDB) are synchronous and their retries back off
+with time.sleep, so calling them from an async tool handler freezes every other client of
+the server. Storage calls instead run on two dedicated, long-lived pools: a write pool used
+by ingestion and a separate read pool, so searches stay responsive while large ingestions
+saturate the writers. Threads of a pool share the adapter's client and its pooled HTTP
+connections.
+"""
+from typing import Any, Callable
+import functools
+import logging
+import os
+import threading
+
+from enrichment_pool import EnrichmentPool
+from vector_db_adapter import VectorDBAdapter
+
+logger = logging.getLogger(__name__)
+
+# Adapter methods that only read and are routed to the read pool
+READ_METHODS = {
+    "search_similar",
+    "keyword_search",
+    "hybrid_search",
+    "get_sources",
+    "list_sources",
+    "get_rows_by_url",
+    "find_code_examples_by_hash"
+}
+
+_storage_pools = {}
+_storage_pools_lock = threading.Lock()
+
+
+def _get_pool(name: str, env_var: str, default: str) -> EnrichmentPool:
+    with _storage_pools_lock:
+        if name not in _storage_pools:
+            max_workers = max(1, int(os.getenv(env_var, default)))
+            _storage_pools[name] = EnrichmentPool(max_workers=max_workers, name=name)
+        return _storage_pools[name]
+
+
+def get_storage_write_pool() -> EnrichmentPool:
+    """Return the shared storage write pool, sized by STORAGE_WRITE_CONCURRENCY (default: 4)."""
+    return _get_pool("storage-write", "STORAGE_WRITE_CONCURRENCY", "4")
+
+
+def get_storage_read_pool() -> EnrichmentPool:
+    """Return the shared storage read pool, sized by STORAGE_READ_CONCURRENCY (default: 8)."""
+    return _get_pool("storage-read", "STORAGE_READ_CONCURRENCY", "8")
+
+
+def shutdown_storage_pools(wait: bool = True) -> None:
+    """Shut down the storage pools that were started."""
+    with _storage_pools_lock:
+        for pool in _storage_pools.values():
+            pool.shutdown(wait=wait)
+        _storage_pools.clear()
+
+
+class AsyncVectorDB:
+    """
+    Async facade over a VectorDBAdapter.
+
+    Every adapter method is available as a coroutine (e.g. ``await storage.list_sources()``)
+    that runs on the read pool for READ_METHODS and on the write pool otherwise. read() and
+    write() run arbitrary blocking storage helpers on the corresponding pool.
+    """
+
+    def __init__(self, adapter: VectorDBAdapter):
+        self.adapter = adapter
+
+    async def read(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """Run a blocking read on the storage read pool."""
+        return await get_storage_read_pool().run(functools.partial(fn, *args, **kwargs))
+
+    async def write(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """Run a blocking write on the storage write pool."""
+        return await get_storage_write_pool().run(functools.partial(fn, *args, **kwargs))
+
+    def __getattr__(self, name: str) -> Callable[..., Any]:
+        method = getattr(self.adapter, name)
+        if not callable(method):
+            return method
+        run = self.read if name in READ_METHODS else self.write
+
+        async def call(*args: Any, **kwargs: Any) -> Any:
+            return await run(method, *args, **kwargs)
+
+        call.__name__ = name
+        return call
+
+
+def submit_write(fn: Callable[..., Any], *args: Any, **kwargs: Any):
+    """Schedule a blocking write on the storage write pool from synchronous code and return its future."""
+    return get_storage_write_pool().submit(functools.partial(fn, *args, **kwargs))
@@ -0,0 +1,557 @@
+"""
+Offline bulk ingestion through batch job files.
+
+Large first-time ingestions do not need interactive latency, so instead of live chat and
+embedding calls every request for a crawl is written to a JSONL batch job file, submitted
+through a pluggable batch backend and ingested into storage once the results are back.
+A job goes through three phases, each persisted in its job directory:
+
+1. enriching: contextual embeddings, code example summaries and source summaries
+2. embedding: embeddings for the (contextual) chunks and the code examples
+3. ready: all results are available and the rows can be written to storage
+"""
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, List, Optional
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+
+import openai
+
+from utils import (
+    add_code_example_references,
+    add_code_examples_to_vector_db,
+    add_documents_to_vector_db,
+    build_batched_context_request,
+    parse_batched_contexts,
+    build_code_summary_request,
+    build_source_summary_request,
+    create_embeddings_batch,
+    match_stored_code_examples
+)
+from vector_db_adapter import VectorDBAdapter
+
+logger = logging.getLogger(__name__)
+
+CHAT_ENDPOINT = "/v1/chat/completions"
+EMBEDDING_ENDPOINT = "/v1/embeddings"
+EMBEDDING_MODEL = "text-embedding-3-small"
+EMBEDDING_INPUTS_PER_REQUEST = 100
+# Rows per write when a finished job is ingested
+INGEST_BATCH_SIZE = 500
+
+
+class BatchBackend(ABC):
+    """Abstract base class for batch job backends"""
+
+    name = "abstract"
+
+    @abstractmethod
+    def submit(self, requests_path: str, endpoint: str) -> str:
+        """Submit a JSONL request file and return the backend batch id"""
+        pass
+
+    @abstractmethod
+    def status(self, batch_id: str) -> str:
+        """Return "in_progress", "completed" or "failed" for a submitted batch"""
+        pass
+
+    @abstractmethod
+    def download_results(self, batch_id: str, output_path: str) -> None:
+        """Write the JSONL results of a completed batch to output_path"""
+        pass
+
+
+class OpenAIBatchBackend(BatchBackend):
+    """Batch backend using the OpenAI Batch API"""
+
+    name = "openai"
+
+    def submit(self, requests_path: str, endpoint: str) -> str:
+        with open(requests_path, "rb") as f:
+            batch_file = openai.files.create(file=f, purpose="batch")
+        batch = openai.batches.create(
+            input_file_id=batch_file.id,
+            endpoint=endpoint,
+            completion_window="24h"
+        )
+        logger.info(f"Submitted OpenAI batch {batch.id} for {requests_path}")
+        return batch.id
+
+    def status(self, batch_id: str) -> str:
+        batch = openai.batches.retrieve(batch_id)
+        if batch.status == "completed":
+            return "completed"
+        if batch.status in ("failed", "expired", "cancelled"):
+            return "failed"
+        return "in_progress"
+
+    def download_results(self, batch_id: str, output_path: str) -> None:
+        batch = openai.batches.retrieve(batch_id)
+        if not batch.output_file_id:
+            # Every request failed; the job falls back to live calls for missing results
+            open(output_path, "w").close()
+            return
+        openai.files.content(batch.output_file_id).write_to_file(output_path)
+
+
+def _call_openai(endpoint: str, body: Dict[str, Any]) -> Dict[str, Any]:
+    """Execute a single batch request against the live OpenAI API."""
+    if endpoint == EMBEDDING_ENDPOINT:
+        return openai.embeddings.create(**body).model_dump()
+    return openai.chat.completions.create(**body).model_dump()
+
+
+class LocalBatchBackend(BatchBackend):
+    """
+    File-based stand-in for a batch API, for testing and for deployments without one.
+
+    Requests are executed by a handler (live OpenAI calls by default) on a background thread
+    and results are written in the same JSONL format as the OpenAI Batch API.
+    """
+
+    name = "local"
+
+    def __init__(
+        self,
+        directory: str = "./data/batch_jobs/local_backend",
+        handler: Optional[Callable[[str, Dict[str, Any]], Dict[str, Any]]] = None,
+        background: bool = True
+    ):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.handler = handler or _call_openai
+        self.background = background
+
+    def _output_path(self, batch_id: str) -> str:
+        return os.path.join(self.directory, f"{batch_id}.output.jsonl")
+
+    def _status_path(self, batch_id: str) -> str:
+        return os.path.join(self.directory, f"{batch_id}.status")
+
+    def submit(self, requests_path: str, endpoint: str) -> str:
+        batch_id = f"local_{uuid.uuid4().hex}"
+        if self.background:
+            threading.Thread(target=self._run, args=(batch_id, requests_path), daemon=True).start()
+        else:
+            self._run(batch_id, requests_path)
+        return batch_id
+
+    def _run(self, batch_id: str, requests_path: str) -> None:
+        tmp_path = self._output_path(batch_id) + ".tmp"
+        try:
+            with open(requests_path, "r", encoding="utf-8") as src, open(tmp_path, "w", encoding="utf-8") as dst:
+                for line in src:
+                    if not line.strip():
+                        continue
+                    request = json.loads(line)
+                    output = {"id": f"{batch_id}_{request['custom_id']}", "custom_id": request["custom_id"]}
+                    try:
+                        body = self.handler(request["url"], request["body"])
+                        output.update({"response": {"status_code": 200, "body": body}, "error": None})
+                    except Exception as e:
+                        output.update({"response": None, "error": {"message": str(e)}})
+                    dst.write(json.dumps(output) + "\n")
+            os.replace(tmp_path, self._output_path(batch_id))
+            status = "completed"
+        except Exception as e:
+            logger.error(f"Local batch {batch_id} failed: {e}")
+            status = "failed"
+        with open(self._status_path(batch_id), "w") as f:
+            f.write(status)
+
+    def status(self, batch_id: str) -> str:
+        try:
+            with open(self._status_path(batch_id)) as f:
+                return f.read().strip()
+        except FileNotFoundError:
+            return "in_progress"
+
+    def download_results(self, batch_id: str, output_path: str) -> None:
+        os.replace(self._output_path(batch_id), output_path)
+
+
+def get_batch_backend() -> BatchBackend:
+    """Factory function to get the batch backend selected by BULK_BATCH_BACKEND"""
+    backend_type = os.getenv("BULK_BATCH_BACKEND", "openai").lower()
+
+    if backend_type == "openai":
+        return OpenAIBatchBackend()
+    elif backend_type == "local":
+        return LocalBatchBackend(os.path.join(get_jobs_directory(), "local_backend"))
+    else:
+        raise ValueError(f"Unsupported batch backend: {backend_type}")
+
+
+def get_jobs_directory() -> str:
+    """Return the directory holding bulk ingestion jobs"""
+    return os.getenv("BULK_JOBS_DIRECTORY", "./data/batch_jobs")
+
+
+def _write_jsonl(path: str, items: List[Dict[str, Any]]) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        for item in items:
+            f.write(json.dumps(item) + "\n")
+
+
+def _read_jsonl(path: str) -> List[Dict[str, Any]]:
+    if not os.path.exists(path):
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def _write_json(path: str, data: Any) -> None:
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+def _read_json(path: str) -> Any:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _batch_request(custom_id: str, endpoint: str, body: Dict[str, Any]) -> Dict[str, Any]:
+    return {"custom_id": custom_id, "method": "POST", "url": endpoint, "body": body}
+
+
+def _successful_bodies(results_path: str) -> Dict[str, Dict[str, Any]]:
+    """Map custom_id to response body for every successful request in a results file."""
+    bodies = {}
+    for result in _read_jsonl(results_path):
+        response = result.get("response") or {}
+        if response.get("status_code") == 200 and response.get("body"):
+            bodies[result["custom_id"]] = response["body"]
+        else:
+            logger.warning(f"Batch request {result.get('custom_id')} failed: {result.get('error')}")
+    return bodies
+
+
+def _message_content(body: Dict[str, Any]) -> str:
+    return body["choices"][0]["message"]["content"].strip()
+
+
+def create_bulk_job(
+    urls: List[str],
+    chunk_numbers: List[int],
+    contents: List[str],
+    metadatas: List[Dict[str, Any]],
+    url_to_full_document: Dict[str, str],
+    source_content_map: Dict[str, str],
+    source_word_counts: Dict[str, int],
+    code_examples: List[Dict[str, Any]],
+    backend: BatchBackend,
+    jobs_directory: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Write the enrichment batch file for a crawl and submit it.
+
+    Args:
+        urls: List of URLs, one per chunk
+        chunk_numbers: List of chunk numbers
+        contents: List of chunk contents
+        metadatas: List of chunk metadata
+        url_to_full_document: Dictionary mapping URLs to their full document content
+        source_content_map: Dictionary mapping source IDs to the content used for their summary
+        source_word_counts: Dictionary mapping source IDs to their word counts
+        code_examples: List of dicts with url, chunk_number, code, context_before, context_after and metadata
+        backend: Batch backend to submit the job to
+        jobs_directory: Directory holding bulk ingestion jobs
+
+    Returns:
+        The job state
+    """
+    job_id = f"bulk_{time.strftime('%Y%m%d%H%M%S')}_{uuid.uuid4().hex[:8]}"
+    job_dir = os.path.join(jobs_directory or get_jobs_directory(), job_id)
+    os.makedirs(job_dir, exist_ok=True)
+
+    model_choice = os.getenv("MODEL_CHOICE")
+    use_contextual_embeddings = os.getenv("USE_CONTEXTUAL_EMBEDDINGS", "false") == "true"
+    max_chunks_per_call = max(1, int(os.getenv("CONTEXTUAL_EMBEDDING_BATCH_SIZE", "10")))
+
+    _write_jsonl(os.path.join(job_dir, "chunks.jsonl"), [
+        {"url": url, "chunk_number": chunk_number, "content": content, "metadata": metadata}
+        for url, chunk_number, content, metadata in zip(urls, chunk_numbers, contents, metadatas)
+    ])
+    _write_jsonl(os.path.join(job_dir, "code_examples.jsonl"), code_examples)
+    sources = [
+        {"source_id": source_id, "word_count": source_word_counts.get(source_id, 0)}
+        for source_id in source_content_map
+    ]
+    _write_json(os.path.join(job_dir, "sources.json"), sources)
+
+    requests = []
+
+    # Contextual embeddings, one request per group of chunks of the same document
+    context_groups = []
+    if use_contextual_embeddings:
+        url_to_indices: Dict[str, List[int]] = {}
+        for idx, url in enumerate(urls):
+            url_to_indices.setdefault(url, []).append(idx)
+        for url, indices in url_to_indices.items():
+            document = url_to_full_document.get(url, "")[:25000]
+            for start in range(0, len(indices), max_chunks_per_call):
+                group = indices[start:start + max_chunks_per_call]
+                body = build_batched_context_request(model_choice, document, [contents[idx] for idx in group])
+                requests.append(_batch_request(f"context-{len(context_groups)}", CHAT_ENDPOINT, body))
+                context_groups.append(group)
+    _write_json(os.path.join(job_dir, "context_groups.json"), context_groups)
+
+    for i, example in enumerate(code_examples):
+        body = build_code_summary_request(model_choice, example["code"], example["context_before"], example["context_after"])
+        requests.append(_batch_request(f"code-{i}", CHAT_ENDPOINT, body))
+
+    for i, (source_id, content) in enumerate(source_content_map.items()):
+        if content and content.strip():
+            body = build_source_summary_request(model_choice, source_id, content[:25000])
+            requests.append(_batch_request(f"source-{i}", CHAT_ENDPOINT, body))
+
+    requests_path = os.path.join(job_dir, "enrichment_requests.jsonl")
+    _write_jsonl(requests_path, requests)
+
+    job = {
+        "job_id": job_id,
+        "status": "enriching",
+        "backend": backend.name,
+        "created_at": time.time(),
+        "updated_at": time.time(),
+        "enrichment_batch_id": backend.submit(requests_path, CHAT_ENDPOINT) if requests else None,
+        "embedding_batch_id": None,
+        "counts": {
+            "chunks": len(contents),
+            "code_examples": len(code_examples),
+            "sources": len(sources),
+            "enrichment_requests": len(requests)
+        }
+    }
+    _write_json(os.path.join(job_dir, "job.json"), job)
+    logger.info(f"Created bulk ingestion job {job_id} with {len(requests)} enrichment requests")
+    return job
+
+
+def _finish_enrichment(job_dir: str, backend: BatchBackend, job: Dict[str, Any]) -> None:
+    """Collect enrichment results, then write and submit the embedding batch file."""
+    chunks = _read_jsonl(os.path.join(job_dir, "chunks.jsonl"))
+    code_examples = _read_jsonl(os.path.join(job_dir, "code_examples.jsonl"))
+    sources = _read_json(os.path.join(job_dir, "sources.json"))
+    context_groups = _read_json(os.path.join(job_dir, "context_groups.json"))
+
+    bodies = {}
+    if job["enrichment_batch_id"]:
+        results_path = os.path.join(job_dir, "enrichment_results.jsonl")
+        # Kept from an earlier attempt; the local backend moves its output file on download
+        if not os.path.exists(results_path):
+            backend.download_results(job["enrichment_batch_id"], results_path)
+        bodies = _successful_bodies(results_path)
+
+    # Chunks whose context is missing are embedded without context, like a failed live call
+    contexts: Dict[int, str] = {}
+    for g, group in enumerate(context_groups):
+        body = bodies.get(f"context-{g}")
+        if not body:
+            continue
+        try:
+            answered = parse_batched_contexts(_message_content(body), len(group))
+        except Exception as e:
+            logger.warning(f"Could not parse contexts for group {g}: {e}")
+            continue
+        for n, context in answered.items():
+            contexts[group[n]] = context
+
+    code_summaries = []
+    for i in range(len(code_examples)):
+        body = bodies.get(f"code-{i}")
+        code_summaries.append(_message_content(body) if body else "Code example for demonstration purposes.")
+
+    source_summaries = {}
+    for i, source in enumerate(sources):
+        body = bodies.get(f"source-{i}")
+        summary = _message_content(body) if body else f"Content from {source['source_id']}"
+        if len(summary) > 500:
+            summary = summary[:500] + "..."
+        source_summaries[source["source_id"]] = summary
+
+    _write_json(os.path.join(job_dir, "enrichment.json"), {
+        "contexts": {str(idx): context for idx, context in contexts.items()},
+        "code_summaries": code_summaries,
+        "source_summaries": source_summaries
+    })
+
+    # Embedding requests for the contextual chunks and the code examples
+    chunk_texts = [
+        f"{contexts[idx]}\n---\n{chunk['content']}" if idx in contexts else chunk["content"]
+        for idx, chunk in enumerate(chunks)
+    ]
+    code_texts = [
+        f"{example['code']}\n\nSummary: {summary}"
+        for example, summary in zip(code_examples, code_summaries)
+    ]
+
+    requests = []
+    for prefix, texts in (("doc", chunk_texts), ("code", code_texts)):
+        for start in range(0, len(texts), EMBEDDING_INPUTS_PER_REQUEST):
+            body = {"model": EMBEDDING_MODEL, "input": texts[start:start + EMBEDDING_INPUTS_PER_REQUEST]}
+            requests.append(_batch_request(f"emb-{prefix}-{start}", EMBEDDING_ENDPOINT, body))
+
+    requests_path = os.path.join(job_dir, "embedding_requests.jsonl")
+    _write_jsonl(requests_path, requests)
+    job["embedding_batch_id"] = backend.submit(requests_path, EMBEDDING_ENDPOINT) if requests else None
+    job["counts"]["embedding_requests"] = len(requests)
+    job["counts"]["contexts_generated"] = len(contexts)
+    job["status"] = "embedding"
+
+
+def _collect_embeddings(bodies: Dict[str, Dict[str, Any]], prefix: str, texts: List[str]) -> List[List[float]]:
+    """Assemble embeddings from batch results, creating missing ones with live calls."""
+    embeddings: List[Optional[List[float]]] = [None] * len(texts)
+    for start in range(0, len(texts), EMBEDDING_INPUTS_PER_REQUEST):
+        body = bodies.get(f"emb-{prefix}-{start}")
+        if not body:
+            continue
+        for item in body.get("data", []):
+            embeddings[start + item["index"]] = item["embedding"]
+
+    missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+    if missing:
+        logger.warning(f"{len(missing)} {prefix} embeddings missing from batch results, creating them live")
+        for i, embedding in zip(missing, create_embeddings_batch([texts[i] for i in missing])):
+            embeddings[i] = embedding
+    return embeddings
+
+
+def _ingest(job_dir: str, backend: BatchBackend, job: Dict[str, Any], vector_db: VectorDBAdapter) -> None:
+    """Write the enriched and embedded rows of a finished job to storage."""
+    chunks = _read_jsonl(os.path.join(job_dir, "chunks.jsonl"))
+    code_examples = _read_jsonl(os.path.join(job_dir, "code_examples.jsonl"))
+    enrichment = _read_json(os.path.join(job_dir, "enrichment.json"))
+    contexts = {int(idx): context for idx, context in enrichment["contexts"].items()}
+
+    bodies = {}
+    if job["embedding_batch_id"]:
+        results_path = os.path.join(job_dir, "embedding_results.jsonl")
+        if not os.path.exists(results_path):
+            backend.download_results(job["embedding_batch_id"], results_path)
+        bodies = _successful_bodies(results_path)
+
+    chunk_texts = [
+        f"{contexts[idx]}\n---\n{chunk['content']}" if idx in contexts else chunk["content"]
+        for idx, chunk in enumerate(chunks)
+    ]
+    code_texts = [
+        f"{example['code']}\n\nSummary: {summary}"
+        for example, summary in zip(code_examples, enrichment["code_summaries"])
+    ]
+    chunk_embeddings = _collect_embeddings(bodies, "doc", chunk_texts)
+    code_embeddings = _collect_embeddings(bodies, "code", code_texts)
+
+    # Written through the same diff as live crawls: unchanged rows are skipped, vanished ones
+    # deleted, and source counts only move once the writes succeeded, so a retry after a
+    # partial failure picks up where it stopped
+    metadatas = [dict(chunk["metadata"]) for chunk in chunks]
+    for idx in contexts:
+        metadatas[idx]["contextual_embedding"] = True
+    chunk_stats = add_documents_to_vector_db(
+        vector_db,
+        [chunk["url"] for chunk in chunks],
+        [chunk["chunk_number"] for chunk in chunks],
+        [chunk["content"] for chunk in chunks],
+        metadatas,
+        {},
+        batch_size=INGEST_BATCH_SIZE,
+        source_summaries=enrichment["source_summaries"],
+        contextual_contents=chunk_texts,
+        embeddings=chunk_embeddings
+    )
+
+    # Code examples already stored for pages outside this job only get references
+    crawled_urls = {chunk["url"] for chunk in chunks} | {example["url"] for example in code_examples}
+    matches = [
+        {"url": example["url"], "code_hash": example["metadata"]["code_hash"], "references": example["metadata"].get("references", []), "index": i}
+        for i, example in enumerate(code_examples)
+    ]
+    kept, reference_only = match_stored_code_examples(vector_db, matches, crawled_urls) if matches else ([], [])
+    for row, urls in reference_only:
+        add_code_example_references(vector_db, row, urls)
+    indices = [match["index"] for match, _ in kept]
+    code_stats = add_code_examples_to_vector_db(
+        vector_db,
+        [match["url"] for match, _ in kept],
+        [code_examples[i]["chunk_number"] for i in indices],
+        [code_examples[i]["code"] for i in indices],
+        [enrichment["code_summaries"][i] for i in indices],
+        [
+            {**code_examples[i]["metadata"], "url": match["url"], "references": match["references"]}
+            for i, (match, _) in zip(indices, kept)
+        ],
+        batch_size=INGEST_BATCH_SIZE,
+        embeddings=[code_embeddings[i] for i in indices]
+    )
+
+    job["counts"]["chunks_stored"] = chunk_stats["upserted"]
+    job["counts"]["chunks_unchanged"] = chunk_stats["unchanged"]
+    job["counts"]["chunks_deleted"] = chunk_stats["deleted"]
+    job["counts"]["code_examples_stored"] = code_stats["upserted"]
+    job["counts"]["code_examples_unchanged"] = code_stats["unchanged"]
+    job["counts"]["code_examples_deleted"] = code_stats["deleted"]
+    job["counts"]["code_example_references"] = len(reference_only)
+    job["status"] = "completed"
+
+
+def advance_bulk_job(
+    job_id: str,
+    backend: BatchBackend,
+    vector_db: VectorDBAdapter,
+    jobs_directory: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Move a bulk ingestion job forward as far as its batch results allow.
+
+    Args:
+        job_id: The job ID returned by create_bulk_job
+        backend: Batch backend the job was submitted to
+        vector_db: Vector database adapter used for the final ingestion
+        jobs_directory: Directory holding bulk ingestion jobs
+
+    Returns:
+        The job state
+    """
+    job_dir = os.path.join(jobs_directory or get_jobs_directory(), job_id)
+    job_path = os.path.join(job_dir, "job.json")
+    if not os.path.exists(job_path):
+        raise ValueError(f"Unknown bulk ingestion job: {job_id}")
+    job = _read_json(job_path)
+    if job["backend"] != backend.name:
+        raise ValueError(f"Job {job_id} was submitted to the '{job['backend']}' backend, not '{backend.name}'")
+
+    # Errors from a previous attempt are retried on this call
+    job.pop("error", None)
+    
+    try:
+        for phase, batch_key in (("enriching", "enrichment_batch_id"), ("embedding", "embedding_batch_id")):
+            if job["status"] != phase:
+                continue
+            status = backend.status(job[batch_key]) if job[batch_key] else "completed"
+            if status == "failed":
+                job["status"] = "failed"
+                job["failure"] = f"Batch {job[batch_key]} failed during the {phase} phase"
+            elif status == "completed":
+                if phase == "enriching":
+                    _finish_enrichment(job_dir, backend, job)
+                else:
+                    job["status"] = "ready"
+            _write_json(job_path, job)
+
+        if job["status"] == "ready":
+            _ingest(job_dir, backend, job, vector_db)
+    except Exception as e:
+        logger.error(f"Error advancing bulk ingestion job {job_id}: {e}")
+        job["error"] = str(e)
+
+    job["updated_at"] = time.time()
+    _write_json(job_path, job)
+    return job
@@ -0,0 +1,306 @@
+"""
+In-process BM25 keyword index for local vector stores (ChromaDB).
+
+Each term maps to two compact arrays (document numbers and term frequencies) that only
+grow by appending, so indexing a batch of chunks never rewrites existing postings.
+Deleted documents are tombstoned (their length drops to zero) and skipped at query time,
+which also keeps document frequencies exact without a forward index. Every update is
+appended to a log before it is applied; the log is folded into a snapshot (dropping the
+tombstoned documents) once it holds checkpoint_ops operations, and replayed on startup.
+Replaying is idempotent, so a crash between writing a snapshot and truncating the log is
+harmless.
+"""
+from array import array
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+import json
+import logging
+import os
+import re
+import threading
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_TOKEN = re.compile(r"\w+")
+
+# Term frequencies are stored as uint16
+_MAX_TF = 65535
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into lowercase word tokens (identifiers like snake_case stay whole)."""
+    return _TOKEN.findall(text.lower())
+
+
+class _Postings:
+    """Document numbers (ascending) and term frequencies of one term"""
+
+    __slots__ = ("docs", "tfs")
+
+    def __init__(self):
+        self.docs = array("I")
+        self.tfs = array("H")
+
+
+class BM25Index:
+    """Incrementally updated, persisted BM25 index over documents identified by string keys"""
+
+    def __init__(self, directory: str, k1: float = 1.2, b: float = 0.75, checkpoint_ops: int = 100000):
+        os.makedirs(directory, exist_ok=True)
+        self.snapshot_path = os.path.join(directory, "bm25.npz")
+        self.log_path = os.path.join(directory, "bm25.log")
+        self.k1 = k1
+        self.b = b
+        self.checkpoint_ops = checkpoint_ops
+        self._lock = threading.Lock()
+        self._reset()
+        self._load()
+        self._log = open(self.log_path, "a", encoding="utf-8")
+
+    def _reset(self) -> None:
+        self._postings: Dict[str, _Postings] = {}
+        self._doc_numbers: Dict[str, int] = {}
+        self._keys: List[Optional[str]] = []
+        self._source_numbers: Dict[str, int] = {}
+        self._source_names: List[str] = []
+        # Per-document length (0 = deleted) and source number, grown by doubling
+        self._lengths = np.zeros(1024, dtype=np.uint32)
+        self._doc_sources = np.zeros(1024, dtype=np.int32)
+        self._total_length = 0
+        self._log_ops = 0
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._doc_numbers)
+
+    def _source_number(self, source_id: Optional[str]) -> int:
+        if source_id is None:
+            return -1
+        number = self._source_numbers.get(source_id)
+        if number is None:
+            number = self._source_numbers[source_id] = len(self._source_names)
+            self._source_names.append(source_id)
+        return number
+
+    def _apply_add(self, key: str, source_id: Optional[str], term_frequencies: Dict[str, int]) -> None:
+        self._apply_remove([key])
+        doc = len(self._keys)
+        if doc == len(self._lengths):
+            self._lengths = np.concatenate([self._lengths, np.zeros(doc, dtype=np.uint32)])
+            self._doc_sources = np.concatenate([self._doc_sources, np.zeros(doc, dtype=np.int32)])
+        length = sum(term_frequencies.values())
+        self._keys.append(key)
+        self._doc_numbers[key] = doc
+        self._lengths[doc] = length
+        self._doc_sources[doc] = self._source_number(source_id)
+        self._total_length += length
+        for term, tf in term_frequencies.items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = _Postings()
+            postings.docs.append(doc)
+            postings.tfs.append(min(tf, _MAX_TF))
+
+    def _apply_remove(self, keys: Iterable[str]) -> None:
+        for key in keys:
+            doc = self._doc_numbers.pop(key, None)
+            if doc is not None:
+                self._total_length -= int(self._lengths[doc])
+                self._lengths[doc] = 0
+                self._keys[doc] = None
+
+    def _append_log(self, records: List[Dict]) -> None:
+        self._log.write("".join(json.dumps(record) + "\n" for record in records))
+        self._log.flush()
+        os.fsync(self._log.fileno())
+        self._log_ops += len(records)
+
+    def add(self, keys: List[str], texts: List[str], source_ids: List[Optional[str]]) -> None:
+        """Index (or re-index) documents; a key that is already indexed is replaced."""
+        records = [
+            {"op": "add", "key": key, "source": source_id, "tf": dict(Counter(tokenize(text or "")))}
+            for key, text, source_id in zip(keys, texts, source_ids)
+        ]
+        if not records:
+            return
+        with self._lock:
+            self._append_log(records)
+            for record in records:
+                self._apply_add(record["key"], record["source"], record["tf"])
+            self._maybe_checkpoint()
+
+    def remove(self, keys: List[str]) -> None:
+        """Remove documents from the index (unknown keys are ignored)."""
+        if not keys:
+            return
+        with self._lock:
+            self._append_log([{"op": "remove", "keys": list(keys)}])
+            self._apply_remove(keys)
+            self._maybe_checkpoint()
+
+    def search(self, query: str, limit: int = 10, source_id: Optional[str] = None) -> List[Tuple[str, float]]:
+        """Return up to limit (key, score) pairs ranked by BM25, optionally restricted to one source."""
+        terms = set(tokenize(query))
+        with self._lock:
+            live_docs = len(self._doc_numbers)
+            if not terms or not live_docs or limit <= 0:
+                return []
+            source_number = None
+            if source_id is not None:
+                source_number = self._source_numbers.get(source_id)
+                if source_number is None:
+                    return []
+
+            doc_count = len(self._keys)
+            lengths = self._lengths[:doc_count]
+            average_length = max(self._total_length / live_docs, 1.0)
+            scores = np.zeros(doc_count, dtype=np.float32)
+            for term in terms:
+                postings = self._postings.get(term)
+                if postings is None:
+                    continue
+                docs = np.frombuffer(postings.docs, dtype=np.uint32).copy()
+                tfs = np.frombuffer(postings.tfs, dtype=np.uint16).astype(np.float32)
+                doc_lengths = lengths[docs]
+                live = doc_lengths > 0
+                document_frequency = int(np.count_nonzero(live))
+                if not document_frequency:
+                    continue
+                idf = np.log1p((live_docs - document_frequency + 0.5) / (document_frequency + 0.5))
+                norm = self.k1 * (1.0 - self.b + self.b * doc_lengths[live] / average_length)
+                tf = tfs[live]
+                scores[docs[live]] += idf * tf * (self.k1 + 1.0) / (tf + norm)
+
+            candidates = np.flatnonzero(scores)
+            if source_number is not None:
+                candidates = candidates[self._doc_sources[candidates] == source_number]
+            if len(candidates) > limit:
+                candidates = candidates[np.argpartition(-scores[candidates], limit - 1)[:limit]]
+            candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+            return [(self._keys[doc], float(scores[doc])) for doc in candidates]
+
+    def _maybe_checkpoint(self) -> None:
+        if self._log_ops >= self.checkpoint_ops:
+            self._checkpoint()
+
+    def checkpoint(self) -> None:
+        """Write a compacted snapshot and truncate the log."""
+        with self._lock:
+            self._checkpoint()
+
+    def _compact(self) -> None:
+        """Drop tombstoned documents and renumber the rest"""
+        doc_count = len(self._keys)
+        live = self._lengths[:doc_count] > 0
+        # Documents without tokens have no postings but stay indexed
+        for doc in self._doc_numbers.values():
+            live[doc] = True
+        if live.all():
+            return
+        new_numbers = np.cumsum(live, dtype=np.int64) - 1
+        for term in list(self._postings):
+            postings = self._postings[term]
+            docs = np.frombuffer(postings.docs, dtype=np.uint32).copy()
+            keep = live[docs]
+            if not keep.any():
+                del self._postings[term]
+                continue
+            if keep.all() and new_numbers[docs[-1]] == docs[-1]:
+                continue
+            tfs = np.frombuffer(postings.tfs, dtype=np.uint16)[keep].copy()
+            compacted = _Postings()
+            compacted.docs.frombytes(new_numbers[docs[keep]].astype(np.uint32).tobytes())
+            compacted.tfs.frombytes(tfs.tobytes())
+            self._postings[term] = compacted
+        kept = np.flatnonzero(live)
+        self._keys = [self._keys[doc] for doc in kept]
+        self._doc_numbers = {key: doc for doc, key in enumerate(self._keys)}
+        # Keep spare capacity as in _load, so adding after everything was deleted still grows
+        capacity = max(1024, 2 * len(kept))
+        lengths = np.zeros(capacity, dtype=np.uint32)
+        lengths[:len(kept)] = self._lengths[kept]
+        doc_sources = np.zeros(capacity, dtype=np.int32)
+        doc_sources[:len(kept)] = self._doc_sources[kept]
+        self._lengths = lengths
+        self._doc_sources = doc_sources
+
+    def _checkpoint(self) -> None:
+        self._compact()
+        doc_count = len(self._keys)
+        terms = list(self._postings)
+        sizes = np.fromiter((len(self._postings[term].docs) for term in terms), dtype=np.int64, count=len(terms))
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        np.cumsum(sizes, out=offsets[1:])
+        header = json.dumps({"terms": terms, "keys": self._keys, "sources": self._source_names}).encode("utf-8")
+        temporary_path = self.snapshot_path + ".tmp"
+        with open(temporary_path, "wb") as handle:
+            np.savez(
+                handle,
+                header=np.frombuffer(header, dtype=np.uint8),
+                offsets=offsets,
+                docs=np.frombuffer(b"".join(self._postings[term].docs.tobytes() for term in terms), dtype=np.uint32),
+                tfs=np.frombuffer(b"".join(self._postings[term].tfs.tobytes() for term in terms), dtype=np.uint16),
+                lengths=self._lengths[:doc_count],
+                doc_sources=self._doc_sources[:doc_count]
+            )
+            handle.flush()
+            os.fsync(handle.fileno())
+        os.replace(temporary_path, self.snapshot_path)
+        self._log.close()
+        self._log = open(self.log_path, "w", encoding="utf-8")
+        self._log_ops = 0
+        logger.info(f"Checkpointed BM25 index with {doc_count} documents and {len(terms)} terms")
+
+    def _load(self) -> None:
+        """Load the snapshot, then replay the log on top of it"""
+        if os.path.exists(self.snapshot_path):
+            with np.load(self.snapshot_path) as snapshot:
+                header = json.loads(snapshot["header"].tobytes().decode("utf-8"))
+                offsets, docs, tfs = snapshot["offsets"], snapshot["docs"], snapshot["tfs"]
+                for i, term in enumerate(header["terms"]):
+                    postings = self._postings[term] = _Postings()
+                    postings.docs.frombytes(docs[offsets[i]:offsets[i + 1]].tobytes())
+                    postings.tfs.frombytes(tfs[offsets[i]:offsets[i + 1]].tobytes())
+                self._keys = header["keys"]
+                self._doc_numbers = {key: doc for doc, key in enumerate(self._keys) if key is not None}
+                self._source_names = header["sources"]
+                self._source_numbers = {source_id: number for number, source_id in enumerate(self._source_names)}
+                capacity = max(1024, 2 * len(self._keys))
+                self._lengths = np.zeros(capacity, dtype=np.uint32)
+                self._lengths[:len(self._keys)] = snapshot["lengths"]
+                self._doc_sources = np.zeros(capacity, dtype=np.int32)
+                self._doc_sources[:len(self._keys)] = snapshot["doc_sources"]
+                self._total_length = int(snapshot["lengths"].sum(dtype=np.int64))
+        if os.path.exists(self.log_path):
+            with open(self.log_path, encoding="utf-8") as log:
+                for line in log:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # A torn final line from a crash mid-append
+                        break
+                    if record["op"] == "add":
+                        self._apply_add(record["key"], record["source"], record["tf"])
+                    else:
+                        self._apply_remove(record["keys"])
+                    self._log_ops += 1
+
+    def clear(self) -> None:
+        """Remove every document and delete the persisted snapshot and log."""
+        with self._lock:
+            self._reset()
+            if os.path.exists(self.snapshot_path):
+                os.remove(self.snapshot_path)
+            self._log.close()
+            self._log = open(self.log_path, "w", encoding="utf-8")
+
+    def close(self) -> None:
+        """Checkpoint pending log operations and close the log."""
+        with self._lock:
+            if self._log.closed:
+                return
+            if self._log_ops:
+                self._checkpoint()
+            self._log.close()
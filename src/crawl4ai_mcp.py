@@ -6,23 +6,23 @@ the appropriate crawl method based on URL type (sitemap, txt file, or regular we
 Also includes AI hallucination detection and repository parsing tools using Neo4j knowledge graphs.
 """
 from mcp.server.fastmcp import FastMCP, Context
-from sentence_transformers import CrossEncoder
 from contextlib import asynccontextmanager
 from collections.abc import AsyncIterator
 from dataclasses import dataclass
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 from urllib.parse import urlparse, urldefrag
 from xml.etree import ElementTree
 from dotenv import load_dotenv
-from supabase import Client
 from pathlib import Path
 import requests
 import asyncio
+import concurrent.futures
+import functools
 import json
 import os
 import re
-import concurrent.futures
 import sys
+import time
 
 from crawl4ai import AsyncWebCrawler, BrowserConfig, CrawlerRunConfig, CacheMode, MemoryAdaptiveDispatcher
 
@@ -31,16 +31,27 @@ knowledge_graphs_path = Path(__file__).resolve().parent.parent / 'knowledge_grap
 sys.path.append(str(knowledge_graphs_path))
 
 from utils import (
-    get_supabase_client, 
-    add_documents_to_supabase, 
+    add_documents_to_vector_db, 
+    create_embedding,
+    create_embeddings_batch,
     search_documents,
     extract_code_blocks,
     generate_code_example_summary,
-    add_code_examples_to_supabase,
-    update_source_info,
+    add_code_examples_to_vector_db,
     extract_source_summary,
-    search_code_examples
+    search_code_examples,
+    dedupe_code_blocks,
+    match_stored_code_examples,
+    add_code_example_references,
+    delete_rows
 )
+from vector_db_adapter import VectorDBAdapter, get_vector_db, merge_hybrid_results
+from async_storage import AsyncVectorDB, shutdown_storage_pools
+from write_buffer import close_write_buffer, get_write_buffer
+from query_cache import SemanticQueryCache, get_query_cache, get_semantic_query_cache
+from reranking_service import RerankingService, start_reranking_service
+from enrichment_pool import get_enrichment_pool, shutdown_enrichment_pool
+from batch_ingest import get_batch_backend, create_bulk_job, advance_bulk_job
 
 # Import knowledge graph modules
 from knowledge_graph_validator import KnowledgeGraphValidator
@@ -117,8 +128,9 @@ def validate_github_url(repo_url: str) -> Dict[str, Any]:
 class Crawl4AIContext:
     """Context for the Crawl4AI MCP server."""
     crawler: AsyncWebCrawler
-    supabase_client: Client
-    reranking_model: Optional[CrossEncoder] = None
+    vector_db: VectorDBAdapter
+    storage: AsyncVectorDB
+    reranker: Optional[RerankingService] = None
     knowledge_validator: Optional[Any] = None  # KnowledgeGraphValidator when available
     repo_extractor: Optional[Any] = None       # DirectNeo4jExtractor when available
 
@@ -131,7 +143,7 @@ async def crawl4ai_lifespan(server: FastMCP) -> AsyncIterator[Crawl4AIContext]:
         server: The FastMCP server instance
         
     Yields:
-        Crawl4AIContext: The context containing the Crawl4AI crawler and Supabase client
+        Crawl4AIContext: The context containing the Crawl4AI crawler and vector database adapter
     """
     # Create browser configuration
     browser_config = BrowserConfig(
@@ -143,17 +155,17 @@ async def crawl4ai_lifespan(server: FastMCP) -> AsyncIterator[Crawl4AIContext]:
     crawler = AsyncWebCrawler(config=browser_config)
     await crawler.__aenter__()
     
-    # Initialize Supabase client
-    supabase_client = get_supabase_client()
+    # Initialize the vector database selected by VECTOR_DB (supabase or chromadb)
+    vector_db = get_vector_db()
     
-    # Initialize cross-encoder model for reranking if enabled
-    reranking_model = None
+    # Start the cross-encoder reranking service if enabled
+    reranker = None
     if os.getenv("USE_RERANKING", "false") == "true":
         try:
-            reranking_model = CrossEncoder("cross-encoder/ms-marco-MiniLM-L-6-v2")
+            reranker = start_reranking_service()
         except Exception as e:
             print(f"Failed to load reranking model: {e}")
-            reranking_model = None
+            reranker = None
     
     # Initialize Neo4j components if configured and enabled
     knowledge_validator = None
@@ -193,14 +205,21 @@ async def crawl4ai_lifespan(server: FastMCP) -> AsyncIterator[Crawl4AIContext]:
     try:
         yield Crawl4AIContext(
             crawler=crawler,
-            supabase_client=supabase_client,
-            reranking_model=reranking_model,
+            vector_db=vector_db,
+            storage=AsyncVectorDB(vector_db),
+            reranker=reranker,
             knowledge_validator=knowledge_validator,
             repo_extractor=repo_extractor
         )
     finally:
         # Clean up all components
         await crawler.__aexit__(None, None, None)
+        if reranker:
+            reranker.close()
+        shutdown_enrichment_pool(wait=False)
+        close_write_buffer()
+        shutdown_storage_pools(wait=True)
+        vector_db.close()
         if knowledge_validator:
             try:
                 await knowledge_validator.close()
@@ -223,12 +242,12 @@ mcp = FastMCP(
     port=os.getenv("PORT", "8051")
 )
 
-def rerank_results(model: CrossEncoder, query: str, results: List[Dict[str, Any]], content_key: str = "content") -> List[Dict[str, Any]]:
+async def rerank_results(reranker: RerankingService, query: str, results: List[Dict[str, Any]], content_key: str = "content") -> List[Dict[str, Any]]:
     """
-    Rerank search results using a cross-encoder model.
+    Rerank search results using the cross-encoder reranking service.
     
     Args:
-        model: The cross-encoder model to use for reranking
+        reranker: The reranking service to score the results with
         query: The search query
         results: List of search results
         content_key: The key in each result dict that contains the text content
@@ -236,18 +255,15 @@ def rerank_results(model: CrossEncoder, query: str, results: List[Dict[str, Any]
     Returns:
         Reranked list of results
     """
-    if not model or not results:
+    if not reranker or not results:
         return results
     
     try:
         # Extract content from results
         texts = [result.get(content_key, "") for result in results]
         
-        # Create pairs of [query, document] for the cross-encoder
-        pairs = [[query, text] for text in texts]
-        
-        # Get relevance scores from the cross-encoder
-        scores = model.predict(pairs)
+        # Get relevance scores from the cross-encoder without blocking the event loop
+        scores = await reranker.score(query, texts)
         
         # Add scores to results and sort by score (descending)
         for i, result in enumerate(results):
@@ -261,6 +277,207 @@ def rerank_results(model: CrossEncoder, query: str, results: List[Dict[str, Any]
         print(f"Error during reranking: {e}")
         return results
 
+async def rerank_result_groups(reranker: RerankingService, queries: List[str], groups: List[List[Dict[str, Any]]], content_key: str = "content") -> List[List[Dict[str, Any]]]:
+    """
+    Rerank the results of several queries with a single cross-encoder batch.
+    
+    The pairs of every group are queued as one request, so the reranking service scores
+    them in one batch.
+    
+    Args:
+        reranker: The reranking service to score the results with
+        queries: The search queries
+        groups: Search results of each query
+        content_key: The key in each result dict that contains the text content
+        
+    Returns:
+        Each group reranked against its own query
+    """
+    if not reranker or not any(groups):
+        return groups
+    
+    try:
+        scores = await reranker.score_groups([
+            (query, [result.get(content_key, "") for result in results])
+            for query, results in zip(queries, groups)
+        ])
+        for results, group_scores in zip(groups, scores):
+            for result, score in zip(results, group_scores):
+                result["rerank_score"] = score
+        return [sorted(results, key=lambda x: x.get("rerank_score", 0), reverse=True) for results in groups]
+    except Exception as e:
+        print(f"Error during reranking: {e}")
+        return groups
+
+async def run_search_legs(
+    storage: AsyncVectorDB,
+    vector_search,
+    query: str,
+    match_count: int,
+    source_filter: Optional[str],
+    hybrid: bool,
+    collection_type: str = "content"
+) -> Tuple[List[Dict[str, Any]], Dict[str, float]]:
+    """
+    Run the retrieval legs of a search on the storage read pool and time each one.
+    
+    When the adapter does not fuse hybrid search itself, the keyword leg is issued concurrently
+    with the vector leg (which first embeds the query), so hybrid latency is that of the slower
+    leg rather than the sum of both.
+    
+    Args:
+        storage: Async storage wrapper of the vector database
+        vector_search: search_documents or utils.search_code_examples
+        query: The search query
+        match_count: Maximum number of results to return
+        source_filter: Optional source_id to restrict the search to
+        hybrid: Whether to combine vector search with keyword search
+        collection_type: "content" or "code" (the collection the keyword leg searches)
+        
+    Returns:
+        Tuple of (results, latency in milliseconds per leg and in total)
+    """
+    latency_ms: Dict[str, float] = {}
+    
+    async def timed(leg: str, awaitable):
+        started = time.perf_counter()
+        try:
+            return await awaitable
+        finally:
+            latency_ms[leg] = round((time.perf_counter() - started) * 1000, 1)
+    
+    started = time.perf_counter()
+    if hybrid and not storage.adapter.native_hybrid_search:
+        # Get double the results to have room for merging
+        vector_results, keyword_results = await asyncio.gather(
+            timed("vector", storage.read(vector_search, storage.adapter, query, match_count * 2, source_filter, False)),
+            timed("keyword", storage.read(storage.adapter.keyword_search, query, match_count * 2, source_filter, collection_type))
+        )
+        results = merge_hybrid_results(vector_results, keyword_results, match_count)
+    else:
+        results = await timed(
+            "hybrid" if hybrid else "vector",
+            storage.read(vector_search, storage.adapter, query, match_count, source_filter, hybrid)
+        )
+    latency_ms["total"] = round((time.perf_counter() - started) * 1000, 1)
+    return results, latency_ms
+
+async def run_cached_search(
+    storage: AsyncVectorDB,
+    vector_search,
+    query: str,
+    match_count: int,
+    source_filter: Optional[str],
+    hybrid: bool,
+    reranker: Optional[RerankingService] = None,
+    collection_type: str = "content",
+    semantic: bool = False
+) -> Tuple[List[Dict[str, Any]], Dict[str, float], Optional[str]]:
+    """
+    Run a search and optional reranking through the query result cache (if USE_QUERY_CACHE is "true").
+    
+    Entries are keyed by everything that shapes the results and validated against the write
+    generation of the searched source, read before the search starts so that a write landing
+    mid-search leaves the stored entry already stale. With semantic (and USE_SEMANTIC_CACHE),
+    an exact miss embeds the query first and reuses the results of a near-identical earlier
+    query; a sample of these hits is checked against a fresh search in the background.
+    
+    Args:
+        storage: Async storage wrapper of the vector database
+        vector_search: search_documents or utils.search_code_examples
+        query: The search query
+        match_count: Maximum number of results to return
+        source_filter: Optional source_id to restrict the search to
+        hybrid: Whether to combine vector search with keyword search
+        reranker: Reranking service to rerank the results with (None to skip reranking)
+        collection_type: "content" or "code"
+        semantic: Whether to use the semantic query cache (vector_search must accept query_embedding)
+        
+    Returns:
+        Tuple of (results, latency in milliseconds, "exact" or "semantic" for cached results or None)
+    """
+    query_cache = get_query_cache()
+    semantic_cache = get_semantic_query_cache() if semantic else None
+    key = (collection_type, query, source_filter, match_count, hybrid, reranker is not None)
+    token = storage.adapter.generations.token(source_filter)
+    started = time.perf_counter()
+    if query_cache is not None:
+        cached = query_cache.get(key, token)
+        if cached is not None:
+            return cached, {"cache": round((time.perf_counter() - started) * 1000, 3)}, "exact"
+    
+    if semantic_cache is not None:
+        # Everything but the query text must match for results to be reused
+        scope = (collection_type, source_filter, match_count, hybrid, reranker is not None)
+        query_embedding = await storage.read(create_embedding, query)
+        embedding_ms = round((time.perf_counter() - started) * 1000, 1)
+        vector_search = functools.partial(vector_search, query_embedding=query_embedding)
+        match = semantic_cache.get(query_embedding, scope, token)
+        if match is not None:
+            matched_query, cached = match
+            if semantic_cache.should_sample():
+                task = asyncio.create_task(verify_semantic_hit(
+                    semantic_cache, storage, vector_search, query, matched_query, cached,
+                    match_count, source_filter, hybrid, reranker, collection_type
+                ))
+                _background_tasks.add(task)
+                task.add_done_callback(_background_tasks.discard)
+            return cached, {"embedding": embedding_ms, "total": round((time.perf_counter() - started) * 1000, 1)}, "semantic"
+    
+    results, latency_ms = await run_search_legs(storage, vector_search, query, match_count, source_filter, hybrid, collection_type)
+    if reranker is not None:
+        reranking_started = time.perf_counter()
+        results = await rerank_results(reranker, query, results, content_key="content")
+        latency_ms["rerank"] = round((time.perf_counter() - reranking_started) * 1000, 1)
+        latency_ms["total"] = round((time.perf_counter() - started) * 1000, 1)
+    if query_cache is not None:
+        query_cache.put(key, token, results)
+    if semantic_cache is not None:
+        semantic_cache.put(query_embedding, scope, token, query, results)
+        latency_ms = {"embedding": embedding_ms, **latency_ms, "total": round((time.perf_counter() - started) * 1000, 1)}
+    return results, latency_ms, None
+
+# Background semantic cache checks, referenced until they finish
+_background_tasks = set()
+
+async def verify_semantic_hit(
+    semantic_cache: SemanticQueryCache,
+    storage: AsyncVectorDB,
+    vector_search,
+    query: str,
+    matched_query: str,
+    cached_results: List[Dict[str, Any]],
+    match_count: int,
+    source_filter: Optional[str],
+    hybrid: bool,
+    reranker: Optional[RerankingService],
+    collection_type: str
+) -> None:
+    """Search a semantic cache hit afresh and record whether the reused results were a false hit."""
+    try:
+        results, _ = await run_search_legs(storage, vector_search, query, match_count, source_filter, hybrid, collection_type)
+        if reranker is not None:
+            results = await rerank_results(reranker, query, results, content_key="content")
+        if semantic_cache.record_sample(cached_results, results):
+            print(f"Semantic cache false hit: {query!r} reused the results of {matched_query!r}")
+    except Exception as e:
+        print(f"Error verifying semantic cache hit: {e}")
+
+def format_document_result(result: Dict[str, Any]) -> Dict[str, Any]:
+    """Format a crawled page search result for a tool response."""
+    formatted_result = {
+        "url": result.get("url"),
+        "content": result.get("content"),
+        "metadata": result.get("metadata"),
+        "similarity": result.get("similarity")
+    }
+    # Include fusion and rerank scores if available
+    if "rrf_score" in result:
+        formatted_result["rrf_score"] = result["rrf_score"]
+    if "rerank_score" in result:
+        formatted_result["rerank_score"] = result["rerank_score"]
+    return formatted_result
+
 def is_sitemap(url: str) -> bool:
     """
     Check if a URL is a sitemap.
@@ -371,6 +588,77 @@ def extract_section_info(chunk: str) -> Dict[str, Any]:
         "word_count": len(chunk.split())
     }
 
+@dataclass
+class PreparedChunks:
+    """Chunks and per-source statistics prepared from a list of crawl results."""
+    urls: List[str]
+    chunk_numbers: List[int]
+    contents: List[str]
+    metadatas: List[Dict[str, Any]]
+    url_to_full_document: Dict[str, str]
+    source_content_map: Dict[str, str]
+    source_word_counts: Dict[str, int]
+
+def prepare_crawl_chunks(crawl_results: List[Dict[str, Any]], chunk_size: int, crawl_type: str) -> PreparedChunks:
+    """
+    Chunk crawled documents and collect their metadata and per-source statistics.
+    
+    Args:
+        crawl_results: List of dictionaries with URL and markdown content
+        chunk_size: Maximum size of each content chunk in characters
+        crawl_type: The crawl strategy that produced the results
+        
+    Returns:
+        PreparedChunks with one entry per chunk
+    """
+    prepared = PreparedChunks([], [], [], [], {}, {}, {})
+    
+    for doc in crawl_results:
+        source_url = doc['url']
+        md = doc['markdown']
+        chunks = smart_chunk_markdown(md, chunk_size=chunk_size)
+        prepared.url_to_full_document[source_url] = md
+        
+        # Extract source_id
+        parsed_url = urlparse(source_url)
+        source_id = parsed_url.netloc or parsed_url.path
+        
+        # Store content for source summary generation
+        if source_id not in prepared.source_content_map:
+            prepared.source_content_map[source_id] = md[:5000]  # Store first 5000 chars
+            prepared.source_word_counts[source_id] = 0
+        
+        for i, chunk in enumerate(chunks):
+            prepared.urls.append(source_url)
+            prepared.chunk_numbers.append(i)
+            prepared.contents.append(chunk)
+            
+            # Extract metadata
+            meta = extract_section_info(chunk)
+            meta["chunk_index"] = i
+            meta["url"] = source_url
+            meta["source"] = source_id
+            meta["crawl_type"] = crawl_type
+            meta["crawl_time"] = str(asyncio.current_task().get_coro().__name__)
+            prepared.metadatas.append(meta)
+            
+            # Accumulate word count
+            prepared.source_word_counts[source_id] += meta.get("word_count", 0)
+    
+    return prepared
+
+def extract_crawl_code_blocks(crawl_results: List[Dict[str, Any]]) -> List[Tuple[str, Dict[str, Any]]]:
+    """
+    Extract code blocks from all crawled documents.
+    
+    Args:
+        crawl_results: List of dictionaries with URL and markdown content
+        
+    Returns:
+        List of (url, code block) tuples in document order
+    """
+    return [(doc['url'], block) for doc in crawl_results for block in extract_code_blocks(doc['markdown'])]
+
 def process_code_example(args):
     """
     Process a single code example to generate its summary.
@@ -385,25 +673,134 @@ def process_code_example(args):
     code, context_before, context_after = args
     return generate_code_example_summary(code, context_before, context_after)
 
+@dataclass
+class CodeExamplePlan:
+    """Deduplicated code examples of a crawl with their queued summaries."""
+    examples: List[Dict[str, Any]]
+    summary_futures: List[Optional[concurrent.futures.Future]]
+    reference_only: List[Tuple[Dict[str, Any], List[str]]]
+
+def queue_code_examples(vector_db: VectorDBAdapter, crawl_results: List[Dict[str, Any]]) -> CodeExamplePlan:
+    """
+    Extract and deduplicate the code examples of a crawl and queue summaries for new ones.
+    
+    Code examples are deduplicated by normalized code hash across the whole crawl and against
+    what is already stored, so each distinct example is summarized and embedded once. Examples
+    already stored for a page outside this crawl are not stored again; the URLs where they were
+    found are recorded as references on the stored row instead.
+    
+    Args:
+        vector_db: Vector database adapter
+        crawl_results: List of dictionaries with URL and markdown content
+        
+    Returns:
+        CodeExamplePlan to pass to store_code_examples
+    """
+    examples, reference_only = match_stored_code_examples(
+        vector_db,
+        dedupe_code_blocks(extract_crawl_code_blocks(crawl_results)),
+        [doc['url'] for doc in crawl_results]
+    )
+    pool = get_enrichment_pool()
+    
+    plan = CodeExamplePlan([], [], reference_only)
+    for example, row in examples:
+        if row:
+            # Stored for a page of this crawl: reuse its summary and embedding
+            example['summary'] = row['summary']
+            example['embedding'] = row['embedding']
+            plan.summary_futures.append(None)
+        else:
+            block = example['block']
+            example['embedding'] = None
+            plan.summary_futures.append(pool.submit(
+                process_code_example,
+                (block['code'], block['context_before'], block['context_after'])
+            ))
+        plan.examples.append(example)
+    
+    return plan
+
+async def store_code_examples(storage: AsyncVectorDB, plan: CodeExamplePlan, batch_size: int = 20) -> int:
+    """
+    Wait for the queued code example summaries and store the examples in the vector database.
+    
+    Args:
+        storage: Async storage wrapping the vector database adapter
+        plan: The plan returned by queue_code_examples
+        batch_size: Size of each batch for insertion
+        
+    Returns:
+        Number of code examples stored
+    """
+    for row, urls in plan.reference_only:
+        await storage.write(add_code_example_references, storage.adapter, row, urls)
+    
+    code_urls = []
+    code_chunk_numbers = []
+    code_examples = []
+    code_summaries = []
+    code_metadatas = []
+    code_embeddings = []
+    
+    for i, (example, future) in enumerate(zip(plan.examples, plan.summary_futures)):
+        summary = await asyncio.wrap_future(future) if future else example['summary']
+        code = example['block']['code']
+        parsed_url = urlparse(example['url'])
+        
+        code_urls.append(example['url'])
+        code_chunk_numbers.append(i)  # Use global code example index
+        code_examples.append(code)
+        code_summaries.append(summary)
+        code_embeddings.append(example['embedding'])
+        
+        # Create metadata for code example
+        code_metadatas.append({
+            "chunk_index": i,
+            "url": example['url'],
+            "source": parsed_url.netloc or parsed_url.path,
+            "char_count": len(code),
+            "word_count": len(code.split()),
+            "code_hash": example['code_hash'],
+            "references": example['references']
+        })
+    
+    if code_examples:
+        # Embedding and writing block, so run them off the event loop
+        await asyncio.to_thread(
+            add_code_examples_to_vector_db,
+            storage.adapter, 
+            code_urls, 
+            code_chunk_numbers, 
+            code_examples, 
+            code_summaries, 
+            code_metadatas,
+            batch_size=batch_size,
+            embeddings=code_embeddings
+        )
+    
+    return len(code_examples)
+
 @mcp.tool()
 async def crawl_single_page(ctx: Context, url: str) -> str:
     """
-    Crawl a single web page and store its content in Supabase.
+    Crawl a single web page and store its content in the vector database.
     
     This tool is ideal for quickly retrieving content from a specific URL without following links.
-    The content is stored in Supabase for later retrieval and querying.
+    The content is stored in the configured vector database (Supabase or ChromaDB) for later retrieval and querying.
     
     Args:
         ctx: The MCP server provided context
         url: URL of the web page to crawl
     
     Returns:
-        Summary of the crawling operation and storage in Supabase
+        Summary of the crawling operation and storage in the vector database
     """
     try:
         # Get the crawler from the context
         crawler = ctx.request_context.lifespan_context.crawler
-        supabase_client = ctx.request_context.lifespan_context.supabase_client
+        vector_db = ctx.request_context.lifespan_context.vector_db
+        storage = ctx.request_context.lifespan_context.storage
         
         # Configure the crawl
         run_config = CrawlerRunConfig(cache_mode=CacheMode.BYPASS, stream=False)
@@ -419,7 +816,7 @@ async def crawl_single_page(ctx: Context, url: str) -> str:
             # Chunk the content
             chunks = smart_chunk_markdown(result.markdown)
             
-            # Prepare data for Supabase
+            # Prepare data for the vector database
             urls = []
             chunk_numbers = []
             contents = []
@@ -445,65 +842,28 @@ async def crawl_single_page(ctx: Context, url: str) -> str:
             # Create url_to_full_document mapping
             url_to_full_document = {url: result.markdown}
             
-            # Update source information FIRST (before inserting documents)
-            source_summary = extract_source_summary(source_id, result.markdown[:5000])  # Use first 5000 chars for summary
-            update_source_info(supabase_client, source_id, source_summary, total_word_count)
+            # Summarize the source; it is upserted together with the chunk and word count deltas
+            source_summary = await get_enrichment_pool().run(extract_source_summary, source_id, result.markdown[:5000])  # Use first 5000 chars for summary
             
-            # Add documentation chunks to Supabase (AFTER source exists)
-            add_documents_to_supabase(supabase_client, urls, chunk_numbers, contents, metadatas, url_to_full_document)
+            # Add documentation chunks to the vector database, off the event loop
+            ingest_stats = await asyncio.to_thread(
+                add_documents_to_vector_db, vector_db, urls, chunk_numbers, contents, metadatas, url_to_full_document,
+                source_summaries={source_id: source_summary}
+            )
             
             # Extract and process code examples only if enabled
+            code_examples_stored = 0
             extract_code_examples = os.getenv("USE_AGENTIC_RAG", "false") == "true"
             if extract_code_examples:
-                code_blocks = extract_code_blocks(result.markdown)
-                if code_blocks:
-                    code_urls = []
-                    code_chunk_numbers = []
-                    code_examples = []
-                    code_summaries = []
-                    code_metadatas = []
-                    
-                    # Process code examples in parallel
-                    with concurrent.futures.ThreadPoolExecutor(max_workers=10) as executor:
-                        # Prepare arguments for parallel processing
-                        summary_args = [(block['code'], block['context_before'], block['context_after']) 
-                                        for block in code_blocks]
-                        
-                        # Generate summaries in parallel
-                        summaries = list(executor.map(process_code_example, summary_args))
-                    
-                    # Prepare code example data
-                    for i, (block, summary) in enumerate(zip(code_blocks, summaries)):
-                        code_urls.append(url)
-                        code_chunk_numbers.append(i)
-                        code_examples.append(block['code'])
-                        code_summaries.append(summary)
-                        
-                        # Create metadata for code example
-                        code_meta = {
-                            "chunk_index": i,
-                            "url": url,
-                            "source": source_id,
-                            "char_count": len(block['code']),
-                            "word_count": len(block['code'].split())
-                        }
-                        code_metadatas.append(code_meta)
-                    
-                    # Add code examples to Supabase
-                    add_code_examples_to_supabase(
-                        supabase_client, 
-                        code_urls, 
-                        code_chunk_numbers, 
-                        code_examples, 
-                        code_summaries, 
-                        code_metadatas
-                    )
+                code_plan = await storage.read(queue_code_examples, vector_db, [{'url': url, 'markdown': result.markdown}])
+                code_examples_stored = await store_code_examples(storage, code_plan)
             
             return json.dumps({
                 "success": True,
                 "url": url,
                 "chunks_stored": len(chunks),
-                "code_examples_stored": len(code_blocks) if code_blocks else 0,
+                "chunks_unchanged": ingest_stats["unchanged"],
+                "code_examples_stored": code_examples_stored,
                 "content_length": len(result.markdown),
                 "total_word_count": total_word_count,
                 "source_id": source_id,
@@ -528,14 +888,14 @@ async def crawl_single_page(ctx: Context, url: str) -> str:
 @mcp.tool()
 async def smart_crawl_url(ctx: Context, url: str, max_depth: int = 3, max_concurrent: int = 10, chunk_size: int = 5000) -> str:
     """
-    Intelligently crawl a URL based on its type and store content in Supabase.
+    Intelligently crawl a URL based on its type and store content in the vector database.
     
     This tool automatically detects the URL type and applies the appropriate crawling method:
     - For sitemaps: Extracts and crawls all URLs in parallel
     - For text files (llms.txt): Directly retrieves the content
     - For regular webpages: Recursively crawls internal links up to the specified depth
     
-    All crawled content is chunked and stored in Supabase for later retrieval and querying.
+    All crawled content is chunked and stored in the vector database for later retrieval and querying.
     
     Args:
         ctx: The MCP server provided context
@@ -550,31 +910,11 @@ async def smart_crawl_url(ctx: Context, url: str, max_depth: int = 3, max_concur
     try:
         # Get the crawler from the context
         crawler = ctx.request_context.lifespan_context.crawler
-        supabase_client = ctx.request_context.lifespan_context.supabase_client
-        
-        # Determine the crawl strategy
-        crawl_results = []
-        crawl_type = None
-        
-        if is_txt(url):
-            # For text files, use simple crawl
-            crawl_results = await crawl_markdown_file(crawler, url)
-            crawl_type = "text_file"
-        elif is_sitemap(url):
-            # For sitemaps, extract URLs and crawl in parallel
-            sitemap_urls = parse_sitemap(url)
-            if not sitemap_urls:
-                return json.dumps({
-                    "success": False,
-                    "url": url,
-                    "error": "No URLs found in sitemap"
-                }, indent=2)
-            crawl_results = await crawl_batch(crawler, sitemap_urls, max_concurrent=max_concurrent)
-            crawl_type = "sitemap"
-        else:
-            # For regular URLs, use recursive crawl
-            crawl_results = await crawl_recursive_internal_links(crawler, [url], max_depth=max_depth, max_concurrent=max_concurrent)
-            crawl_type = "webpage"
+        vector_db = ctx.request_context.lifespan_context.vector_db
+        storage = ctx.request_context.lifespan_context.storage
+        
+        # Crawl using the strategy matching the URL type
+        crawl_results, crawl_type = await crawl_by_url_type(crawler, url, max_depth, max_concurrent)
         
         if not crawl_results:
             return json.dumps({
@@ -583,126 +923,45 @@ async def smart_crawl_url(ctx: Context, url: str, max_depth: int = 3, max_concur
                 "error": "No content found"
             }, indent=2)
         
-        # Process results and store in Supabase
-        urls = []
-        chunk_numbers = []
-        contents = []
-        metadatas = []
-        chunk_count = 0
-        
-        # Track sources and their content
-        source_content_map = {}
-        source_word_counts = {}
-        
-        # Process documentation chunks
-        for doc in crawl_results:
-            source_url = doc['url']
-            md = doc['markdown']
-            chunks = smart_chunk_markdown(md, chunk_size=chunk_size)
-            
-            # Extract source_id
-            parsed_url = urlparse(source_url)
-            source_id = parsed_url.netloc or parsed_url.path
-            
-            # Store content for source summary generation
-            if source_id not in source_content_map:
-                source_content_map[source_id] = md[:5000]  # Store first 5000 chars
-                source_word_counts[source_id] = 0
-            
-            for i, chunk in enumerate(chunks):
-                urls.append(source_url)
-                chunk_numbers.append(i)
-                contents.append(chunk)
-                
-                # Extract metadata
-                meta = extract_section_info(chunk)
-                meta["chunk_index"] = i
-                meta["url"] = source_url
-                meta["source"] = source_id
-                meta["crawl_type"] = crawl_type
-                meta["crawl_time"] = str(asyncio.current_task().get_coro().__name__)
-                metadatas.append(meta)
-                
-                # Accumulate word count
-                source_word_counts[source_id] += meta.get("word_count", 0)
-                
-                chunk_count += 1
-        
-        # Create url_to_full_document mapping
-        url_to_full_document = {}
-        for doc in crawl_results:
-            url_to_full_document[doc['url']] = doc['markdown']
-        
-        # Update source information for each unique source FIRST (before inserting documents)
-        with concurrent.futures.ThreadPoolExecutor(max_workers=5) as executor:
-            source_summary_args = [(source_id, content) for source_id, content in source_content_map.items()]
-            source_summaries = list(executor.map(lambda args: extract_source_summary(args[0], args[1]), source_summary_args))
+        # Process results into chunks for storage in the vector database
+        prepared = prepare_crawl_chunks(crawl_results, chunk_size, crawl_type)
+        urls = prepared.urls
+        chunk_numbers = prepared.chunk_numbers
+        contents = prepared.contents
+        metadatas = prepared.metadatas
+        chunk_count = len(contents)
+        url_to_full_document = prepared.url_to_full_document
+        source_content_map = prepared.source_content_map
+        
+        pool = get_enrichment_pool()
+        
+        # Queue source summaries on the shared enrichment pool
+        source_summary_args = [(source_id, content) for source_id, content in source_content_map.items()]
+        source_summary_futures = [pool.submit(extract_source_summary, source_id, content)
+                                  for source_id, content in source_summary_args]
+        
+        # Queue code example summaries for all documents up front, so they run alongside
+        # contextual enrichment instead of one document at a time
+        extract_code_examples_enabled = os.getenv("USE_AGENTIC_RAG", "false") == "true"
+        code_plan = None
+        if extract_code_examples_enabled:
+            code_plan = await storage.read(queue_code_examples, vector_db, crawl_results)
         
-        for (source_id, _), summary in zip(source_summary_args, source_summaries):
-            word_count = source_word_counts.get(source_id, 0)
-            update_source_info(supabase_client, source_id, summary, word_count)
+        # Source summaries are upserted in bulk with the chunk and word count deltas of this crawl
+        source_summaries = await asyncio.gather(*[asyncio.wrap_future(f) for f in source_summary_futures])
+        summaries_by_source = {source_id: summary for (source_id, _), summary in zip(source_summary_args, source_summaries)}
         
-        # Add documentation chunks to Supabase (AFTER sources exist)
+        # Add documentation chunks to the vector database
         batch_size = 20
-        add_documents_to_supabase(supabase_client, urls, chunk_numbers, contents, metadatas, url_to_full_document, batch_size=batch_size)
+        ingest_stats = await asyncio.to_thread(
+            add_documents_to_vector_db, vector_db, urls, chunk_numbers, contents, metadatas, url_to_full_document,
+            batch_size=batch_size, source_summaries=summaries_by_source
+        )
         
-        # Extract and process code examples from all documents only if enabled
-        extract_code_examples_enabled = os.getenv("USE_AGENTIC_RAG", "false") == "true"
-        if extract_code_examples_enabled:
-            all_code_blocks = []
-            code_urls = []
-            code_chunk_numbers = []
-            code_examples = []
-            code_summaries = []
-            code_metadatas = []
-            
-            # Extract code blocks from all documents
-            for doc in crawl_results:
-                source_url = doc['url']
-                md = doc['markdown']
-                code_blocks = extract_code_blocks(md)
-                
-                if code_blocks:
-                    # Process code examples in parallel
-                    with concurrent.futures.ThreadPoolExecutor(max_workers=10) as executor:
-                        # Prepare arguments for parallel processing
-                        summary_args = [(block['code'], block['context_before'], block['context_after']) 
-                                        for block in code_blocks]
-                        
-                        # Generate summaries in parallel
-                        summaries = list(executor.map(process_code_example, summary_args))
-                    
-                    # Prepare code example data
-                    parsed_url = urlparse(source_url)
-                    source_id = parsed_url.netloc or parsed_url.path
-                    
-                    for i, (block, summary) in enumerate(zip(code_blocks, summaries)):
-                        code_urls.append(source_url)
-                        code_chunk_numbers.append(len(code_examples))  # Use global code example index
-                        code_examples.append(block['code'])
-                        code_summaries.append(summary)
-                        
-                        # Create metadata for code example
-                        code_meta = {
-                            "chunk_index": len(code_examples) - 1,
-                            "url": source_url,
-                            "source": source_id,
-                            "char_count": len(block['code']),
-                            "word_count": len(block['code'].split())
-                        }
-                        code_metadatas.append(code_meta)
-            
-            # Add all code examples to Supabase
-            if code_examples:
-                add_code_examples_to_supabase(
-                    supabase_client, 
-                    code_urls, 
-                    code_chunk_numbers, 
-                    code_examples, 
-                    code_summaries, 
-                    code_metadatas,
-                    batch_size=batch_size
-                )
+        # Collect code example summaries and store them
+        code_examples_stored = 0
+        if code_plan:
+            code_examples_stored = await store_code_examples(storage, code_plan, batch_size=batch_size)
         
         return json.dumps({
             "success": True,
@@ -710,7 +969,8 @@ async def smart_crawl_url(ctx: Context, url: str, max_depth: int = 3, max_concur
             "crawl_type": crawl_type,
             "pages_crawled": len(crawl_results),
             "chunks_stored": chunk_count,
-            "code_examples_stored": len(code_examples),
+            "chunks_unchanged": ingest_stats["unchanged"],
+            "code_examples_stored": code_examples_stored,
             "sources_updated": len(source_content_map),
             "urls_crawled": [doc['url'] for doc in crawl_results][:5] + (["..."] if len(crawl_results) > 5 else [])
         }, indent=2)
@@ -721,10 +981,199 @@ async def smart_crawl_url(ctx: Context, url: str, max_depth: int = 3, max_concur
             "error": str(e)
         }, indent=2)
 
+@mcp.tool()
+async def start_bulk_ingestion(ctx: Context, url: str, max_depth: int = 3, max_concurrent: int = 10, chunk_size: int = 5000) -> str:
+    """
+    Crawl a URL and queue its enrichment and embeddings as an offline batch job.
+    
+    Use this instead of smart_crawl_url for very large first-time ingestions where latency
+    does not matter. The crawl happens now, but contextual embeddings, code example summaries,
+    source summaries and embeddings are submitted as batch jobs (BULK_BATCH_BACKEND) and the
+    content is only stored once check_bulk_ingestion reports the job as completed.
+    
+    Args:
+        ctx: The MCP server provided context
+        url: URL to crawl (can be a regular webpage, sitemap.xml, or .txt file)
+        max_depth: Maximum recursion depth for regular URLs (default: 3)
+        max_concurrent: Maximum number of concurrent browser sessions (default: 10)
+        chunk_size: Maximum size of each content chunk in characters (default: 5000)
+    
+    Returns:
+        JSON string with the job ID and the number of queued chunks and code examples
+    """
+    try:
+        crawler = ctx.request_context.lifespan_context.crawler
+        
+        crawl_results, crawl_type = await crawl_by_url_type(crawler, url, max_depth, max_concurrent)
+        if not crawl_results:
+            return json.dumps({
+                "success": False,
+                "url": url,
+                "error": "No content found"
+            }, indent=2)
+        
+        prepared = prepare_crawl_chunks(crawl_results, chunk_size, crawl_type)
+        
+        code_examples = []
+        if os.getenv("USE_AGENTIC_RAG", "false") == "true":
+            for example in dedupe_code_blocks(extract_crawl_code_blocks(crawl_results)):
+                block = example['block']
+                parsed_url = urlparse(example['url'])
+                code_examples.append({
+                    "url": example['url'],
+                    "chunk_number": len(code_examples),  # Use global code example index
+                    "code": block['code'],
+                    "context_before": block['context_before'],
+                    "context_after": block['context_after'],
+                    "metadata": {
+                        "chunk_index": len(code_examples),
+                        "url": example['url'],
+                        "source": parsed_url.netloc or parsed_url.path,
+                        "char_count": len(block['code']),
+                        "word_count": len(block['code'].split()),
+                        "code_hash": example['code_hash'],
+                        "references": example['references']
+                    }
+                })
+        
+        job = await asyncio.to_thread(
+            create_bulk_job,
+            prepared.urls,
+            prepared.chunk_numbers,
+            prepared.contents,
+            prepared.metadatas,
+            prepared.url_to_full_document,
+            prepared.source_content_map,
+            prepared.source_word_counts,
+            code_examples,
+            get_batch_backend()
+        )
+        
+        return json.dumps({
+            "success": True,
+            "url": url,
+            "crawl_type": crawl_type,
+            "job_id": job["job_id"],
+            "status": job["status"],
+            "pages_crawled": len(crawl_results),
+            "counts": job["counts"]
+        }, indent=2)
+    except Exception as e:
+        return json.dumps({
+            "success": False,
+            "url": url,
+            "error": str(e)
+        }, indent=2)
+
+@mcp.tool()
+async def check_bulk_ingestion(ctx: Context, job_id: str) -> str:
+    """
+    Check a bulk ingestion job and advance it when its batch results are available.
+    
+    Once the enrichment batch completes the embedding batch is submitted, and once the
+    embedding batch completes the content is written to the database. Call this periodically
+    until the status is "completed" (or "failed").
+    
+    Args:
+        ctx: The MCP server provided context
+        job_id: The job ID returned by start_bulk_ingestion
+    
+    Returns:
+        JSON string with the job status and counts
+    """
+    try:
+        vector_db = ctx.request_context.lifespan_context.vector_db
+        job = await asyncio.to_thread(advance_bulk_job, job_id, get_batch_backend(), vector_db)
+        
+        return json.dumps({
+            "success": not (job.get("error") or job.get("failure")),
+            "job_id": job_id,
+            "status": job["status"],
+            "counts": job["counts"],
+            "error": job.get("error") or job.get("failure")
+        }, indent=2)
+    except Exception as e:
+        return json.dumps({
+            "success": False,
+            "job_id": job_id,
+            "error": str(e)
+        }, indent=2)
+
+@mcp.tool()
+async def delete_source(ctx: Context, source_id: str) -> str:
+    """
+    Delete a source and everything stored for it (chunks, code examples and the source entry).
+    
+    Rows are removed in batches; if the deletion is interrupted, calling this tool again
+    continues with the remaining rows.
+    
+    Args:
+        ctx: The MCP server provided context
+        source_id: The source ID (domain) to delete, as listed by get_available_sources
+    
+    Returns:
+        JSON string with the number of rows removed and the deletion throughput
+    """
+    try:
+        vector_db = ctx.request_context.lifespan_context.vector_db
+        storage = ctx.request_context.lifespan_context.storage
+        
+        stats = await storage.write(
+            delete_rows, vector_db, source_id=source_id, batch_size=int(os.getenv("DELETE_BATCH_SIZE", "1000"))
+        )
+        await storage.delete_source_record(source_id)
+        
+        return json.dumps({
+            "success": True,
+            "source_id": source_id,
+            **stats
+        }, indent=2)
+    except Exception as e:
+        return json.dumps({
+            "success": False,
+            "source_id": source_id,
+            "error": str(e)
+        }, indent=2)
+
+@mcp.tool()
+async def prune_urls(ctx: Context, urls: List[str]) -> str:
+    """
+    Delete the stored chunks and code examples of specific URLs.
+    
+    Use this to drop pages that were removed or should no longer be searchable. Source
+    statistics are adjusted for the removed rows. Rows are removed in batches; if the deletion
+    is interrupted, calling this tool again continues with the remaining rows.
+    
+    Args:
+        ctx: The MCP server provided context
+        urls: List of page URLs to remove
+    
+    Returns:
+        JSON string with the number of rows removed and the deletion throughput
+    """
+    try:
+        vector_db = ctx.request_context.lifespan_context.vector_db
+        storage = ctx.request_context.lifespan_context.storage
+        
+        stats = await storage.write(
+            delete_rows, vector_db, urls=list(dict.fromkeys(urls)), batch_size=int(os.getenv("DELETE_BATCH_SIZE", "1000"))
+        )
+        
+        return json.dumps({
+            "success": True,
+            "urls": len(urls),
+            **stats
+        }, indent=2)
+    except Exception as e:
+        return json.dumps({
+            "success": False,
+            "error": str(e)
+        }, indent=2)
+
 @mcp.tool()
 async def get_available_sources(ctx: Context) -> str:
     """
-    Get all available sources from the sources table.
+    Get all available sources from the source registry.
     
     This tool returns a list of all unique sources (domains) that have been crawled and stored
     in the database, along with their summaries and statistics. This is useful for discovering 
@@ -740,26 +1189,11 @@ async def get_available_sources(ctx: Context) -> str:
         JSON string with the list of available sources and their details
     """
     try:
-        # Get the Supabase client from the context
-        supabase_client = ctx.request_context.lifespan_context.supabase_client
-        
-        # Query the sources table directly
-        result = supabase_client.from_('sources')\
-            .select('*')\
-            .order('source_id')\
-            .execute()
-        
-        # Format the sources with their details
-        sources = []
-        if result.data:
-            for source in result.data:
-                sources.append({
-                    "source_id": source.get("source_id"),
-                    "summary": source.get("summary"),
-                    "total_words": source.get("total_words"),
-                    "created_at": source.get("created_at"),
-                    "updated_at": source.get("updated_at")
-                })
+        # Get the storage layer from the context
+        storage = ctx.request_context.lifespan_context.storage
+        
+        # Query the source registry (the sources table on Supabase)
+        sources = await storage.list_sources()
         
         return json.dumps({
             "success": True,
@@ -772,6 +1206,36 @@ async def get_available_sources(ctx: Context) -> str:
             "error": str(e)
         }, indent=2)
 
+@mcp.tool()
+async def get_search_stats(ctx: Context) -> str:
+    """
+    Get hit rates of the RAG query caches, reranking latency and write buffer throughput.
+    
+    Reports the exact result cache (USE_QUERY_CACHE) and the semantic query cache
+    (USE_SEMANTIC_CACHE), including the false-hit rate measured on sampled semantic hits,
+    the batch sizes, p50/p99 latency and score cache hit rate of the reranking service
+    (USE_RERANKING), and the flush totals, pending rows and recent flushes of the
+    write-behind buffer (USE_WRITE_BUFFER).
+    A component that is disabled is reported as null.
+    
+    Args:
+        ctx: The MCP server provided context
+    
+    Returns:
+        JSON string with the statistics of each component
+    """
+    query_cache = get_query_cache()
+    semantic_cache = get_semantic_query_cache()
+    reranker = ctx.request_context.lifespan_context.reranker
+    write_buffer = get_write_buffer(ctx.request_context.lifespan_context.vector_db)
+    return json.dumps({
+        "success": True,
+        "query_cache": query_cache.stats() if query_cache is not None else None,
+        "semantic_cache": semantic_cache.stats() if semantic_cache is not None else None,
+        "reranking": reranker.stats() if reranker is not None else None,
+        "write_buffer": write_buffer.stats() if write_buffer is not None else None
+    }, indent=2)
+
 @mcp.tool()
 async def perform_rag_query(ctx: Context, query: str, source: str = None, match_count: int = 5) -> str:
     """
@@ -791,118 +1255,42 @@ async def perform_rag_query(ctx: Context, query: str, source: str = None, match_
         JSON string with the search results
     """
     try:
-        # Get the Supabase client from the context
-        supabase_client = ctx.request_context.lifespan_context.supabase_client
-        
         # Check if hybrid search is enabled
         use_hybrid_search = os.getenv("USE_HYBRID_SEARCH", "false") == "true"
         
         # Prepare filter if source is provided and not empty
-        filter_metadata = None
-        if source and source.strip():
-            filter_metadata = {"source": source}
-        
-        if use_hybrid_search:
-            # Hybrid search: combine vector and keyword search
-            
-            # 1. Get vector search results (get more to account for filtering)
-            vector_results = search_documents(
-                client=supabase_client,
-                query=query,
-                match_count=match_count * 2,  # Get double to have room for filtering
-                filter_metadata=filter_metadata
-            )
-            
-            # 2. Get keyword search results using ILIKE
-            keyword_query = supabase_client.from_('crawled_pages')\
-                .select('id, url, chunk_number, content, metadata, source_id')\
-                .ilike('content', f'%{query}%')
-            
-            # Apply source filter if provided
-            if source and source.strip():
-                keyword_query = keyword_query.eq('source_id', source)
-            
-            # Execute keyword search
-            keyword_response = keyword_query.limit(match_count * 2).execute()
-            keyword_results = keyword_response.data if keyword_response.data else []
-            
-            # 3. Combine results with preference for items appearing in both
-            seen_ids = set()
-            combined_results = []
-            
-            # First, add items that appear in both searches (these are the best matches)
-            vector_ids = {r.get('id') for r in vector_results if r.get('id')}
-            for kr in keyword_results:
-                if kr['id'] in vector_ids and kr['id'] not in seen_ids:
-                    # Find the vector result to get similarity score
-                    for vr in vector_results:
-                        if vr.get('id') == kr['id']:
-                            # Boost similarity score for items in both results
-                            vr['similarity'] = min(1.0, vr.get('similarity', 0) * 1.2)
-                            combined_results.append(vr)
-                            seen_ids.add(kr['id'])
-                            break
-            
-            # Then add remaining vector results (semantic matches without exact keyword)
-            for vr in vector_results:
-                if vr.get('id') and vr['id'] not in seen_ids and len(combined_results) < match_count:
-                    combined_results.append(vr)
-                    seen_ids.add(vr['id'])
-            
-            # Finally, add pure keyword matches if we still need more results
-            for kr in keyword_results:
-                if kr['id'] not in seen_ids and len(combined_results) < match_count:
-                    # Convert keyword result to match vector result format
-                    combined_results.append({
-                        'id': kr['id'],
-                        'url': kr['url'],
-                        'chunk_number': kr['chunk_number'],
-                        'content': kr['content'],
-                        'metadata': kr['metadata'],
-                        'source_id': kr['source_id'],
-                        'similarity': 0.5  # Default similarity for keyword-only matches
-                    })
-                    seen_ids.add(kr['id'])
-            
-            # Use combined results
-            results = combined_results[:match_count]
-            
-        else:
-            # Standard vector search only
-            results = search_documents(
-                client=supabase_client,
-                query=query,
-                match_count=match_count,
-                filter_metadata=filter_metadata
-            )
+        source_filter = source if source and source.strip() else None
         
         # Apply reranking if enabled
         use_reranking = os.getenv("USE_RERANKING", "false") == "true"
-        if use_reranking and ctx.request_context.lifespan_context.reranking_model:
-            results = rerank_results(ctx.request_context.lifespan_context.reranking_model, query, results, content_key="content")
+        reranker = ctx.request_context.lifespan_context.reranker if use_reranking else None
+        
+        # Hybrid search combines vector and keyword search, preferring items found by both.
+        # The legs run on the storage read pool so ingestions do not stall them.
+        results, latency_ms, cache = await run_cached_search(
+            ctx.request_context.lifespan_context.storage,
+            search_documents,
+            query,
+            match_count,
+            source_filter,
+            use_hybrid_search,
+            reranker,
+            semantic=True
+        )
         
         # Format the results
-        formatted_results = []
-        for result in results:
-            formatted_result = {
-                "url": result.get("url"),
-                "content": result.get("content"),
-                "metadata": result.get("metadata"),
-                "similarity": result.get("similarity")
-            }
-            # Include rerank score if available
-            if "rerank_score" in result:
-                formatted_result["rerank_score"] = result["rerank_score"]
-            formatted_results.append(formatted_result)
+        formatted_results = [format_document_result(result) for result in results]
         
         return json.dumps({
             "success": True,
             "query": query,
             "source_filter": source,
             "search_mode": "hybrid" if use_hybrid_search else "vector",
-            "reranking_applied": use_reranking and ctx.request_context.lifespan_context.reranking_model is not None,
+            "reranking_applied": reranker is not None,
             "results": formatted_results,
-            "count": len(formatted_results)
+            "count": len(formatted_results),
+            "latency_ms": latency_ms,
+            "cache": cache
         }, indent=2)
     except Exception as e:
         return json.dumps({
@@ -911,6 +1299,101 @@ async def perform_rag_query(ctx: Context, query: str, source: str = None, match_
             "error": str(e)
         }, indent=2)
 
+@mcp.tool()
+async def perform_rag_queries(ctx: Context, queries: List[str], sources: List[str] = None, match_count: int = 5, dedupe: bool = False) -> str:
+    """
+    Perform several RAG queries at once, e.g. the sub-questions of a larger question.
+    
+    All queries are embedded in one API call and searched concurrently; with reranking enabled,
+    all candidates are scored in one cross-encoder batch. Prefer this over several
+    perform_rag_query calls in a row.
+    
+    Args:
+        ctx: The MCP server provided context
+        queries: The search queries
+        sources: Optional source domain per query (same order as queries, '' for no filter)
+        match_count: Maximum number of results to return per query (default: 5)
+        dedupe: Return each chunk only once, under the first query that found it (default: False)
+    
+    Returns:
+        JSON string with the search results grouped by query
+    """
+    try:
+        if not queries:
+            return json.dumps({"success": False, "error": "No queries provided"}, indent=2)
+        sources = list(sources or [])
+        if len(sources) > len(queries):
+            return json.dumps({"success": False, "error": "More sources than queries provided"}, indent=2)
+        source_filters = [source if source and source.strip() else None for source in sources]
+        source_filters += [None] * (len(queries) - len(source_filters))
+        
+        storage = ctx.request_context.lifespan_context.storage
+        use_hybrid_search = os.getenv("USE_HYBRID_SEARCH", "false") == "true"
+        
+        # One embedding call for all queries, then every search runs concurrently
+        started = time.perf_counter()
+        embeddings = await storage.read(create_embeddings_batch, queries)
+        embedding_ms = round((time.perf_counter() - started) * 1000, 1)
+        searches = await asyncio.gather(*[
+            run_search_legs(
+                storage,
+                functools.partial(search_documents, query_embedding=embedding),
+                query,
+                match_count,
+                source_filter,
+                use_hybrid_search
+            )
+            for query, embedding, source_filter in zip(queries, embeddings, source_filters)
+        ])
+        groups = [results for results, _ in searches]
+        
+        # Apply reranking if enabled, scoring the candidates of all queries in one batch
+        use_reranking = os.getenv("USE_RERANKING", "false") == "true"
+        reranker = ctx.request_context.lifespan_context.reranker
+        reranking_ms = None
+        if use_reranking and reranker:
+            started = time.perf_counter()
+            groups = await rerank_result_groups(reranker, queries, groups, content_key="content")
+            reranking_ms = round((time.perf_counter() - started) * 1000, 1)
+        
+        duplicates_removed = 0
+        if dedupe:
+            seen = set()
+            for i, results in enumerate(groups):
+                unique = []
+                for result in results:
+                    key = result.get("id") or (result.get("url"), result.get("chunk_number"))
+                    if key not in seen:
+                        seen.add(key)
+                        unique.append(result)
+                duplicates_removed += len(results) - len(unique)
+                groups[i] = unique
+        
+        return json.dumps({
+            "success": True,
+            "search_mode": "hybrid" if use_hybrid_search else "vector",
+            "reranking_applied": use_reranking and reranker is not None,
+            "results": [
+                {
+                    "query": query,
+                    "source_filter": source_filter,
+                    "results": [format_document_result(result) for result in results],
+                    "count": len(results),
+                    "latency_ms": latency_ms
+                }
+                for query, source_filter, results, (_, latency_ms) in zip(queries, source_filters, groups, searches)
+            ],
+            "duplicates_removed": duplicates_removed,
+            "embedding_latency_ms": embedding_ms,
+            "reranking_latency_ms": reranking_ms
+        }, indent=2)
+    except Exception as e:
+        return json.dumps({
+            "success": False,
+            "queries": queries,
+            "error": str(e)
+        }, indent=2)
+
 @mcp.tool()
 async def search_code_examples(ctx: Context, query: str, source_id: str = None, match_count: int = 5) -> str:
     """
@@ -940,101 +1423,30 @@ async def search_code_examples(ctx: Context, query: str, source_id: str = None,
         }, indent=2)
     
     try:
-        # Get the Supabase client from the context
-        supabase_client = ctx.request_context.lifespan_context.supabase_client
-        
         # Check if hybrid search is enabled
         use_hybrid_search = os.getenv("USE_HYBRID_SEARCH", "false") == "true"
         
         # Prepare filter if source is provided and not empty
-        filter_metadata = None
-        if source_id and source_id.strip():
-            filter_metadata = {"source": source_id}
+        source_filter = source_id if source_id and source_id.strip() else None
         
-        if use_hybrid_search:
-            # Hybrid search: combine vector and keyword search
-            
-            # Import the search function from utils
-            from utils import search_code_examples as search_code_examples_impl
-            
-            # 1. Get vector search results (get more to account for filtering)
-            vector_results = search_code_examples_impl(
-                client=supabase_client,
-                query=query,
-                match_count=match_count * 2,  # Get double to have room for filtering
-                filter_metadata=filter_metadata
-            )
-            
-            # 2. Get keyword search results using ILIKE on both content and summary
-            keyword_query = supabase_client.from_('code_examples')\
-                .select('id, url, chunk_number, content, summary, metadata, source_id')\
-                .or_(f'content.ilike.%{query}%,summary.ilike.%{query}%')
-            
-            # Apply source filter if provided
-            if source_id and source_id.strip():
-                keyword_query = keyword_query.eq('source_id', source_id)
-            
-            # Execute keyword search
-            keyword_response = keyword_query.limit(match_count * 2).execute()
-            keyword_results = keyword_response.data if keyword_response.data else []
-            
-            # 3. Combine results with preference for items appearing in both
-            seen_ids = set()
-            combined_results = []
-            
-            # First, add items that appear in both searches (these are the best matches)
-            vector_ids = {r.get('id') for r in vector_results if r.get('id')}
-            for kr in keyword_results:
-                if kr['id'] in vector_ids and kr['id'] not in seen_ids:
-                    # Find the vector result to get similarity score
-                    for vr in vector_results:
-                        if vr.get('id') == kr['id']:
-                            # Boost similarity score for items in both results
-                            vr['similarity'] = min(1.0, vr.get('similarity', 0) * 1.2)
-                            combined_results.append(vr)
-                            seen_ids.add(kr['id'])
-                            break
-            
-            # Then add remaining vector results (semantic matches without exact keyword)
-            for vr in vector_results:
-                if vr.get('id') and vr['id'] not in seen_ids and len(combined_results) < match_count:
-                    combined_results.append(vr)
-                    seen_ids.add(vr['id'])
-            
-            # Finally, add pure keyword matches if we still need more results
-            for kr in keyword_results:
-                if kr['id'] not in seen_ids and len(combined_results) < match_count:
-                    # Convert keyword result to match vector result format
-                    combined_results.append({
-                        'id': kr['id'],
-                        'url': kr['url'],
-                        'chunk_number': kr['chunk_number'],
-                        'content': kr['content'],
-                        'summary': kr['summary'],
-                        'metadata': kr['metadata'],
-                        'source_id': kr['source_id'],
-                        'similarity': 0.5  # Default similarity for keyword-only matches
-                    })
-                    seen_ids.add(kr['id'])
-            
-            # Use combined results
-            results = combined_results[:match_count]
-            
-        else:
-            # Standard vector search only
-            from utils import search_code_examples as search_code_examples_impl
-            
-            results = search_code_examples_impl(
-                client=supabase_client,
-                query=query,
-                match_count=match_count,
-                filter_metadata=filter_metadata
-            )
+        # Import the search function from utils
+        from utils import search_code_examples as search_code_examples_impl
         
         # Apply reranking if enabled
         use_reranking = os.getenv("USE_RERANKING", "false") == "true"
-        if use_reranking and ctx.request_context.lifespan_context.reranking_model:
-            results = rerank_results(ctx.request_context.lifespan_context.reranking_model, query, results, content_key="content")
+        reranker = ctx.request_context.lifespan_context.reranker if use_reranking else None
+        
+        # Hybrid search also matches keywords in both content and summary
+        results, latency_ms, cache = await run_cached_search(
+            ctx.request_context.lifespan_context.storage,
+            search_code_examples_impl,
+            query,
+            match_count,
+            source_filter,
+            use_hybrid_search,
+            reranker,
+            collection_type="code"
+        )
         
         # Format the results
         formatted_results = []
@@ -1047,7 +1459,9 @@ async def search_code_examples(ctx: Context, query: str, source_id: str = None,
                 "source_id": result.get("source_id"),
                 "similarity": result.get("similarity")
             }
-            # Include rerank score if available
+            # Include fusion and rerank scores if available
+            if "rrf_score" in result:
+                formatted_result["rrf_score"] = result["rrf_score"]
             if "rerank_score" in result:
                 formatted_result["rerank_score"] = result["rerank_score"]
             formatted_results.append(formatted_result)
@@ -1057,9 +1471,11 @@ async def search_code_examples(ctx: Context, query: str, source_id: str = None,
             "query": query,
             "source_filter": source_id,
             "search_mode": "hybrid" if use_hybrid_search else "vector",
-            "reranking_applied": use_reranking and ctx.request_context.lifespan_context.reranking_model is not None,
+            "reranking_applied": reranker is not None,
             "results": formatted_results,
-            "count": len(formatted_results)
+            "count": len(formatted_results),
+            "latency_ms": latency_ms,
+            "cache": cache
         }, indent=2)
     except Exception as e:
         return json.dumps({
@@ -1841,6 +2257,32 @@ async def crawl_recursive_internal_links(crawler: AsyncWebCrawler, start_urls: L
 
     return results_all
 
+async def crawl_by_url_type(crawler: AsyncWebCrawler, url: str, max_depth: int = 3, max_concurrent: int = 10) -> Tuple[List[Dict[str, Any]], str]:
+    """
+    Crawl a URL with the strategy matching its type (text file, sitemap or regular webpage).
+    
+    Args:
+        crawler: AsyncWebCrawler instance
+        url: URL to crawl
+        max_depth: Maximum recursion depth for regular URLs
+        max_concurrent: Maximum number of concurrent browser sessions
+        
+    Returns:
+        Tuple of the crawl results (URL and markdown content) and the crawl type
+    """
+    if is_txt(url):
+        # For text files, use simple crawl
+        return await crawl_markdown_file(crawler, url), "text_file"
+    elif is_sitemap(url):
+        # For sitemaps, extract URLs and crawl in parallel
+        sitemap_urls = parse_sitemap(url)
+        if not sitemap_urls:
+            raise ValueError("No URLs found in sitemap")
+        return await crawl_batch(crawler, sitemap_urls, max_concurrent=max_concurrent), "sitemap"
+    else:
+        # For regular URLs, use recursive crawl
+        return await crawl_recursive_internal_links(crawler, [url], max_depth=max_depth, max_concurrent=max_concurrent), "webpage"
+
 async def main():
     transport = os.getenv("TRANSPORT", "sse")
     if transport == 'sse':
@@ -0,0 +1,72 @@
+"""
+Process-wide worker pool for LLM enrichment calls (contextual embeddings, code and source summaries).
+
+A single long-lived pool is shared by every batch, document and tool call, so LLM requests stay
+saturated for the whole ingestion instead of collapsing at every batch boundary.
+"""
+from typing import Any, Callable, Iterable, List, Optional
+import asyncio
+import concurrent.futures
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class EnrichmentPool:
+    """Long-lived thread pool with sync and async helpers for blocking calls (LLM requests by default)"""
+
+    def __init__(self, max_workers: int = 10, name: str = "enrichment"):
+        self.max_workers = max_workers
+        self.name = name
+        self.executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix=name
+        )
+        logger.info(f"{name.capitalize()} pool started with {max_workers} workers")
+
+    def submit(self, fn: Callable[..., Any], *args: Any) -> concurrent.futures.Future:
+        """Schedule fn(*args) on the pool and return its future."""
+        return self.executor.submit(fn, *args)
+
+    def map(self, fn: Callable[[Any], Any], items: Iterable[Any]) -> List[Any]:
+        """Run fn over items on the pool, blocking until all results are available (in order)."""
+        futures = [self.executor.submit(fn, item) for item in items]
+        return [future.result() for future in futures]
+
+    async def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """Run fn(*args) on the pool without blocking the event loop."""
+        return await asyncio.wrap_future(self.executor.submit(fn, *args))
+
+    async def map_async(self, fn: Callable[[Any], Any], items: Iterable[Any]) -> List[Any]:
+        """Run fn over items on the pool without blocking the event loop (results in order)."""
+        futures = [asyncio.wrap_future(self.executor.submit(fn, item)) for item in items]
+        return list(await asyncio.gather(*futures))
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Stop accepting work and optionally wait for in-flight calls to finish."""
+        self.executor.shutdown(wait=wait)
+
+
+_enrichment_pool: Optional[EnrichmentPool] = None
+_enrichment_pool_lock = threading.Lock()
+
+
+def get_enrichment_pool() -> EnrichmentPool:
+    """Return the shared enrichment pool, sized by ENRICHMENT_CONCURRENCY (default: 10)."""
+    global _enrichment_pool
+    with _enrichment_pool_lock:
+        if _enrichment_pool is None:
+            max_workers = max(1, int(os.getenv("ENRICHMENT_CONCURRENCY", "10")))
+            _enrichment_pool = EnrichmentPool(max_workers=max_workers)
+        return _enrichment_pool
+
+
+def shutdown_enrichment_pool(wait: bool = True) -> None:
+    """Shut down the shared enrichment pool if it was started."""
+    global _enrichment_pool
+    with _enrichment_pool_lock:
+        if _enrichment_pool is not None:
+            _enrichment_pool.shutdown(wait=wait)
+            _enrichment_pool = None
@@ -0,0 +1,153 @@
+"""
+Persistent cache for LLM outputs used during ingestion (contextual embeddings and summaries).
+
+Entries are keyed by (model, prompt template version, hash of the document, hash of the
+chunk/code) so unchanged content reuses prior outputs across re-crawls. The cache lives in a
+small SQLite file and is bounded by entry count, evicting the least recently used entries.
+"""
+from typing import Optional, Dict, Any
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Bump a version whenever the corresponding prompt changes so stale outputs are not reused
+CONTEXTUAL_PROMPT_VERSION = "contextual-v1"
+CODE_SUMMARY_PROMPT_VERSION = "code-summary-v1"
+SOURCE_SUMMARY_PROMPT_VERSION = "source-summary-v1"
+
+
+def content_hash(text: str) -> str:
+    """Return a stable hash of a piece of text."""
+    return hashlib.sha256(text.encode("utf-8", errors="replace")).hexdigest()
+
+
+class LLMCache:
+    """SQLite-backed LLM output cache with size-bounded LRU eviction"""
+
+    def __init__(self, path: str = "./data/llm_cache.db", max_entries: int = 100000):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS llm_outputs (
+                cache_key TEXT PRIMARY KEY,
+                output TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_used REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_outputs_last_used ON llm_outputs (last_used)")
+        self._conn.commit()
+
+        self._writes_since_eviction = 0
+        self._eviction_interval = max(1, min(100, max_entries // 10))
+        self.hits = 0
+        self.misses = 0
+
+        logger.info(f"LLM cache initialized at {path} (max {max_entries} entries)")
+
+    @staticmethod
+    def make_key(model: Optional[str], template_version: str, document: str, item: str = "") -> str:
+        """Build the cache key for a prompt from its model, template version and inputs."""
+        return "|".join([model or "", template_version, content_hash(document), content_hash(item)])
+
+    def get(self, model: Optional[str], template_version: str, document: str, item: str = "") -> Optional[str]:
+        """Return the cached output for the given inputs, or None on a miss."""
+        key = self.make_key(model, template_version, document, item)
+        try:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT output FROM llm_outputs WHERE cache_key = ?", (key,)
+                ).fetchone()
+                if row is None:
+                    self.misses += 1
+                    return None
+                self._conn.execute(
+                    "UPDATE llm_outputs SET last_used = ? WHERE cache_key = ?", (time.time(), key)
+                )
+                self._conn.commit()
+                self.hits += 1
+                return row[0]
+        except sqlite3.Error as e:
+            logger.error(f"Error reading from LLM cache: {e}")
+            return None
+
+    def put(self, model: Optional[str], template_version: str, document: str, item: str, output: str) -> None:
+        """Store an LLM output for the given inputs."""
+        key = self.make_key(model, template_version, document, item)
+        now = time.time()
+        try:
+            with self._lock:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO llm_outputs (cache_key, output, created_at, last_used) VALUES (?, ?, ?, ?)",
+                    (key, output, now, now)
+                )
+                self._conn.commit()
+                self._writes_since_eviction += 1
+                # Check the size bound periodically rather than on every write
+                if self._writes_since_eviction >= self._eviction_interval:
+                    self._evict()
+                    self._writes_since_eviction = 0
+        except sqlite3.Error as e:
+            logger.error(f"Error writing to LLM cache: {e}")
+
+    def _evict(self) -> None:
+        """Delete the least recently used entries above max_entries. Caller holds the lock."""
+        count = self._conn.execute("SELECT COUNT(*) FROM llm_outputs").fetchone()[0]
+        excess = count - self.max_entries
+        if excess > 0:
+            self._conn.execute(
+                "DELETE FROM llm_outputs WHERE cache_key IN "
+                "(SELECT cache_key FROM llm_outputs ORDER BY last_used ASC LIMIT ?)",
+                (excess,)
+            )
+            self._conn.commit()
+            logger.info(f"Evicted {excess} entries from LLM cache")
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and the current number of entries."""
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM llm_outputs").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "entries": entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
+
+
+_llm_cache: Optional[LLMCache] = None
+_llm_cache_lock = threading.Lock()
+
+
+def get_llm_cache() -> Optional[LLMCache]:
+    """Return the process-wide LLM cache, or None if USE_LLM_CACHE is not enabled."""
+    global _llm_cache
+    if os.getenv("USE_LLM_CACHE", "false") != "true":
+        return None
+
+    with _llm_cache_lock:
+        if _llm_cache is None:
+            try:
+                _llm_cache = LLMCache(
+                    path=os.getenv("LLM_CACHE_PATH", "./data/llm_cache.db"),
+                    max_entries=int(os.getenv("LLM_CACHE_MAX_ENTRIES", "100000"))
+                )
+            except Exception as e:
+                logger.error(f"Failed to initialize LLM cache: {e}")
+                return None
+        return _llm_cache
@@ -0,0 +1,593 @@
+"""
+Embedded vector store for single-node deployments (VECTOR_DB=local).
+
+Each collection keeps its L2-normalized float32 embeddings in an append-only file that is
+memory-mapped on demand, and its rows (url, chunk, content, metadata, slot in the vector
+file) in SQLite. Collections up to exact_search_max_rows rows are searched exactly with one
+vectorized dot product; larger ones use an HNSW graph (hnswlib, optional) stored next to the
+vector file and extended incrementally. Nothing is loaded at startup, and any number of
+processes can read the same directory while one process at a time writes: readers only map
+the slots committed in SQLite, so appends in flight are never visible.
+"""
+from typing import Any, Dict, List, Optional
+import json
+import logging
+import os
+import sqlite3
+import threading
+
+import numpy as np
+
+from source_registry import SourceRegistry
+from vector_db_adapter import VectorDBAdapter, rows_from_embeddings
+
+try:
+    import fcntl
+except ImportError:  # Windows: writers are only serialized within the process
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+TABLES = {"content": "crawled_pages", "code": "code_examples"}
+
+
+class _FileLock:
+    """Exclusive lock on a file, serializing writers across processes"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.handle = None
+
+    def __enter__(self):
+        self.handle = open(self.path, "a")
+        if fcntl is not None:
+            fcntl.flock(self.handle, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if fcntl is not None:
+            fcntl.flock(self.handle, fcntl.LOCK_UN)
+        self.handle.close()
+
+
+class _CollectionCache:
+    """Per-process view of one collection: memory map, live slots and HNSW graph"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.version = None
+        self.vectors = None
+        self.generation = None
+        self.live_slots = None
+        self.alive = None
+        self.index = None
+
+
+class MmapVectorAdapter(VectorDBAdapter):
+    """Vector store backed by memory-mapped NumPy files and SQLite, with no external services"""
+
+    # Vectors copied per step while building or extending an HNSW graph
+    INDEX_BUILD_STEP = 50_000
+
+    def __init__(self, directory: str = "./data/vectors", exact_search_max_rows: int = 50_000, hnsw_ef_search: int = 128, compact_min_dead_rows: int = 10_000):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.exact_search_max_rows = exact_search_max_rows
+        self.hnsw_ef_search = hnsw_ef_search
+        self.compact_min_dead_rows = compact_min_dead_rows
+
+        self._db_path = os.path.join(directory, "metadata.db")
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        self._caches = {collection_type: _CollectionCache() for collection_type in TABLES}
+
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        for table in TABLES.values():
+            conn.execute(
+                f"""
+                CREATE TABLE IF NOT EXISTS {table} (
+                    slot INTEGER PRIMARY KEY,
+                    url TEXT NOT NULL,
+                    chunk_number INTEGER NOT NULL,
+                    content TEXT,
+                    summary TEXT,
+                    metadata TEXT NOT NULL,
+                    source_id TEXT,
+                    word_count INTEGER NOT NULL DEFAULT 0,
+                    code_hash TEXT,
+                    UNIQUE (url, chunk_number)
+                )
+                """
+            )
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {table}_source_id ON {table} (source_id)")
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {table}_code_hash ON {table} (code_hash)")
+        # vector_count slots of the current vector file are committed; version changes on compaction
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS collections (
+                name TEXT PRIMARY KEY,
+                dimension INTEGER,
+                vector_count INTEGER NOT NULL DEFAULT 0,
+                generation INTEGER NOT NULL DEFAULT 0,
+                version INTEGER NOT NULL DEFAULT 0
+            )
+            """
+        )
+        conn.executemany("INSERT OR IGNORE INTO collections (name) VALUES (?)", [(table,) for table in TABLES.values()])
+        conn.commit()
+
+        self.source_registry = SourceRegistry(os.path.join(directory, "source_registry.db"))
+        if self.source_registry.is_empty() and any(self._state(table)["vector_count"] for table in TABLES.values()):
+            self.rebuild_source_registry()
+
+        logger.info(f"Local vector store initialized in {directory}")
+
+    def _conn(self) -> sqlite3.Connection:
+        """Return this thread's SQLite connection"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self._db_path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    def _state(self, table: str) -> Dict[str, Any]:
+        row = self._conn().execute(
+            "SELECT dimension, vector_count, generation, version FROM collections WHERE name = ?", (table,)
+        ).fetchone()
+        return dict(row)
+
+    def _path(self, table: str, version: int, suffix: str) -> str:
+        return os.path.join(self.directory, f"{table}.{version}.{suffix}")
+
+    @staticmethod
+    def _normalize(embeddings) -> np.ndarray:
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        if vectors.ndim == 1:
+            vectors = vectors.reshape(1, -1)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    @staticmethod
+    def _from_row(row: sqlite3.Row, include_content: bool = True) -> Dict[str, Any]:
+        result = {
+            "id": row["slot"],
+            "url": row["url"],
+            "chunk_number": row["chunk_number"],
+            "metadata": json.loads(row["metadata"]),
+            "source_id": row["source_id"]
+        }
+        if include_content:
+            result["content"] = row["content"]
+            if row["summary"] is not None:
+                result["summary"] = row["summary"]
+        return result
+
+    def _writing(self) -> _FileLock:
+        return _FileLock(os.path.join(self.directory, "write.lock"))
+
+    @staticmethod
+    def _registry_deltas(deltas: Dict[str, Dict[str, int]], rows, sign: int, collection_type: str) -> None:
+        """Accumulate source registry deltas for rows being written (+1) or removed (-1)"""
+        count_column = "code_example_count" if collection_type == "code" else "chunk_count"
+        for row in rows:
+            if not row["source_id"]:
+                continue
+            delta = deltas.setdefault(row["source_id"], {})
+            delta[count_column] = delta.get(count_column, 0) + sign
+            if collection_type != "code":
+                delta["total_word_count"] = delta.get("total_word_count", 0) + sign * int(row["word_count"] or 0)
+
+    def upsert_rows(self, rows: List[Dict[str, Any]], collection_type: str = "content") -> int:
+        """Append the rows' vectors and replace any stored rows with the same (url, chunk_number)"""
+        if not rows:
+            return 0
+        # The last row for a key wins
+        rows = list({(row["url"], row["chunk_number"]): row for row in rows}.values())
+        table = TABLES[collection_type]
+        vectors = self._normalize([row["embedding"] for row in rows])
+
+        with self._write_lock, self._writing():
+            conn = self._conn()
+            state = self._state(table)
+            dimension = state["dimension"] or vectors.shape[1]
+            if vectors.shape[1] != dimension:
+                raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match the {table} collection ({dimension})")
+
+            # Drop bytes of an append that never committed, then append the new vectors
+            path = self._path(table, state["version"], "f32")
+            first_slot = state["vector_count"]
+            with open(path, "ab") as f:
+                f.truncate(first_slot * dimension * 4)
+                f.write(vectors.tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+
+            keys = [(row["url"], row["chunk_number"]) for row in rows]
+            records = []
+            for i, row in enumerate(rows):
+                metadata = row.get("metadata") or {}
+                records.append((
+                    first_slot + i, row["url"], row["chunk_number"], row.get("content"), row.get("summary"),
+                    json.dumps(metadata), row.get("source_id"), int(metadata.get("word_count") or 0),
+                    metadata.get("code_hash")
+                ))
+
+            deltas: Dict[str, Dict[str, int]] = {}
+            with conn:
+                replaced = []
+                for i in range(0, len(keys), 400):
+                    batch = keys[i:i + 400]
+                    placeholders = ", ".join("(?, ?)" for _ in batch)
+                    params = [value for key in batch for value in key]
+                    replaced.extend(conn.execute(
+                        f"SELECT source_id, word_count FROM {table} WHERE (url, chunk_number) IN (VALUES {placeholders})",
+                        params
+                    ).fetchall())
+                    conn.execute(f"DELETE FROM {table} WHERE (url, chunk_number) IN (VALUES {placeholders})", params)
+                conn.executemany(
+                    f"INSERT INTO {table} (slot, url, chunk_number, content, summary, metadata, source_id, word_count, code_hash) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    records
+                )
+                conn.execute(
+                    "UPDATE collections SET dimension = ?, vector_count = ?, generation = generation + 1 WHERE name = ?",
+                    (dimension, first_slot + len(rows), table)
+                )
+            self._registry_deltas(deltas, replaced, -1, collection_type)
+            self._registry_deltas(deltas, [{"source_id": r[6], "word_count": r[7]} for r in records], 1, collection_type)
+            self.source_registry.apply_deltas(deltas)
+
+            if len(replaced) and self._dead_rows(table) >= self.compact_min_dead_rows:
+                self._compact(collection_type)
+        return len(rows)
+
+    def _delete(self, collection_type: str, column: str, values: List[Any]) -> int:
+        table = TABLES[collection_type]
+        removed = []
+        with self._write_lock, self._writing():
+            conn = self._conn()
+            with conn:
+                for i in range(0, len(values), 500):
+                    batch = values[i:i + 500]
+                    placeholders = ", ".join("?" for _ in batch)
+                    removed.extend(conn.execute(
+                        f"SELECT source_id, word_count FROM {table} WHERE {column} IN ({placeholders})", batch
+                    ).fetchall())
+                    conn.execute(f"DELETE FROM {table} WHERE {column} IN ({placeholders})", batch)
+                if removed:
+                    conn.execute("UPDATE collections SET generation = generation + 1 WHERE name = ?", (table,))
+            deltas: Dict[str, Dict[str, int]] = {}
+            self._registry_deltas(deltas, removed, -1, collection_type)
+            self.source_registry.apply_deltas(deltas)
+            if removed and self._dead_rows(table) >= self.compact_min_dead_rows:
+                self._compact(collection_type)
+        return len(removed)
+
+    def _dead_rows(self, table: str) -> int:
+        """Return how many slots of the vector file no longer belong to a row"""
+        live = self._conn().execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+        return self._state(table)["vector_count"] - live
+
+    def compact(self, collection_type: str = "content") -> None:
+        """
+        Rewrite a collection's vector file without the slots of replaced and deleted rows, then
+        build its HNSW graph if the collection is searched through one, so the first search after
+        compaction does not have to.
+        """
+        with self._write_lock, self._writing():
+            self._compact(collection_type)
+        state = self._state(TABLES[collection_type])
+        if state["vector_count"]:
+            cache = self._view(collection_type, state)
+            if len(cache.live_slots) > self.exact_search_max_rows:
+                self._hnsw(collection_type, cache, state)
+
+    def _compact(self, collection_type: str) -> None:
+        """Compact a collection; the caller holds the write locks"""
+        table = TABLES[collection_type]
+        conn = self._conn()
+        state = self._state(table)
+        if not state["dimension"]:
+            return
+        slots = np.array([row[0] for row in conn.execute(f"SELECT slot FROM {table} ORDER BY slot")], dtype=np.int64)
+        old_path = self._path(table, state["version"], "f32")
+        new_path = self._path(table, state["version"] + 1, "f32")
+        old_vectors = np.memmap(old_path, dtype=np.float32, mode="r", shape=(state["vector_count"], state["dimension"]))
+        with open(new_path, "wb") as f:
+            for i in range(0, len(slots), self.INDEX_BUILD_STEP):
+                f.write(np.ascontiguousarray(old_vectors[slots[i:i + self.INDEX_BUILD_STEP]]).tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        del old_vectors
+
+        # Slots only move down and are renumbered in ascending order, so no two rows collide
+        with conn:
+            conn.executemany(
+                f"UPDATE {table} SET slot = ? WHERE slot = ?",
+                [(new_slot, int(old_slot)) for new_slot, old_slot in enumerate(slots) if new_slot != old_slot]
+            )
+            conn.execute(
+                "UPDATE collections SET vector_count = ?, version = version + 1, generation = generation + 1 WHERE name = ?",
+                (len(slots), table)
+            )
+        # Readers that still map the old files keep their (unlinked) inode until they remap
+        for suffix in ("f32", "hnsw"):
+            path = self._path(table, state["version"], suffix)
+            if os.path.exists(path):
+                os.remove(path)
+        logger.info(f"Compacted {table} vectors from {state['vector_count']} to {len(slots)} slots")
+
+    def store_embeddings(self, documents: List[str], embeddings: List[List[float]], metadata: List[Dict], collection_type: str = "content") -> None:
+        """Store documents with embeddings in the local vector store"""
+        try:
+            written = self.upsert_rows(rows_from_embeddings(documents, embeddings, metadata, collection_type), collection_type)
+            logger.info(f"Stored {written} documents in local {TABLES[collection_type]} collection")
+        except Exception as e:
+            logger.error(f"Error storing embeddings in local vector store: {e}")
+            raise
+
+    def delete_by_ids(self, ids: List[Any], collection_type: str = "content") -> int:
+        """Delete rows by id (vector slot) from the local vector store"""
+        if not ids:
+            return 0
+        return self._delete(collection_type, "slot", [int(row_id) for row_id in ids])
+
+    def delete_by_urls(self, urls: List[str], collection_type: str = "content") -> None:
+        """Delete every row stored for the given URLs from the local vector store"""
+        if urls:
+            self._delete(collection_type, "url", list(urls))
+
+    def delete_batch(self, collection_type: str = "content", source_id: Optional[str] = None, urls: Optional[List[str]] = None, batch_size: int = 1000) -> int:
+        """Delete up to batch_size rows of a source and/or a list of URLs, lowest slots first"""
+        conditions, params = [], []
+        if source_id is not None:
+            conditions.append("source_id = ?")
+            params.append(source_id)
+        if urls is not None:
+            conditions.append(f"url IN ({', '.join('?' for _ in urls)})")
+            params.extend(urls)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        slots = [row[0] for row in self._conn().execute(
+            f"SELECT slot FROM {TABLES[collection_type]} {where} ORDER BY slot LIMIT ?", params + [batch_size]
+        )]
+        if not slots:
+            return 0
+        return self._delete(collection_type, "slot", slots)
+
+    def delete_source_record(self, source_id: str) -> None:
+        """Delete a source from the source registry"""
+        self.source_registry.delete_source(source_id)
+
+    def update_metadata(self, row_id: Any, metadata: Dict[str, Any], collection_type: str = "content") -> None:
+        """Replace the metadata of a stored row in the local vector store"""
+        with self._write_lock:
+            conn = self._conn()
+            with conn:
+                conn.execute(f"UPDATE {TABLES[collection_type]} SET metadata = ? WHERE slot = ?", (json.dumps(metadata), int(row_id)))
+
+    def update_sources(self, updates: Dict[str, Dict[str, Any]]) -> None:
+        """Set source summaries in the source registry
+
+        Counts are already applied as rows are written and deleted, so the deltas are ignored.
+        """
+        self.source_registry.set_summaries({
+            source_id: update["summary"] for source_id, update in updates.items() if update.get("summary") is not None
+        })
+
+    def recompute_source_stats(self, source_ids: Optional[List[str]] = None) -> None:
+        """Recompute the source registry from the stored rows"""
+        self.rebuild_source_registry()
+
+    def rebuild_source_registry(self) -> None:
+        """Recompute the source registry counts with one aggregate query per collection"""
+        counts: Dict[str, Dict[str, int]] = {}
+        conn = self._conn()
+        for collection_type, table in TABLES.items():
+            count_column = "code_example_count" if collection_type == "code" else "chunk_count"
+            for source_id, rows, words in conn.execute(
+                f"SELECT source_id, COUNT(*), SUM(word_count) FROM {table} WHERE source_id IS NOT NULL GROUP BY source_id"
+            ):
+                source_counts = counts.setdefault(source_id, {})
+                source_counts[count_column] = rows
+                if collection_type != "code":
+                    source_counts["total_word_count"] = int(words or 0)
+        self.source_registry.replace_counts(counts)
+        logger.info(f"Rebuilt local source registry for {len(counts)} sources")
+
+    def _view(self, collection_type: str, state: Dict[str, Any]) -> _CollectionCache:
+        """Bring the process-local cache of a collection up to date with the committed state"""
+        table = TABLES[collection_type]
+        cache = self._caches[collection_type]
+        with cache.lock:
+            if cache.version != state["version"]:
+                cache.version = state["version"]
+                cache.vectors = None
+                cache.index = None
+                cache.generation = None
+            if cache.vectors is None or len(cache.vectors) < state["vector_count"]:
+                cache.vectors = np.memmap(
+                    self._path(table, state["version"], "f32"), dtype=np.float32, mode="r",
+                    shape=(state["vector_count"], state["dimension"])
+                )
+            if cache.generation != state["generation"]:
+                slots = np.array([row[0] for row in self._conn().execute(f"SELECT slot FROM {table}")], dtype=np.int64)
+                # Rows committed after state was read point past the mapped vectors
+                slots = slots[slots < state["vector_count"]]
+                alive = np.zeros(state["vector_count"], dtype=bool)
+                alive[slots] = True
+                cache.live_slots, cache.alive, cache.generation = slots, alive, state["generation"]
+        return cache
+
+    def _hnsw(self, collection_type: str, cache: _CollectionCache, state: Dict[str, Any]):
+        """Load, extend and persist the collection's HNSW graph, or return None without hnswlib"""
+        try:
+            import hnswlib
+        except ImportError:
+            return None
+        count = state["vector_count"]
+        with cache.lock:
+            index = cache.index
+            path = self._path(TABLES[collection_type], state["version"], "hnsw")
+            if index is None:
+                index = hnswlib.Index(space="ip", dim=state["dimension"])
+                if os.path.exists(path):
+                    index.load_index(path, max_elements=count)
+                else:
+                    index.init_index(max_elements=count, ef_construction=200, M=16)
+            indexed = index.get_current_count()
+            if indexed < count:
+                if count - indexed > self.INDEX_BUILD_STEP:
+                    logger.warning(
+                        f"Adding {count - indexed} vectors to the {TABLES[collection_type]} HNSW graph; "
+                        "searches wait until this finishes (run compact() ahead of time to avoid it)"
+                    )
+                if index.get_max_elements() < count:
+                    index.resize_index(count)
+                for start in range(indexed, count, self.INDEX_BUILD_STEP):
+                    end = min(start + self.INDEX_BUILD_STEP, count)
+                    index.add_items(np.asarray(cache.vectors[start:end]), np.arange(start, end))
+                # Written atomically so concurrent readers in other processes never load a partial file
+                tmp_path = f"{path}.{os.getpid()}.tmp"
+                index.save_index(tmp_path)
+                os.replace(tmp_path, path)
+                logger.info(f"Indexed {count - indexed} vectors in the {TABLES[collection_type]} HNSW graph")
+            cache.index = index
+        return index
+
+    def _top_slots(self, collection_type: str, query: np.ndarray, limit: int, source_filter: Optional[str]):
+        """Return (slots, similarities) of the best matches, best first"""
+        table = TABLES[collection_type]
+        state = self._state(table)
+        if not state["vector_count"]:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        cache = self._view(collection_type, state)
+        vectors = cache.vectors
+
+        if source_filter:
+            candidates = np.array(
+                [row[0] for row in self._conn().execute(f"SELECT slot FROM {table} WHERE source_id = ?", (source_filter,))],
+                dtype=np.int64
+            )
+            candidates.sort()
+            scores = vectors[candidates] @ query if len(candidates) else np.empty(0, dtype=np.float32)
+        elif len(cache.live_slots) <= self.exact_search_max_rows or (index := self._hnsw(collection_type, cache, state)) is None:
+            candidates = cache.live_slots
+            scores = (vectors[:state["vector_count"]] @ query)[candidates]
+        else:
+            # Replaced and deleted slots stay in the graph; over-fetch and drop them
+            k = min(max(limit * 2, limit + 10), index.get_current_count())
+            while True:
+                index.set_ef(max(self.hnsw_ef_search, k))
+                labels, distances = index.knn_query(query, k=k)
+                labels, distances = labels[0].astype(np.int64), distances[0]
+                # A graph saved by another process can hold slots this one has not committed yet
+                keep = labels < len(cache.alive)
+                keep[keep] = cache.alive[labels[keep]]
+                if keep.sum() >= limit or k >= index.get_current_count():
+                    # hnswlib's "ip" space returns 1 - dot product
+                    return labels[keep][:limit], (1.0 - distances[keep])[:limit]
+                k = min(k * 4, index.get_current_count())
+
+        if len(scores) > limit:
+            top = np.argpartition(-scores, limit)[:limit]
+        else:
+            top = np.arange(len(scores))
+        top = top[np.argsort(-scores[top])]
+        return candidates[top], scores[top]
+
+    def search_similar(self, query_embedding: List[float], limit: int = 10, source_filter: Optional[str] = None, collection_type: str = "content") -> List[Dict]:
+        """Search for similar documents in the local vector store"""
+        try:
+            slots, scores = self._top_slots(collection_type, self._normalize(query_embedding)[0], limit, source_filter)
+            rows = self._rows_by_slot([int(slot) for slot in slots], collection_type)
+            results = []
+            for slot, score in zip(slots, scores):
+                row = rows.get(int(slot))
+                # A concurrent write may have replaced the row since the slots were read
+                if row is not None:
+                    row["similarity"] = float(score)
+                    results.append(row)
+            return results
+        except Exception as e:
+            logger.error(f"Error searching local vector store: {e}")
+            return []
+
+    def _rows_by_slot(self, slots: List[int], collection_type: str) -> Dict[int, Dict[str, Any]]:
+        if not slots:
+            return {}
+        placeholders = ", ".join("?" for _ in slots)
+        rows = self._conn().execute(f"SELECT * FROM {TABLES[collection_type]} WHERE slot IN ({placeholders})", slots)
+        return {row["slot"]: self._from_row(row) for row in rows}
+
+    def get_sources(self) -> List[str]:
+        """Get list of available sources from the source registry"""
+        try:
+            return self.source_registry.source_ids()
+        except Exception as e:
+            logger.error(f"Error getting sources from local vector store: {e}")
+            return []
+
+    def list_sources(self) -> List[Dict[str, Any]]:
+        """List sources from the source registry"""
+        try:
+            return self.source_registry.list_sources()
+        except Exception as e:
+            logger.error(f"Error listing sources from local vector store: {e}")
+            return []
+
+    def get_rows_by_url(self, urls: List[str], collection_type: str = "content") -> List[Dict[str, Any]]:
+        """Get stored rows for the given URLs (without content or embeddings)"""
+        results = []
+        for i in range(0, len(urls), 500):
+            batch = urls[i:i + 500]
+            placeholders = ", ".join("?" for _ in batch)
+            rows = self._conn().execute(
+                f"SELECT slot, url, chunk_number, metadata, source_id FROM {TABLES[collection_type]} WHERE url IN ({placeholders})",
+                batch
+            )
+            results.extend(self._from_row(row, include_content=False) for row in rows)
+        return results
+
+    def find_code_examples_by_hash(self, code_hashes: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Look up stored code examples by normalized code hash"""
+        if not code_hashes:
+            return {}
+        try:
+            placeholders = ", ".join("?" for _ in code_hashes)
+            rows = self._conn().execute(
+                f"SELECT * FROM code_examples WHERE code_hash IN ({placeholders})", list(code_hashes)
+            ).fetchall()
+            state = self._state("code_examples")
+            vectors = self._view("code", state).vectors if rows else None
+        except Exception as e:
+            logger.error(f"Error looking up code examples in local vector store: {e}")
+            return {}
+        stored = {}
+        for row in rows:
+            result = self._from_row(row)
+            result["embedding"] = [float(v) for v in vectors[row["slot"]]]
+            stored.setdefault(row["code_hash"], result)
+        return stored
+
+    def keyword_search(self, query: str, limit: int = 10, source_filter: Optional[str] = None, collection_type: str = "content") -> List[Dict]:
+        """Search for rows containing the query text (case-insensitive)"""
+        pattern = "%" + query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+        condition = "content LIKE ? ESCAPE '\\'"
+        params: List[Any] = [pattern]
+        if collection_type == "code":
+            condition = f"({condition} OR summary LIKE ? ESCAPE '\\')"
+            params.append(pattern)
+        if source_filter:
+            condition += " AND source_id = ?"
+            params.append(source_filter)
+        try:
+            rows = self._conn().execute(
+                f"SELECT * FROM {TABLES[collection_type]} WHERE {condition} LIMIT ?", params + [limit]
+            )
+            return [self._from_row(row) for row in rows]
+        except Exception as e:
+            logger.error(f"Error running keyword search in local vector store: {e}")
+            return []
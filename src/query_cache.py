@@ -0,0 +1,218 @@
+"""
+Process-wide cache of RAG search results.
+
+Results are cached per (kind, query, source filter, match_count, search mode, reranking) and
+stamped with the write generation of what they were computed from: the source's counter for
+a source-filtered search, or the counter of all writes for an unfiltered one. Adapters bump
+the counters after every write (see VectorDBAdapter.generations), so an entry is served only
+while nothing it depends on has changed since the search started. Writes made by other
+processes are not seen, so the cache is opt-in (USE_QUERY_CACHE).
+
+The semantic cache extends this to rephrasings: it keeps the embeddings of recent queries in a
+small matrix and reuses the results of the most similar previous query with the same scope
+(source filter, match_count, mode, reranking) and a still-current generation.
+"""
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Tuple
+import os
+import random
+import threading
+
+import numpy as np
+
+
+class SourceGenerations:
+    """Write generation counters per source, plus one for every write"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # Bumped when a write could have touched any source
+        self._epoch = 0
+        self._writes = 0
+        self._sources: Dict[str, int] = {}
+
+    def bump(self, source_ids: Optional[Iterable[str]] = None) -> None:
+        """Record a completed write to the given sources (None: sources unknown, invalidate all)."""
+        with self._lock:
+            self._writes += 1
+            if source_ids is None:
+                self._epoch += 1
+                return
+            for source_id in source_ids:
+                self._sources[source_id] = self._sources.get(source_id, 0) + 1
+
+    def token(self, source_id: Optional[str] = None) -> Tuple[int, int]:
+        """Return the generation a search of the source (or of all sources if None) depends on."""
+        with self._lock:
+            if source_id is None:
+                return self._epoch, self._writes
+            return self._epoch, self._sources.get(source_id, 0)
+
+
+class QueryResultCache:
+    """Bounded LRU cache of search results, validated against write generations"""
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max(1, max_entries)
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Hashable, Tuple[Tuple[int, int], Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+
+    def get(self, key: Hashable, token: Tuple[int, int]) -> Optional[Any]:
+        """Return the cached value for key if it was stored at generation token, else None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry[0] != token:
+                del self._entries[key]
+                self.stale += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: Hashable, token: Tuple[int, int], value: Any) -> None:
+        """Store a value computed at generation token (read before the search started)."""
+        with self._lock:
+            self._entries[key] = (token, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return entry count, hits, misses (including stale entries) and hit rate."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "stale": self.stale,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None
+            }
+
+
+class SemanticQueryCache:
+    """Reuses the results of near-identical earlier queries, found by embedding similarity"""
+
+    def __init__(self, max_entries: int = 256, threshold: float = 0.95, sample_rate: float = 0.0):
+        self.max_entries = max(1, max_entries)
+        self.threshold = threshold
+        self.sample_rate = sample_rate
+        self._lock = threading.Lock()
+        # Normalized query embeddings, one row per slot; slots are reused oldest first
+        self._matrix: Optional[np.ndarray] = None
+        self._slots: List[Optional[Tuple[Hashable, Tuple[int, int], str, Any]]] = [None] * self.max_entries
+        self._next_slot = 0
+        self.lookups = 0
+        self.hits = 0
+        self.samples = 0
+        self.false_hits = 0
+
+    @staticmethod
+    def _normalize(embedding: List[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = float(np.linalg.norm(vector))
+        return vector / norm if norm else vector
+
+    def get(self, embedding: List[float], scope: Hashable, token: Tuple[int, int]) -> Optional[Tuple[str, Any]]:
+        """
+        Return (cached query, results) of the most similar cached query with the same scope and
+        generation, if its similarity reaches the threshold; otherwise None.
+        """
+        vector = self._normalize(embedding)
+        with self._lock:
+            self.lookups += 1
+            if self._matrix is None or self._matrix.shape[1] != len(vector):
+                return None
+            similarities = self._matrix @ vector
+            for slot in np.argsort(-similarities):
+                if similarities[slot] < self.threshold:
+                    break
+                entry = self._slots[slot]
+                if entry is not None and entry[0] == scope and entry[1] == token:
+                    self.hits += 1
+                    return entry[2], entry[3]
+            return None
+
+    def put(self, embedding: List[float], scope: Hashable, token: Tuple[int, int], query: str, results: Any) -> None:
+        """Store the results of a query searched at generation token."""
+        vector = self._normalize(embedding)
+        with self._lock:
+            if self._matrix is None or self._matrix.shape[1] != len(vector):
+                self._matrix = np.zeros((self.max_entries, len(vector)), dtype=np.float32)
+                self._slots = [None] * self.max_entries
+            slot = self._next_slot
+            self._next_slot = (slot + 1) % self.max_entries
+            self._matrix[slot] = vector
+            self._slots[slot] = (scope, token, query, results)
+
+    def should_sample(self) -> bool:
+        """Return True if a hit should be checked against a fresh search."""
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def record_sample(self, cached_results: List[Dict[str, Any]], fresh_results: List[Dict[str, Any]]) -> bool:
+        """
+        Compare a hit with a fresh search for the same query; it counts as a false hit when the
+        two share fewer than half of their results. Returns True for a false hit.
+        """
+        key = lambda result: result.get("id") or (result.get("url"), result.get("chunk_number"))
+        cached_ids = {key(result) for result in cached_results}
+        fresh_ids = {key(result) for result in fresh_results}
+        false_hit = len(cached_ids & fresh_ids) * 2 < max(len(cached_ids), len(fresh_ids))
+        with self._lock:
+            self.samples += 1
+            self.false_hits += false_hit
+        return false_hit
+
+    def stats(self) -> Dict[str, Any]:
+        """Return entry count, lookups, hits, hit rate and the sampled false-hit rate."""
+        with self._lock:
+            return {
+                "entries": sum(entry is not None for entry in self._slots),
+                "threshold": self.threshold,
+                "lookups": self.lookups,
+                "hits": self.hits,
+                "hit_rate": round(self.hits / self.lookups, 4) if self.lookups else None,
+                "sampled_hits": self.samples,
+                "false_hits": self.false_hits,
+                "false_hit_rate": round(self.false_hits / self.samples, 4) if self.samples else None
+            }
+
+
+_query_cache: Optional[QueryResultCache] = None
+_query_cache_lock = threading.Lock()
+
+
+def get_query_cache() -> Optional[QueryResultCache]:
+    """Return the process-wide result cache, or None unless USE_QUERY_CACHE is "true"."""
+    global _query_cache
+    if os.getenv("USE_QUERY_CACHE", "false") != "true":
+        return None
+    with _query_cache_lock:
+        if _query_cache is None:
+            _query_cache = QueryResultCache(max_entries=int(os.getenv("QUERY_CACHE_MAX_ENTRIES", "1024")))
+        return _query_cache
+
+
+_semantic_cache: Optional[SemanticQueryCache] = None
+
+
+def get_semantic_query_cache() -> Optional[SemanticQueryCache]:
+    """Return the process-wide semantic query cache, or None unless USE_SEMANTIC_CACHE is "true"."""
+    global _semantic_cache
+    if os.getenv("USE_SEMANTIC_CACHE", "false") != "true":
+        return None
+    with _query_cache_lock:
+        if _semantic_cache is None:
+            _semantic_cache = SemanticQueryCache(
+                max_entries=int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "256")),
+                threshold=float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95")),
+                sample_rate=float(os.getenv("SEMANTIC_CACHE_SAMPLE_RATE", "0.05"))
+            )
+        return _semantic_cache
@@ -0,0 +1,300 @@
+"""
+Cross-encoder reranking off the event loop.
+
+A single worker thread owns the model. Requests from concurrent searches are queued and, when
+the model is busy, accumulate until the worker drains all of them into one predict() call, so
+N simultaneous reranks cost about one batched forward pass instead of N serialized ones.
+Inference releases the GIL, so a thread is enough to keep the MCP server responsive. Texts are
+cut to the model's max sequence length (tokens, with a character pre-clip so multi-kilobyte
+chunks are not tokenized in full), and the model can run on torch with a fixed thread count
+or on the ONNX/OpenVINO backends of sentence-transformers, e.g. a quantized ONNX export.
+
+Scores are cached by (model, query, chunk content) hash before anything is queued, so pairs
+seen in a retry or an overlapping query never reach the model again. Keying on the content
+rather than the chunk id keeps the cache correct when a re-crawl rewrites a chunk in place.
+"""
+from collections import OrderedDict, deque
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+import asyncio
+import concurrent.futures
+import hashlib
+import logging
+import os
+import queue
+import statistics
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+
+# Upper bound on characters per token, used to clip texts before tokenization
+CHARS_PER_TOKEN = 6
+
+
+def _digest(text: str) -> bytes:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+
+class RerankScoreCache:
+    """Bounded LRU cache of cross-encoder scores"""
+
+    def __init__(self, max_entries: int = 100000):
+        self.max_entries = max(1, max_entries)
+        self._lock = threading.Lock()
+        self._scores: "OrderedDict[Hashable, float]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get_many(self, keys: List[Hashable]) -> List[Optional[float]]:
+        """Return the cached score of each key, or None where there is none."""
+        scores = []
+        with self._lock:
+            for key in keys:
+                score = self._scores.get(key)
+                if score is None:
+                    self.misses += 1
+                else:
+                    self._scores.move_to_end(key)
+                    self.hits += 1
+                scores.append(score)
+        return scores
+
+    def put_many(self, keys: List[Hashable], scores: List[float]) -> None:
+        """Store scores, evicting the least recently used entries beyond max_entries."""
+        with self._lock:
+            for key, score in zip(keys, scores):
+                self._scores[key] = score
+                self._scores.move_to_end(key)
+            while len(self._scores) > self.max_entries:
+                self._scores.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return entry count, pair hits and misses, and hit rate."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._scores),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None
+            }
+
+
+class _Request:
+    __slots__ = ("pairs", "future", "submitted")
+
+    def __init__(self, pairs: List[List[str]]):
+        self.pairs = pairs
+        self.future = concurrent.futures.Future()
+        self.submitted = time.perf_counter()
+
+
+class RerankingService:
+    """Scores (query, text) pairs with a cross-encoder on a dedicated worker thread"""
+
+    def __init__(
+        self,
+        model_name: str = DEFAULT_MODEL,
+        backend: str = "torch",
+        model_file: Optional[str] = None,
+        max_length: Optional[int] = None,
+        torch_threads: int = 0,
+        max_batch_pairs: int = 256,
+        score_cache_entries: int = 100000,
+        history: int = 1000
+    ):
+        from sentence_transformers import CrossEncoder
+
+        if torch_threads > 0:
+            import torch
+            torch.set_num_threads(torch_threads)
+        kwargs: Dict[str, Any] = {}
+        if backend != "torch":
+            # e.g. backend="onnx", model_file="onnx/model_qint8_avx512.onnx" for int8 CPU inference
+            kwargs["backend"] = backend
+            if model_file:
+                kwargs["model_kwargs"] = {"file_name": model_file}
+        self.model = CrossEncoder(model_name, max_length=max_length, **kwargs)
+        self.model_name = model_name
+        self.backend = backend
+        self.max_length = self.model.max_length or self.model.tokenizer.model_max_length
+        self.max_chars = self.max_length * CHARS_PER_TOKEN
+        self.max_batch_pairs = max(1, max_batch_pairs)
+        # Everything that changes the score of a pair besides its texts
+        self._model_key = (model_name, backend, model_file, self.max_length)
+        self.score_cache = RerankScoreCache(score_cache_entries) if score_cache_entries > 0 else None
+
+        self._queue: "queue.Queue[Optional[_Request]]" = queue.Queue()
+        self._stats_lock = threading.Lock()
+        self.latencies = deque(maxlen=history)
+        self.totals = {"requests": 0, "pairs": 0, "batches": 0, "failed_batches": 0}
+        self._thread = threading.Thread(target=self._run, name="reranker", daemon=True)
+        self._thread.start()
+        logger.info(
+            f"Reranking service started ({model_name}, {backend} backend, max length {self.max_length}"
+            + (f", {torch_threads} torch threads)" if torch_threads > 0 else ")")
+        )
+
+    def submit(self, query: str, texts: List[str]) -> concurrent.futures.Future:
+        """
+        Return a future resolving to the scores of texts against query. Cached scores are
+        reused and only the remaining pairs are queued for the model.
+        """
+        future = concurrent.futures.Future()
+
+        def complete(groups_future: concurrent.futures.Future) -> None:
+            error = groups_future.exception()
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(groups_future.result()[0])
+
+        self.submit_many([(query, texts)]).add_done_callback(complete)
+        return future
+
+    def submit_many(self, groups: List[Tuple[str, List[str]]]) -> concurrent.futures.Future:
+        """
+        Return a future resolving to the scores of each (query, texts) group. The uncached
+        pairs of all groups are queued as one request, so they are scored in the same batch.
+        """
+        pairs = []
+        keys = []
+        scores: List[List[Optional[float]]] = []
+        for query, texts in groups:
+            query = " ".join(query.split())[:self.max_chars]
+            texts = [(text or "")[:self.max_chars] for text in texts]
+            pairs.extend([query, text] for text in texts)
+            if self.score_cache is not None:
+                query_hash = _digest(query)
+                keys.extend((self._model_key, query_hash, _digest(text)) for text in texts)
+            scores.append([None] * len(texts))
+        flat: List[Optional[float]] = self.score_cache.get_many(keys) if self.score_cache is not None else [None] * len(pairs)
+        missing = [i for i, score in enumerate(flat) if score is None]
+
+        future = concurrent.futures.Future()
+
+        def finish() -> None:
+            offset = 0
+            for group_scores in scores:
+                group_scores[:] = flat[offset:offset + len(group_scores)]
+                offset += len(group_scores)
+            future.set_result(scores)
+
+        if not missing:
+            finish()
+            return future
+
+        def complete(request_future: concurrent.futures.Future) -> None:
+            error = request_future.exception()
+            if error is not None:
+                future.set_exception(error)
+                return
+            new_scores = request_future.result()
+            for i, score in zip(missing, new_scores):
+                flat[i] = score
+            if self.score_cache is not None:
+                self.score_cache.put_many([keys[i] for i in missing], new_scores)
+            finish()
+
+        request = _Request([pairs[i] for i in missing])
+        request.future.add_done_callback(complete)
+        self._queue.put(request)
+        return future
+
+    async def score(self, query: str, texts: List[str]) -> List[float]:
+        """Score texts against query without blocking the event loop."""
+        return await asyncio.wrap_future(self.submit(query, texts))
+
+    async def score_groups(self, groups: List[Tuple[str, List[str]]]) -> List[List[float]]:
+        """Score several (query, texts) groups in one batch without blocking the event loop."""
+        return await asyncio.wrap_future(self.submit_many(groups))
+
+    def _run(self) -> None:
+        while True:
+            request = self._queue.get()
+            if request is None:
+                return
+            # Take everything that queued up while the previous batch was running
+            batch = [request]
+            pairs = len(request.pairs)
+            stop = False
+            while pairs < self.max_batch_pairs:
+                try:
+                    request = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if request is None:
+                    stop = True
+                    break
+                batch.append(request)
+                pairs += len(request.pairs)
+            self._score(batch)
+            if stop:
+                return
+
+    def _score(self, batch: List[_Request]) -> None:
+        try:
+            scores = self.model.predict(
+                [pair for request in batch for pair in request.pairs],
+                batch_size=self.max_batch_pairs,
+                show_progress_bar=False
+            )
+        except Exception as e:
+            logger.error(f"Error scoring {len(batch)} reranking requests: {e}")
+            with self._stats_lock:
+                self.totals["failed_batches"] += 1
+            for request in batch:
+                request.future.set_exception(e)
+            return
+
+        finished = time.perf_counter()
+        offset = 0
+        for request in batch:
+            request.future.set_result([float(score) for score in scores[offset:offset + len(request.pairs)]])
+            offset += len(request.pairs)
+        with self._stats_lock:
+            self.latencies.extend(finished - request.submitted for request in batch)
+            self.totals["requests"] += len(batch)
+            self.totals["pairs"] += offset
+            self.totals["batches"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Return request, pair and batch totals of the model, p50/p99 latency (queueing included)
+        in milliseconds and score cache hit rates.
+        """
+        with self._stats_lock:
+            latencies = sorted(self.latencies)
+            totals = dict(self.totals)
+        return {
+            "model": self.model_name,
+            "backend": self.backend,
+            "max_length": self.max_length,
+            **totals,
+            "mean_pairs_per_batch": round(totals["pairs"] / totals["batches"], 1) if totals["batches"] else None,
+            "p50_ms": round(statistics.median(latencies) * 1000, 1) if latencies else None,
+            "p99_ms": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000, 1) if latencies else None,
+            "score_cache": self.score_cache.stats() if self.score_cache is not None else None
+        }
+
+    def close(self) -> None:
+        """Finish queued requests and stop the worker thread."""
+        self._queue.put(None)
+        self._thread.join()
+
+
+def start_reranking_service() -> RerankingService:
+    """Start a reranking service configured from the RERANKING_* environment variables."""
+    max_length = int(os.getenv("RERANKING_MAX_LENGTH", "0"))
+    return RerankingService(
+        model_name=os.getenv("RERANKING_MODEL", DEFAULT_MODEL),
+        backend=os.getenv("RERANKING_BACKEND", "torch"),
+        model_file=os.getenv("RERANKING_MODEL_FILE") or None,
+        max_length=max_length or None,
+        torch_threads=int(os.getenv("RERANKING_TORCH_THREADS", "0")),
+        max_batch_pairs=int(os.getenv("RERANKING_MAX_BATCH_PAIRS", "256")),
+        score_cache_entries=int(os.getenv("RERANK_CACHE_MAX_ENTRIES", "100000"))
+    )
@@ -0,0 +1,156 @@
+"""
+Source registry for local vector stores (ChromaDB).
+
+Mirrors the Supabase `sources` table: one row per source with its summary, total word
+count, number of stored chunks and code examples, and timestamps. Counts are maintained
+incrementally from the deltas of every write and delete, so listing sources never has to
+scan the vector collections.
+"""
+from typing import Dict, List, Any
+from datetime import datetime, timezone
+import logging
+import os
+import sqlite3
+import threading
+
+logger = logging.getLogger(__name__)
+
+COUNT_COLUMNS = ("chunk_count", "code_example_count", "total_word_count")
+
+
+class SourceRegistry:
+    """SQLite-backed per-source statistics, updated at write time"""
+
+    def __init__(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS sources (
+                source_id TEXT PRIMARY KEY,
+                summary TEXT,
+                total_word_count INTEGER NOT NULL DEFAULT 0,
+                chunk_count INTEGER NOT NULL DEFAULT 0,
+                code_example_count INTEGER NOT NULL DEFAULT 0,
+                created_at TEXT NOT NULL,
+                updated_at TEXT NOT NULL
+            )
+            """
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def _now() -> str:
+        return datetime.now(timezone.utc).isoformat()
+
+    def is_empty(self) -> bool:
+        """Return True if no source has been registered yet."""
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM sources LIMIT 1").fetchone() is None
+
+    def apply_deltas(self, deltas: Dict[str, Dict[str, int]]) -> None:
+        """
+        Add count deltas per source, creating sources as needed.
+
+        Args:
+            deltas: Mapping of source_id to {column: delta} for chunk_count,
+                code_example_count and total_word_count
+        """
+        if not deltas:
+            return
+        now = self._now()
+        with self._lock:
+            for source_id, delta in deltas.items():
+                values = [delta.get(column, 0) for column in COUNT_COLUMNS]
+                if not any(values):
+                    continue
+                self._conn.execute(
+                    """
+                    INSERT INTO sources (source_id, chunk_count, code_example_count, total_word_count, created_at, updated_at)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(source_id) DO UPDATE SET
+                        chunk_count = MAX(0, chunk_count + excluded.chunk_count),
+                        code_example_count = MAX(0, code_example_count + excluded.code_example_count),
+                        total_word_count = MAX(0, total_word_count + excluded.total_word_count),
+                        updated_at = excluded.updated_at
+                    """,
+                    (source_id, *values, now, now)
+                )
+            self._conn.commit()
+
+    def set_summaries(self, summaries: Dict[str, str]) -> None:
+        """Create or update the summaries of several sources in one transaction."""
+        if not summaries:
+            return
+        now = self._now()
+        with self._lock:
+            self._conn.executemany(
+                """
+                INSERT INTO sources (source_id, summary, created_at, updated_at) VALUES (?, ?, ?, ?)
+                ON CONFLICT(source_id) DO UPDATE SET summary = excluded.summary, updated_at = excluded.updated_at
+                """,
+                [(source_id, summary, now, now) for source_id, summary in summaries.items()]
+            )
+            self._conn.commit()
+
+    def delete_source(self, source_id: str) -> None:
+        """Remove a source and its statistics."""
+        with self._lock:
+            self._conn.execute("DELETE FROM sources WHERE source_id = ?", (source_id,))
+            self._conn.commit()
+
+    def replace_counts(self, counts: Dict[str, Dict[str, int]]) -> None:
+        """Overwrite the counts of every source (used when rebuilding from the collections)."""
+        now = self._now()
+        with self._lock:
+            self._conn.execute(
+                "UPDATE sources SET chunk_count = 0, code_example_count = 0, total_word_count = 0"
+            )
+            for source_id, source_counts in counts.items():
+                values = [source_counts.get(column, 0) for column in COUNT_COLUMNS]
+                self._conn.execute(
+                    """
+                    INSERT INTO sources (source_id, chunk_count, code_example_count, total_word_count, created_at, updated_at)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(source_id) DO UPDATE SET
+                        chunk_count = excluded.chunk_count,
+                        code_example_count = excluded.code_example_count,
+                        total_word_count = excluded.total_word_count
+                    """,
+                    (source_id, *values, now, now)
+                )
+            self._conn.commit()
+
+    def list_sources(self) -> List[Dict[str, Any]]:
+        """Return every source with its summary, counts and timestamps, ordered by source_id."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT source_id, summary, total_word_count, chunk_count, code_example_count, created_at, updated_at "
+                "FROM sources ORDER BY source_id"
+            ).fetchall()
+        return [
+            {
+                "source_id": row[0],
+                "summary": row[1],
+                "total_words": row[2],
+                "chunk_count": row[3],
+                "code_example_count": row[4],
+                "created_at": row[5],
+                "updated_at": row[6]
+            }
+            for row in rows
+        ]
+
+    def source_ids(self) -> List[str]:
+        """Return the IDs of sources that currently have stored chunks or code examples."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT source_id FROM sources WHERE chunk_count > 0 OR code_example_count > 0 ORDER BY source_id"
+            ).fetchall()
+        return [row[0] for row in rows]
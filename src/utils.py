@@ -3,13 +3,24 @@ Utility functions for the Crawl4AI MCP server.
 """
 import os
 import concurrent.futures
-from typing import List, Dict, Any, Optional, Tuple
+from typing import List, Dict, Any, Iterable, Optional, Tuple
 import json
 from supabase import create_client, Client
 from urllib.parse import urlparse
 import openai
 import re
 import time
+import hashlib
+
+from enrichment_pool import get_enrichment_pool
+from vector_db_adapter import VectorDBAdapter
+from write_buffer import submit_rows
+from llm_cache import (
+    get_llm_cache,
+    CONTEXTUAL_PROMPT_VERSION,
+    CODE_SUMMARY_PROMPT_VERSION,
+    SOURCE_SUMMARY_PROMPT_VERSION
+)
 
 # Load OpenAI API key for embeddings
 openai.api_key = os.getenv("OPENAI_API_KEY")
@@ -114,6 +125,13 @@ def generate_contextual_embedding(full_document: str, chunk: str) -> Tuple[str,
     """
     model_choice = os.getenv("MODEL_CHOICE")
     
+    # Reuse a previously generated context if neither the document nor the chunk changed
+    cache = get_llm_cache()
+    if cache:
+        cached_context = cache.get(model_choice, CONTEXTUAL_PROMPT_VERSION, full_document[:25000], chunk)
+        if cached_context is not None:
+            return f"{cached_context}\n---\n{chunk}", True
+    
     try:
         # Create the prompt for generating contextual information
         prompt = f"""<document> 
@@ -139,6 +157,9 @@ Please give a short succinct context to situate this chunk within the overall do
         # Extract the generated context
         context = response.choices[0].message.content.strip()
         
+        if cache:
+            cache.put(model_choice, CONTEXTUAL_PROMPT_VERSION, full_document[:25000], chunk, context)
+        
         # Combine the context with the original chunk
         contextual_text = f"{context}\n---\n{chunk}"
         
@@ -148,6 +169,136 @@ Please give a short succinct context to situate this chunk within the overall do
         print(f"Error generating contextual embedding: {e}. Using original chunk instead.")
         return chunk, False
 
+def build_batched_context_request(model_choice: Optional[str], document: str, chunks: List[str], max_chunk_chars: int = 2000) -> Dict[str, Any]:
+    """
+    Build the chat completion request asking for the contexts of several chunks of a document.
+    
+    Args:
+        model_choice: The chat model to use
+        document: The (truncated) document text
+        chunks: The chunks to situate within the document
+        max_chunk_chars: Maximum number of characters of each chunk included in the prompt
+        
+    Returns:
+        Keyword arguments for openai.chat.completions.create (also usable as a batch request body)
+    """
+    chunk_sections = "\n".join(
+        f'<chunk index="{i}">\n{chunk[:max_chunk_chars]}\n</chunk>'
+        for i, chunk in enumerate(chunks)
+    )
+
+    # Create the prompt for generating contextual information for every chunk at once
+    prompt = f"""<document>
+{document}
+</document>
+Here are {len(chunks)} chunks we want to situate within the whole document
+{chunk_sections}
+For each chunk, please give a short succinct context to situate the chunk within the overall document for the purposes of improving search retrieval of the chunk. Answer only with a JSON object of the form {{"contexts": [{{"index": 0, "context": "..."}}]}} containing exactly one entry per chunk index."""
+
+    return {
+        "model": model_choice,
+        "messages": [
+            {"role": "system", "content": "You are a helpful assistant that provides concise contextual information as JSON."},
+            {"role": "user", "content": prompt}
+        ],
+        "temperature": 0.3,
+        "max_tokens": 200 * len(chunks),
+        "response_format": {"type": "json_object"}
+    }
+
+def parse_batched_contexts(content: str, chunk_count: int) -> Dict[int, str]:
+    """
+    Parse the JSON answer of a batched context request.
+    
+    Args:
+        content: The message content returned by the model
+        chunk_count: Number of chunks in the request
+        
+    Returns:
+        Dictionary mapping chunk index to its generated context (only for answered chunks)
+    """
+    contexts = {}
+    parsed = json.loads(content)
+    for entry in parsed.get("contexts", []):
+        try:
+            index = int(entry["index"])
+            context = str(entry["context"]).strip()
+        except (KeyError, TypeError, ValueError):
+            continue
+        if 0 <= index < chunk_count and context:
+            contexts[index] = context
+    return contexts
+
+def _request_batched_contexts(model_choice: Optional[str], document: str, chunks: List[str], max_chunk_chars: int) -> Dict[int, str]:
+    """
+    Ask the LLM for the contexts of several chunks of a document in a single JSON-mode call.
+    
+    Returns:
+        Dictionary mapping chunk index to its generated context (only for answered chunks)
+    """
+    response = openai.chat.completions.create(
+        **build_batched_context_request(model_choice, document, chunks, max_chunk_chars)
+    )
+    return parse_batched_contexts(response.choices[0].message.content, len(chunks))
+
+def generate_contextual_embeddings_batch(full_document: str, chunks: List[str], max_chunk_chars: int = 2000) -> List[Tuple[str, bool]]:
+    """
+    Generate contextual information for several chunks of the same document in one LLM call.
+    
+    The document is sent once and the model answers with a JSON object holding one context
+    per chunk. Any chunk the model does not answer for falls back to generate_contextual_embedding.
+    
+    Args:
+        full_document: The complete document text
+        chunks: The chunks of the document to generate context for
+        max_chunk_chars: Maximum number of characters of each chunk included in the prompt
+        
+    Returns:
+        List of tuples (one per chunk, in order) containing:
+        - The contextual text that situates the chunk within the document
+        - Boolean indicating if contextual embedding was performed
+    """
+    if not chunks:
+        return []
+
+    model_choice = os.getenv("MODEL_CHOICE")
+    document = full_document[:25000]
+    contexts: Dict[int, str] = {}
+
+    # Reuse previously generated contexts and only send the remaining chunks to the LLM
+    cache = get_llm_cache()
+    if cache:
+        for i, chunk in enumerate(chunks):
+            cached_context = cache.get(model_choice, CONTEXTUAL_PROMPT_VERSION, document, chunk)
+            if cached_context is not None:
+                contexts[i] = cached_context
+    pending = [i for i in range(len(chunks)) if i not in contexts]
+
+    # A single pending chunk goes straight to the per-chunk prompt below
+    if len(pending) > 1:
+        try:
+            answered = _request_batched_contexts(model_choice, document, [chunks[i] for i in pending], max_chunk_chars)
+            for n, context in answered.items():
+                contexts[pending[n]] = context
+                if cache:
+                    cache.put(model_choice, CONTEXTUAL_PROMPT_VERSION, document, chunks[pending[n]], context)
+        except Exception as e:
+            print(f"Error generating batched contextual embeddings: {e}. Falling back to per-chunk calls.")
+
+    results = []
+    missing = 0
+    for i, chunk in enumerate(chunks):
+        if i in contexts:
+            results.append((f"{contexts[i]}\n---\n{chunk}", True))
+        else:
+            missing += 1
+            results.append(generate_contextual_embedding(full_document, chunk))
+
+    if missing and len(pending) > 1:
+        print(f"Batched contextual embedding missed {missing}/{len(pending)} chunks, generated them individually")
+
+    return results
+
 def process_chunk_with_context(args):
     """
     Process a single chunk with contextual embedding.
@@ -164,115 +315,334 @@ def process_chunk_with_context(args):
     url, content, full_document = args
     return generate_contextual_embedding(full_document, content)
 
-def add_documents_to_supabase(
-    client: Client, 
+def process_chunks_with_context(args):
+    """
+    Process a group of chunks from the same document with a single batched contextual call.
+    This function is designed to be used with concurrent.futures.
+
+    Args:
+        args: Tuple containing (url, contents, full_document)
+
+    Returns:
+        List of (contextual text, success) tuples, one per chunk
+    """
+    url, contents, full_document = args
+    return generate_contextual_embeddings_batch(full_document, contents)
+
+def apply_contextual_embeddings(
+    urls: List[str],
+    contents: List[str],
+    metadatas: List[Dict[str, Any]],
+    url_to_full_document: Dict[str, str]
+) -> List[str]:
+    """
+    Generate contextual contents for all chunks, grouping chunks of the same document.
+
+    Chunks are grouped per URL into groups of at most CONTEXTUAL_EMBEDDING_BATCH_SIZE chunks
+    (default: 10), and each group is enriched in one LLM call. Setting the batch size to 1
+    restores the one-call-per-chunk behaviour.
+
+    Args:
+        urls: List of URLs, one per chunk
+        contents: List of chunk contents
+        metadatas: List of chunk metadata, updated in place with "contextual_embedding"
+        url_to_full_document: Dictionary mapping URLs to their full document content
+
+    Returns:
+        List of contextual contents in the same order as contents
+    """
+    max_chunks_per_call = max(1, int(os.getenv("CONTEXTUAL_EMBEDDING_BATCH_SIZE", "10")))
+
+    # Group chunk indices by document, preserving chunk order
+    url_to_indices: Dict[str, List[int]] = {}
+    for idx, url in enumerate(urls):
+        url_to_indices.setdefault(url, []).append(idx)
+
+    groups = []
+    for url, indices in url_to_indices.items():
+        for start in range(0, len(indices), max_chunks_per_call):
+            groups.append((url, indices[start:start + max_chunks_per_call]))
+
+    # Submit every group to the shared enrichment pool at once so LLM calls stay saturated
+    pool = get_enrichment_pool()
+    contextual_contents = list(contents)
+    future_to_group = {
+        pool.submit(
+            process_chunks_with_context,
+            (url, [contents[idx] for idx in indices], url_to_full_document.get(url, ""))
+        ): indices
+        for url, indices in groups
+    }
+
+    for future in concurrent.futures.as_completed(future_to_group):
+        indices = future_to_group[future]
+        try:
+            results = future.result()
+        except Exception as e:
+            print(f"Error processing chunks {indices[0]}-{indices[-1]}: {e}")
+            # Keep the original content as fallback
+            continue
+        for idx, (result, success) in zip(indices, results):
+            contextual_contents[idx] = result
+            if success:
+                metadatas[idx]["contextual_embedding"] = True
+
+    print(f"Generated contextual embeddings for {len(contents)} chunks in {len(groups)} batched requests")
+    return contextual_contents
+
+def chunk_content_hash(content: str, contextual: bool) -> str:
+    """
+    Hash a chunk together with the settings that change how it is stored.
+    
+    Args:
+        content: The original chunk content
+        contextual: Whether contextual embeddings are enabled
+        
+    Returns:
+        Hex digest stored as metadata.content_hash
+    """
+    return hashlib.sha256(f"{int(contextual)}:{content}".encode("utf-8", errors="replace")).hexdigest()
+
+def url_source_id(url: str) -> str:
+    """Return the source_id of a URL (its domain, or the path for URLs without one)."""
+    parsed_url = urlparse(url)
+    return parsed_url.netloc or parsed_url.path
+
+def add_source_deltas(
+    deltas: Dict[str, Dict[str, Any]],
+    rows: List[Dict[str, Any]],
+    sign: int,
+    collection_type: str = "content"
+) -> None:
+    """
+    Accumulate per-source count deltas for rows being written (+1) or removed (-1).
+    
+    Args:
+        deltas: Mapping of source_id to count deltas, updated in place
+        rows: Rows with a url (and optionally source_id) and metadata holding word_count
+        sign: 1 for rows being written, -1 for rows being removed
+        collection_type: "content" (chunk and word counts) or "code" (code example counts)
+    """
+    for row in rows:
+        source_id = row.get("source_id") or url_source_id(row["url"])
+        delta = deltas.setdefault(source_id, {})
+        if collection_type == "code":
+            delta["code_example_count"] = delta.get("code_example_count", 0) + sign
+        else:
+            delta["chunk_count"] = delta.get("chunk_count", 0) + sign
+            word_count = int((row.get("metadata") or {}).get("word_count") or 0)
+            delta["total_word_count"] = delta.get("total_word_count", 0) + sign * word_count
+
+def register_sources(
+    vector_db: VectorDBAdapter,
+    source_ids: Iterable[str],
+    source_summaries: Optional[Dict[str, str]] = None
+) -> None:
+    """
+    Create the sources rows of an ingestion and set new summaries, without touching counts.
+    
+    Sources must exist before rows reference them, while count deltas are only applied
+    (settle_source_counts) once the rows are stored.
+    
+    Args:
+        vector_db: Vector database adapter
+        source_ids: Sources the ingestion writes to
+        source_summaries: Optional mapping of source_id to a new summary
+    """
+    updates: Dict[str, Dict[str, Any]] = {source_id: {} for source_id in source_ids}
+    for source_id, summary in (source_summaries or {}).items():
+        updates.setdefault(source_id, {})["summary"] = summary
+    if updates:
+        vector_db.update_sources(updates)
+
+def settle_source_counts(
+    vector_db: VectorDBAdapter,
+    deltas: Dict[str, Dict[str, Any]],
+    source_ids: Iterable[str],
+    exact: bool
+) -> None:
+    """
+    Bring source counts up to date after an ingestion's deletes and writes.
+    
+    Args:
+        vector_db: Vector database adapter
+        deltas: Count deltas of the diff, applied when exact
+        source_ids: Sources the ingestion touched
+        exact: False when the deltas cannot be trusted (the stored rows could not be read,
+            or fewer rows were written than submitted); the counts of source_ids are then
+            recomputed
+    """
+    if not exact:
+        vector_db.recompute_source_stats(sorted(set(source_ids)))
+        return
+    counts = {source_id: delta for source_id, delta in deltas.items() if any(delta.values())}
+    if counts:
+        vector_db.update_sources(counts)
+
+def _recount_after_failure(vector_db: VectorDBAdapter, source_ids: Iterable[str]) -> None:
+    """Recompute source counts after a failed ingestion, keeping the original error the one raised"""
+    try:
+        settle_source_counts(vector_db, {}, source_ids, exact=False)
+    except Exception as e:
+        print(f"Error recomputing source statistics: {e}")
+
+def add_documents_to_vector_db(
+    vector_db: VectorDBAdapter, 
     urls: List[str], 
     chunk_numbers: List[int],
     contents: List[str], 
     metadatas: List[Dict[str, Any]],
     url_to_full_document: Dict[str, str],
-    batch_size: int = 20
-) -> None:
+    batch_size: int = 20,
+    source_summaries: Optional[Dict[str, str]] = None,
+    contextual_contents: Optional[List[str]] = None,
+    embeddings: Optional[List[List[float]]] = None
+) -> Dict[str, int]:
     """
-    Add documents to the Supabase crawled_pages table in batches.
-    Deletes existing records with the same URLs before inserting to prevent duplicates.
+    Add documents to the crawled content collection of the vector database in batches.
+    
+    Each chunk's content hash is compared with the rows already stored for the same URLs.
+    Unchanged chunks are skipped entirely (no contextual enrichment, embedding or write),
+    new and changed chunks are upserted on (url, chunk_number), and stored chunk numbers
+    that no longer exist are deleted. Sources and their new summaries are registered before any
+    chunk is written; the chunk and word count deltas of the diff are applied in one bulk upsert
+    once every write succeeded, so re-crawling part of a source adjusts its statistics instead
+    of overwriting them. If the stored rows cannot be read, a write fails or stores fewer rows
+    than it was given, the counts of the affected sources are recomputed from the stored rows
+    instead.
     
     Args:
-        client: Supabase client
+        vector_db: Vector database adapter
         urls: List of URLs
         chunk_numbers: List of chunk numbers
         contents: List of document contents
         metadatas: List of document metadata
         url_to_full_document: Dictionary mapping URLs to their full document content
         batch_size: Size of each batch for insertion
+        source_summaries: Optional mapping of source_id to a new summary
+        contextual_contents: Precomputed texts to store and embed per chunk, e.g. from a bulk
+            ingestion job (skips contextual enrichment)
+        embeddings: Precomputed embeddings of those texts (skips the embedding calls)
+        
+    Returns:
+        Dictionary with the number of upserted, unchanged and deleted chunks
     """
-    # Get unique URLs to delete existing records
-    unique_urls = list(set(urls))
+    # Check if MODEL_CHOICE is set for contextual embeddings
+    use_contextual_embeddings = os.getenv("USE_CONTEXTUAL_EMBEDDINGS", "false") == "true"
+    print(f"\n\nUse contextual embeddings: {use_contextual_embeddings}\n\n")
     
-    # Delete existing records for these URLs in a single operation
+    hashes = [chunk_content_hash(content, use_contextual_embeddings) for content in contents]
+    for metadata, content_hash in zip(metadatas, hashes):
+        metadata["content_hash"] = content_hash
+    
+    # Compare with what is already stored for these URLs
     try:
-        if unique_urls:
-            # Use the .in_() filter to delete all records with matching URLs
-            client.table("crawled_pages").delete().in_("url", unique_urls).execute()
+        stored_rows = vector_db.get_rows_by_url(list(set(urls)))
+        diffed = True
     except Exception as e:
-        print(f"Batch delete failed: {e}. Trying one-by-one deletion as fallback.")
-        # Fallback: delete records one by one
-        for url in unique_urls:
-            try:
-                client.table("crawled_pages").delete().eq("url", url).execute()
-            except Exception as inner_e:
-                print(f"Error deleting record for URL {url}: {inner_e}")
-                # Continue with the next URL even if one fails
+        # Without the stored rows the deltas are unknown and vanished chunks cannot be found
+        print(f"Error fetching stored chunks: {e}. Upserting all chunks and recomputing source statistics.")
+        stored_rows = []
+        diffed = False
+    stored = {(row["url"], row["chunk_number"]): row for row in stored_rows}
     
-    # Check if MODEL_CHOICE is set for contextual embeddings
-    use_contextual_embeddings = os.getenv("USE_CONTEXTUAL_EMBEDDINGS", "false") == "true"
-    print(f"\n\nUse contextual embeddings: {use_contextual_embeddings}\n\n")
+    new_keys = set(zip(urls, chunk_numbers))
+    vanished = [row for key, row in stored.items() if key not in new_keys]
+    changed = [
+        i for i in range(len(contents))
+        if (stored.get((urls[i], chunk_numbers[i]), {}).get("metadata") or {}).get("content_hash") != hashes[i]
+    ]
+    
+    # Counts move by the diff, but only once the rows are stored
+    deltas: Dict[str, Dict[str, Any]] = {}
+    add_source_deltas(deltas, vanished, -1)
+    add_source_deltas(deltas, [stored[(urls[i], chunk_numbers[i])] for i in changed if (urls[i], chunk_numbers[i]) in stored], -1)
+    add_source_deltas(deltas, [{"url": urls[i], "metadata": metadatas[i]} for i in changed], 1)
+    source_ids = {url_source_id(url) for url in set(urls)}
+    register_sources(vector_db, source_ids if changed else [], source_summaries)
     
-    # Process in batches to avoid memory issues
-    for i in range(0, len(contents), batch_size):
-        batch_end = min(i + batch_size, len(contents))
+    try:
+        deleted, written = _write_document_diff(
+            vector_db, vanished, changed, urls, chunk_numbers, contents, metadatas,
+            url_to_full_document, batch_size, use_contextual_embeddings, contextual_contents, embeddings
+        )
+    except Exception:
+        _recount_after_failure(vector_db, source_ids)
+        raise
+    if written != len(changed):
+        # Some rows were dropped by the database, so the deltas overstate what is stored
+        print(f"Only {written} of {len(changed)} chunks were written. Recomputing source statistics.")
+    settle_source_counts(vector_db, deltas, source_ids, exact=diffed and written == len(changed))
+    
+    stats = {
+        "upserted": len(changed),
+        "unchanged": len(contents) - len(changed),
+        "deleted": deleted
+    }
+    print(f"Chunks upserted: {stats['upserted']}, unchanged: {stats['unchanged']}, deleted: {stats['deleted']}")
+    return stats
+
+def _write_document_diff(
+    vector_db: VectorDBAdapter,
+    vanished: List[Dict[str, Any]],
+    changed: List[int],
+    urls: List[str],
+    chunk_numbers: List[int],
+    contents: List[str],
+    metadatas: List[Dict[str, Any]],
+    url_to_full_document: Dict[str, str],
+    batch_size: int,
+    use_contextual_embeddings: bool,
+    contextual_contents: Optional[List[str]],
+    embeddings: Optional[List[List[float]]]
+) -> Tuple[int, int]:
+    """Delete the vanished chunks and embed and upsert the changed ones; returns the numbers deleted and written"""
+    # Delete chunk numbers that no longer exist
+    deleted = vector_db.delete_by_ids([row["id"] for row in vanished])
+    changed_urls = [urls[i] for i in changed]
+    changed_chunk_numbers = [chunk_numbers[i] for i in changed]
+    changed_contents = [contents[i] for i in changed]
+    changed_metadatas = [metadatas[i] for i in changed]
+    
+    # Generate contextual contents up front so each document is only sent to the LLM once per group of chunks
+    if contextual_contents is not None:
+        all_contextual_contents = [contextual_contents[i] for i in changed]
+    elif use_contextual_embeddings and changed_contents:
+        all_contextual_contents = apply_contextual_embeddings(changed_urls, changed_contents, changed_metadatas, url_to_full_document)
+    else:
+        all_contextual_contents = changed_contents
+    
+    # Process in batches to avoid memory issues; each batch is queued on the write-behind
+    # buffer (coalesced with concurrent ingestions) while the next one is embedded
+    write_futures = []
+    for i in range(0, len(changed_contents), batch_size):
+        batch_end = min(i + batch_size, len(changed_contents))
         
         # Get batch slices
-        batch_urls = urls[i:batch_end]
-        batch_chunk_numbers = chunk_numbers[i:batch_end]
-        batch_contents = contents[i:batch_end]
-        batch_metadatas = metadatas[i:batch_end]
-        
-        # Apply contextual embedding to each chunk if MODEL_CHOICE is set
-        if use_contextual_embeddings:
-            # Prepare arguments for parallel processing
-            process_args = []
-            for j, content in enumerate(batch_contents):
-                url = batch_urls[j]
-                full_document = url_to_full_document.get(url, "")
-                process_args.append((url, content, full_document))
-            
-            # Process in parallel using ThreadPoolExecutor
-            contextual_contents = []
-            with concurrent.futures.ThreadPoolExecutor(max_workers=10) as executor:
-                # Submit all tasks and collect results
-                future_to_idx = {executor.submit(process_chunk_with_context, arg): idx 
-                                for idx, arg in enumerate(process_args)}
-                
-                # Process results as they complete
-                for future in concurrent.futures.as_completed(future_to_idx):
-                    idx = future_to_idx[future]
-                    try:
-                        result, success = future.result()
-                        contextual_contents.append(result)
-                        if success:
-                            batch_metadatas[idx]["contextual_embedding"] = True
-                    except Exception as e:
-                        print(f"Error processing chunk {idx}: {e}")
-                        # Use original content as fallback
-                        contextual_contents.append(batch_contents[idx])
-            
-            # Sort results back into original order if needed
-            if len(contextual_contents) != len(batch_contents):
-                print(f"Warning: Expected {len(batch_contents)} results but got {len(contextual_contents)}")
-                # Use original contents as fallback
-                contextual_contents = batch_contents
-        else:
-            # If not using contextual embeddings, use original contents
-            contextual_contents = batch_contents
+        batch_urls = changed_urls[i:batch_end]
+        batch_chunk_numbers = changed_chunk_numbers[i:batch_end]
+        batch_metadatas = changed_metadatas[i:batch_end]
+        batch_contents = all_contextual_contents[i:batch_end]
         
         # Create embeddings for the entire batch at once
-        batch_embeddings = create_embeddings_batch(contextual_contents)
+        if embeddings is not None:
+            batch_embeddings = [embeddings[idx] for idx in changed[i:batch_end]]
+        else:
+            batch_embeddings = create_embeddings_batch(batch_contents)
         
         batch_data = []
-        for j in range(len(contextual_contents)):
+        for j in range(len(batch_contents)):
             # Extract metadata fields
-            chunk_size = len(contextual_contents[j])
+            chunk_size = len(batch_contents[j])
             
             # Extract source_id from URL
-            parsed_url = urlparse(batch_urls[j])
-            source_id = parsed_url.netloc or parsed_url.path
+            source_id = url_source_id(batch_urls[j])
             
             # Prepare data for insertion
             data = {
                 "url": batch_urls[j],
                 "chunk_number": batch_chunk_numbers[j],
-                "content": contextual_contents[j],  # Store original content
+                "content": batch_contents[j],  # Store original content
                 "metadata": {
                     "chunk_size": chunk_size,
                     **batch_metadatas[j]
@@ -283,73 +653,90 @@ def add_documents_to_supabase(
             
             batch_data.append(data)
         
-        # Insert batch into Supabase with retry logic
-        max_retries = 3
-        retry_delay = 1.0  # Start with 1 second delay
-        
-        for retry in range(max_retries):
-            try:
-                client.table("crawled_pages").insert(batch_data).execute()
-                # Success - break out of retry loop
-                break
-            except Exception as e:
-                if retry < max_retries - 1:
-                    print(f"Error inserting batch into Supabase (attempt {retry + 1}/{max_retries}): {e}")
-                    print(f"Retrying in {retry_delay} seconds...")
-                    time.sleep(retry_delay)
-                    retry_delay *= 2  # Exponential backoff
-                else:
-                    # Final attempt failed
-                    print(f"Failed to insert batch after {max_retries} attempts: {e}")
-                    # Optionally, try inserting records one by one as a last resort
-                    print("Attempting to insert records individually...")
-                    successful_inserts = 0
-                    for record in batch_data:
-                        try:
-                            client.table("crawled_pages").insert(record).execute()
-                            successful_inserts += 1
-                        except Exception as individual_error:
-                            print(f"Failed to insert individual record for URL {record['url']}: {individual_error}")
-                    
-                    if successful_inserts > 0:
-                        print(f"Successfully inserted {successful_inserts}/{len(batch_data)} records individually")
+        # Upsert batch into the vector database
+        write_futures.append(submit_rows(vector_db, batch_data))
+    
+    # Make sure every batch is stored before reporting success
+    written = sum(future.result() for future in write_futures)
+    return deleted, written
+
+def delete_rows(
+    vector_db: VectorDBAdapter,
+    source_id: Optional[str] = None,
+    urls: Optional[List[str]] = None,
+    batch_size: int = 1000
+) -> Dict[str, Any]:
+    """
+    Delete the chunks and code examples of a source and/or a list of URLs in batches.
+    
+    Every batch is committed separately (keeping locks short), so re-running an interrupted
+    delete continues with the rows that are left.
+    
+    Args:
+        vector_db: Vector database adapter
+        source_id: Source whose rows are deleted
+        urls: URLs whose rows are deleted
+        batch_size: Maximum number of rows deleted per batch
+        
+    Returns:
+        Dictionary with the number of deleted chunks and code examples, duration and rows per second
+    """
+    url_groups = [None] if urls is None else [urls[i:i + 100] for i in range(0, len(urls), 100)]
+    deleted = {"content": 0, "code": 0}
+    batches = 0
+    started = time.perf_counter()
+    # Code examples first, then chunks, so a source is never left with orphaned code examples
+    for collection_type in ("code", "content"):
+        for url_group in url_groups:
+            while True:
+                count = vector_db.delete_batch(collection_type, source_id=source_id, urls=url_group, batch_size=batch_size)
+                deleted[collection_type] += count
+                batches += 1
+                if count < batch_size:
+                    break
+    seconds = time.perf_counter() - started
+    
+    total = deleted["content"] + deleted["code"]
+    stats = {
+        "chunks_deleted": deleted["content"],
+        "code_examples_deleted": deleted["code"],
+        "batches": batches,
+        "seconds": round(seconds, 3),
+        "rows_per_second": round(total / seconds, 1) if seconds else None
+    }
+    print(f"Deleted {total} rows in {batches} batches ({stats['rows_per_second']} rows/s)")
+    return stats
 
 def search_documents(
-    client: Client, 
+    vector_db: VectorDBAdapter, 
     query: str, 
     match_count: int = 10, 
-    filter_metadata: Optional[Dict[str, Any]] = None
+    source_filter: Optional[str] = None,
+    hybrid: bool = False,
+    query_embedding: Optional[List[float]] = None
 ) -> List[Dict[str, Any]]:
     """
-    Search for documents in Supabase using vector similarity.
+    Search for documents in the vector database using vector similarity.
     
     Args:
-        client: Supabase client
+        vector_db: Vector database adapter
         query: Query text
         match_count: Maximum number of results to return
-        filter_metadata: Optional metadata filter
+        source_filter: Optional source_id to restrict the search to
+        hybrid: Whether to combine vector search with keyword search
+        query_embedding: Precomputed embedding of the query (skips the embedding call)
         
     Returns:
         List of matching documents
     """
     # Create embedding for the query
-    query_embedding = create_embedding(query)
+    if query_embedding is None:
+        query_embedding = create_embedding(query)
     
-    # Execute the search using the match_crawled_pages function
     try:
-        # Only include filter parameter if filter_metadata is provided and not empty
-        params = {
-            'query_embedding': query_embedding,
-            'match_count': match_count
-        }
-        
-        # Only add the filter if it's actually provided and not empty
-        if filter_metadata:
-            params['filter'] = filter_metadata  # Pass the dictionary directly, not JSON-encoded
-        
-        result = client.rpc('match_crawled_pages', params).execute()
-        
-        return result.data
+        if hybrid:
+            return vector_db.hybrid_search(query, query_embedding, match_count, source_filter)
+        return vector_db.search_similar(query_embedding, match_count, source_filter)
     except Exception as e:
         print(f"Error searching documents: {e}")
         return []
@@ -437,20 +824,19 @@ def extract_code_blocks(markdown_content: str, min_length: int = 1000) -> List[D
     return code_blocks
 
 
-def generate_code_example_summary(code: str, context_before: str, context_after: str) -> str:
+def build_code_summary_request(model_choice: Optional[str], code: str, context_before: str, context_after: str) -> Dict[str, Any]:
     """
-    Generate a summary for a code example using its surrounding context.
+    Build the chat completion request that summarizes a code example.
     
     Args:
+        model_choice: The chat model to use
         code: The code example
         context_before: Context before the code
         context_after: Context after the code
         
     Returns:
-        A summary of what the code example demonstrates
+        Keyword arguments for openai.chat.completions.create (also usable as a batch request body)
     """
-    model_choice = os.getenv("MODEL_CHOICE")
-    
     # Create the prompt
     prompt = f"""<context_before>
 {context_before[-500:] if len(context_before) > 500 else context_before}
@@ -467,93 +853,317 @@ def generate_code_example_summary(code: str, context_before: str, context_after:
 Based on the code example and its surrounding context, provide a concise summary (2-3 sentences) that describes what this code example demonstrates and its purpose. Focus on the practical application and key concepts illustrated.
 """
     
+    return {
+        "model": model_choice,
+        "messages": [
+            {"role": "system", "content": "You are a helpful assistant that provides concise code example summaries."},
+            {"role": "user", "content": prompt}
+        ],
+        "temperature": 0.3,
+        "max_tokens": 100
+    }
+
+
+def generate_code_example_summary(code: str, context_before: str, context_after: str) -> str:
+    """
+    Generate a summary for a code example using its surrounding context.
+    
+    Args:
+        code: The code example
+        context_before: Context before the code
+        context_after: Context after the code
+        
+    Returns:
+        A summary of what the code example demonstrates
+    """
+    model_choice = os.getenv("MODEL_CHOICE")
+    
+    # Reuse a previous summary if the code and its surrounding context are unchanged
+    cache = get_llm_cache()
+    cache_context = f"{context_before[-500:]}\n{context_after[:500]}"
+    if cache:
+        cached_summary = cache.get(model_choice, CODE_SUMMARY_PROMPT_VERSION, cache_context, code[:1500])
+        if cached_summary is not None:
+            return cached_summary
+    
     try:
         response = openai.chat.completions.create(
-            model=model_choice,
-            messages=[
-                {"role": "system", "content": "You are a helpful assistant that provides concise code example summaries."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.3,
-            max_tokens=100
+            **build_code_summary_request(model_choice, code, context_before, context_after)
         )
         
-        return response.choices[0].message.content.strip()
+        summary = response.choices[0].message.content.strip()
+        if cache:
+            cache.put(model_choice, CODE_SUMMARY_PROMPT_VERSION, cache_context, code[:1500], summary)
+        
+        return summary
     
     except Exception as e:
         print(f"Error generating code example summary: {e}")
         return "Code example for demonstration purposes."
 
 
-def add_code_examples_to_supabase(
-    client: Client,
+def code_example_hash(code: str) -> str:
+    """
+    Hash a code example after normalizing whitespace, so copies that differ only in
+    indentation of blank lines or trailing spaces are treated as the same example.
+    
+    Args:
+        code: The code example
+        
+    Returns:
+        Hex digest identifying the normalized code
+    """
+    lines = [line.rstrip() for line in code.strip().splitlines()]
+    normalized = "\n".join(line for line in lines if line)
+    return hashlib.sha256(normalized.encode("utf-8", errors="replace")).hexdigest()
+
+
+def dedupe_code_blocks(url_blocks: List[Tuple[str, Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """
+    Deduplicate code blocks extracted from a crawl by normalized code hash.
+    
+    The first occurrence of each example is kept; the URLs of later occurrences are
+    recorded as references to it.
+    
+    Args:
+        url_blocks: List of (url, code block) tuples as returned by extract_code_blocks per page
+        
+    Returns:
+        List of dicts with url, block, code_hash and references (other URLs with the same code)
+    """
+    unique: Dict[str, Dict[str, Any]] = {}
+    for url, block in url_blocks:
+        code_hash = code_example_hash(block['code'])
+        if code_hash not in unique:
+            unique[code_hash] = {"url": url, "block": block, "code_hash": code_hash, "references": []}
+        elif url != unique[code_hash]["url"] and url not in unique[code_hash]["references"]:
+            unique[code_hash]["references"].append(url)
+    
+    duplicates = len(url_blocks) - len(unique)
+    if duplicates:
+        print(f"Deduplicated {duplicates} repeated code examples across {len(url_blocks)} extracted blocks")
+    return list(unique.values())
+
+
+def match_stored_code_examples(
+    vector_db: VectorDBAdapter,
+    examples: List[Dict[str, Any]],
+    crawled_urls: Iterable[str]
+) -> Tuple[List[Tuple[Dict[str, Any], Optional[Dict[str, Any]]]], List[Tuple[Dict[str, Any], List[str]]]]:
+    """
+    Match deduplicated code examples against the examples already stored, by normalized code hash.
+    
+    An example already stored for a page outside the crawl is not stored again; the URLs where it
+    was found become references on the stored row instead. An example stored for another page of
+    the crawl is moved under that page's URL, so the diff in add_code_examples_to_vector_db finds it.
+    
+    Args:
+        vector_db: Vector database adapter
+        examples: Dicts with url, code_hash and references (as returned by dedupe_code_blocks);
+            url and references are updated in place
+        crawled_urls: URLs of the pages of the crawl
+        
+    Returns:
+        Tuple of (examples to store with their stored row or None,
+        (stored row, URLs) pairs to record with add_code_example_references)
+    """
+    crawled_urls = set(crawled_urls)
+    stored = vector_db.find_code_examples_by_hash([example['code_hash'] for example in examples])
+    kept = []
+    reference_only = []
+    for example in examples:
+        row = stored.get(example['code_hash'])
+        if row and row['url'] not in crawled_urls:
+            reference_only.append((row, [example['url']] + example['references']))
+            continue
+        if row and row['url'] != example['url']:
+            example['references'] = [u for u in [example['url']] + example['references'] if u != row['url']]
+            example['url'] = row['url']
+        kept.append((example, row))
+    return kept, reference_only
+
+
+def add_code_example_references(vector_db: VectorDBAdapter, row: Dict[str, Any], urls: List[str]) -> None:
+    """
+    Record additional URLs as references to an already stored code example.
+    
+    Args:
+        vector_db: Vector database adapter
+        row: The stored code example row (must include id and metadata)
+        urls: URLs where the same code example was found
+    """
+    references = list(row['metadata'].get('references', []))
+    new_urls = [url for url in urls if url != row['url'] and url not in references]
+    if not new_urls:
+        return
+    
+    metadata = {**row['metadata'], 'references': references + new_urls}
+    try:
+        vector_db.update_metadata(row['id'], metadata, collection_type="code")
+        row['metadata'] = metadata
+    except Exception as e:
+        print(f"Error adding references to code example {row['id']}: {e}")
+
+
+def add_code_examples_to_vector_db(
+    vector_db: VectorDBAdapter,
     urls: List[str],
     chunk_numbers: List[int],
     code_examples: List[str],
     summaries: List[str],
     metadatas: List[Dict[str, Any]],
-    batch_size: int = 20
-):
+    batch_size: int = 20,
+    embeddings: Optional[List[Optional[List[float]]]] = None
+) -> Dict[str, int]:
     """
-    Add code examples to the Supabase code_examples table in batches.
+    Add code examples to the code example collection of the vector database in batches.
+    
+    Examples are matched with the rows already stored for the same URLs by (url, code hash).
+    Unchanged examples are not re-embedded or rewritten (only their references are refreshed),
+    new examples are upserted, and stored examples that no longer appear are deleted.
     
     Args:
-        client: Supabase client
+        vector_db: Vector database adapter
         urls: List of URLs
         chunk_numbers: List of chunk numbers
         code_examples: List of code example contents
         summaries: List of code example summaries
         metadatas: List of metadata dictionaries
         batch_size: Size of each batch for insertion
+        embeddings: Optional precomputed embeddings (None entries are created here)
+        
+    Returns:
+        Dictionary with the number of upserted, unchanged and deleted code examples
     """
     if not urls:
-        return
+        return {"upserted": 0, "unchanged": 0, "deleted": 0}
+    
+    code_hashes = [metadata.get('code_hash') or code_example_hash(code) for metadata, code in zip(metadatas, code_examples)]
+    for metadata, code_hash in zip(metadatas, code_hashes):
+        metadata['code_hash'] = code_hash
+    
+    # Compare with what is already stored for these URLs
+    try:
+        stored_rows = vector_db.get_rows_by_url(list(set(urls)), collection_type="code")
+        diffed = True
+    except Exception as e:
+        print(f"Error fetching stored code examples: {e}. Upserting all code examples and recomputing source statistics.")
+        stored_rows = []
+        diffed = False
+    
+    new_keys = set(zip(urls, code_hashes))
+    stored: Dict[Tuple[str, str], Dict[str, Any]] = {}
+    vanished = []
+    for row in stored_rows:
+        key = (row['url'], row['metadata'].get('code_hash'))
+        if key in new_keys and key not in stored:
+            stored[key] = row
+        else:
+            vanished.append(row)
+    
+    deltas: Dict[str, Dict[str, Any]] = {}
+    add_source_deltas(deltas, vanished, -1, "code")
+    
+    # Chunk numbers still taken by kept rows, per URL
+    used_numbers: Dict[str, set] = {}
+    for row in stored.values():
+        used_numbers.setdefault(row['url'], set()).add(row['chunk_number'])
+    
+    pending = []
+    for idx in range(len(urls)):
+        row = stored.get((urls[idx], code_hashes[idx]))
+        if row:
+            # Unchanged example: only refresh the URLs referencing it
+            references = metadatas[idx].get('references', [])
+            if row['metadata'].get('references', []) != references:
+                try:
+                    vector_db.update_metadata(
+                        row['id'], {**row['metadata'], 'references': references}, collection_type="code"
+                    )
+                except Exception as e:
+                    print(f"Error updating references of code example {row['id']}: {e}")
+            continue
         
-    # Delete existing records for these URLs
-    unique_urls = list(set(urls))
-    for url in unique_urls:
-        try:
-            client.table('code_examples').delete().eq('url', url).execute()
-        except Exception as e:
-            print(f"Error deleting existing code examples for {url}: {e}")
+        # Avoid colliding with the chunk number of a kept row for the same URL
+        used = used_numbers.setdefault(urls[idx], set())
+        chunk_number = chunk_numbers[idx]
+        if chunk_number in used:
+            chunk_number = max(used) + 1
+        used.add(chunk_number)
+        metadatas[idx]['chunk_index'] = chunk_number
+        pending.append((idx, chunk_number))
+    
+    add_source_deltas(deltas, [{"url": urls[idx]} for idx, _ in pending], 1, "code")
+    source_ids = {url_source_id(url) for url in set(urls)}
+    register_sources(vector_db, source_ids if pending else [])
     
-    # Process in batches
-    total_items = len(urls)
+    try:
+        deleted, written = _write_code_example_diff(vector_db, vanished, pending, urls, code_examples, summaries, metadatas, batch_size, embeddings)
+    except Exception:
+        _recount_after_failure(vector_db, source_ids)
+        raise
+    if written != len(pending):
+        print(f"Only {written} of {len(pending)} code examples were written. Recomputing source statistics.")
+    settle_source_counts(vector_db, deltas, source_ids, exact=diffed and written == len(pending))
+    
+    stats = {
+        "upserted": len(pending),
+        "unchanged": len(urls) - len(pending),
+        "deleted": deleted
+    }
+    print(f"Code examples upserted: {stats['upserted']}, unchanged: {stats['unchanged']}, deleted: {stats['deleted']}")
+    return stats
+
+
+def _write_code_example_diff(
+    vector_db: VectorDBAdapter,
+    vanished: List[Dict[str, Any]],
+    pending: List[Tuple[int, int]],
+    urls: List[str],
+    code_examples: List[str],
+    summaries: List[str],
+    metadatas: List[Dict[str, Any]],
+    batch_size: int,
+    embeddings: Optional[List[Optional[List[float]]]]
+) -> Tuple[int, int]:
+    """Delete the vanished code examples and embed and upsert the pending ones; returns the numbers deleted and written"""
+    # Delete examples that no longer appear on their page
+    deleted = vector_db.delete_by_ids([row['id'] for row in vanished], collection_type="code")
+    
+    # Process in batches, writing each batch while the next one is embedded
+    total_items = len(pending)
+    write_futures = []
     for i in range(0, total_items, batch_size):
-        batch_end = min(i + batch_size, total_items)
-        batch_texts = []
+        batch = pending[i:i + batch_size]
+        
+        # Only embed examples without a precomputed embedding (e.g. reused from a stored duplicate)
+        valid_embeddings = [embeddings[idx] if embeddings else None for idx, _ in batch]
+        missing = [j for j, embedding in enumerate(valid_embeddings) if embedding is None]
         
         # Create combined texts for embedding (code + summary)
-        for j in range(i, batch_end):
-            combined_text = f"{code_examples[j]}\n\nSummary: {summaries[j]}"
-            batch_texts.append(combined_text)
+        batch_texts = [f"{code_examples[batch[j][0]]}\n\nSummary: {summaries[batch[j][0]]}" for j in missing]
         
         # Create embeddings for the batch
-        embeddings = create_embeddings_batch(batch_texts)
+        new_embeddings = create_embeddings_batch(batch_texts)
         
         # Check if embeddings are valid (not all zeros)
-        valid_embeddings = []
-        for embedding in embeddings:
+        for j, text, embedding in zip(missing, batch_texts, new_embeddings):
             if embedding and not all(v == 0.0 for v in embedding):
-                valid_embeddings.append(embedding)
+                valid_embeddings[j] = embedding
             else:
                 print(f"Warning: Zero or invalid embedding detected, creating new one...")
                 # Try to create a single embedding as fallback
-                single_embedding = create_embedding(batch_texts[len(valid_embeddings)])
-                valid_embeddings.append(single_embedding)
+                valid_embeddings[j] = create_embedding(text)
         
         # Prepare batch data
         batch_data = []
-        for j, embedding in enumerate(valid_embeddings):
-            idx = i + j
-            
+        for (idx, chunk_number), embedding in zip(batch, valid_embeddings):
             # Extract source_id from URL
-            parsed_url = urlparse(urls[idx])
-            source_id = parsed_url.netloc or parsed_url.path
+            source_id = url_source_id(urls[idx])
             
             batch_data.append({
                 'url': urls[idx],
-                'chunk_number': chunk_numbers[idx],
+                'chunk_number': chunk_number,
                 'content': code_examples[idx],
                 'summary': summaries[idx],
                 'metadata': metadatas[idx],  # Store as JSON object, not string
@@ -561,70 +1171,45 @@ def add_code_examples_to_supabase(
                 'embedding': embedding
             })
         
-        # Insert batch into Supabase with retry logic
-        max_retries = 3
-        retry_delay = 1.0  # Start with 1 second delay
-        
-        for retry in range(max_retries):
-            try:
-                client.table('code_examples').insert(batch_data).execute()
-                # Success - break out of retry loop
-                break
-            except Exception as e:
-                if retry < max_retries - 1:
-                    print(f"Error inserting batch into Supabase (attempt {retry + 1}/{max_retries}): {e}")
-                    print(f"Retrying in {retry_delay} seconds...")
-                    time.sleep(retry_delay)
-                    retry_delay *= 2  # Exponential backoff
-                else:
-                    # Final attempt failed
-                    print(f"Failed to insert batch after {max_retries} attempts: {e}")
-                    # Optionally, try inserting records one by one as a last resort
-                    print("Attempting to insert records individually...")
-                    successful_inserts = 0
-                    for record in batch_data:
-                        try:
-                            client.table('code_examples').insert(record).execute()
-                            successful_inserts += 1
-                        except Exception as individual_error:
-                            print(f"Failed to insert individual record for URL {record['url']}: {individual_error}")
-                    
-                    if successful_inserts > 0:
-                        print(f"Successfully inserted {successful_inserts}/{len(batch_data)} records individually")
-        print(f"Inserted batch {i//batch_size + 1} of {(total_items + batch_size - 1)//batch_size} code examples")
-
-
-def update_source_info(client: Client, source_id: str, summary: str, word_count: int):
-    """
-    Update or insert source information in the sources table.
+        # Upsert batch into the vector database
+        write_futures.append(submit_rows(vector_db, batch_data, collection_type="code"))
+    
+    written = 0
+    for batch_number, future in enumerate(write_futures, 1):
+        written += future.result()
+        print(f"Upserted batch {batch_number} of {len(write_futures)} code examples")
+    return deleted, written
+
+
+def build_source_summary_request(model_choice: Optional[str], source_id: str, truncated_content: str) -> Dict[str, Any]:
+    """
+    Build the chat completion request that summarizes a source.
     
     Args:
-        client: Supabase client
+        model_choice: The chat model to use
         source_id: The source ID (domain)
-        summary: Summary of the source
-        word_count: Total word count for the source
+        truncated_content: The source content, already truncated to the prompt limit
+        
+    Returns:
+        Keyword arguments for openai.chat.completions.create (also usable as a batch request body)
     """
-    try:
-        # Try to update existing source
-        result = client.table('sources').update({
-            'summary': summary,
-            'total_word_count': word_count,
-            'updated_at': 'now()'
-        }).eq('source_id', source_id).execute()
-        
-        # If no rows were updated, insert new source
-        if not result.data:
-            client.table('sources').insert({
-                'source_id': source_id,
-                'summary': summary,
-                'total_word_count': word_count
-            }).execute()
-            print(f"Created new source: {source_id}")
-        else:
-            print(f"Updated source: {source_id}")
-            
-    except Exception as e:
-        print(f"Error updating source {source_id}: {e}")
+    # Create the prompt for generating the summary
+    prompt = f"""<source_content>
+{truncated_content}
+</source_content>
+
+The above content is from the documentation for '{source_id}'. Please provide a concise summary (3-5 sentences) that describes what this library/tool/framework is about. The summary should help understand what the library/tool/framework accomplishes and the purpose.
+"""
+    
+    return {
+        "model": model_choice,
+        "messages": [
+            {"role": "system", "content": "You are a helpful assistant that provides concise library/tool/framework summaries."},
+            {"role": "user", "content": prompt}
+        ],
+        "temperature": 0.3,
+        "max_tokens": 150
+    }
 
 
 def extract_source_summary(source_id: str, content: str, max_length: int = 500) -> str:
@@ -653,24 +1238,17 @@ def extract_source_summary(source_id: str, content: str, max_length: int = 500)
     # Limit content length to avoid token limits
     truncated_content = content[:25000] if len(content) > 25000 else content
     
-    # Create the prompt for generating the summary
-    prompt = f"""<source_content>
-{truncated_content}
-</source_content>
-
-The above content is from the documentation for '{source_id}'. Please provide a concise summary (3-5 sentences) that describes what this library/tool/framework is about. The summary should help understand what the library/tool/framework accomplishes and the purpose.
-"""
+    # Reuse a previous summary if the source content is unchanged
+    cache = get_llm_cache()
+    if cache:
+        cached_summary = cache.get(model_choice, SOURCE_SUMMARY_PROMPT_VERSION, truncated_content, source_id)
+        if cached_summary is not None:
+            return cached_summary
     
     try:
         # Call the OpenAI API to generate the summary
         response = openai.chat.completions.create(
-            model=model_choice,
-            messages=[
-                {"role": "system", "content": "You are a helpful assistant that provides concise library/tool/framework summaries."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.3,
-            max_tokens=150
+            **build_source_summary_request(model_choice, source_id, truncated_content)
         )
         
         # Extract the generated summary
@@ -679,6 +1257,9 @@ The above content is from the documentation for '{source_id}'. Please provide a
         # Ensure the summary is not too long
         if len(summary) > max_length:
             summary = summary[:max_length] + "..."
+        
+        if cache:
+            cache.put(model_choice, SOURCE_SUMMARY_PROMPT_VERSION, truncated_content, source_id, summary)
             
         return summary
     
@@ -688,21 +1269,21 @@ The above content is from the documentation for '{source_id}'. Please provide a
 
 
 def search_code_examples(
-    client: Client, 
+    vector_db: VectorDBAdapter, 
     query: str, 
     match_count: int = 10, 
-    filter_metadata: Optional[Dict[str, Any]] = None,
-    source_id: Optional[str] = None
+    source_id: Optional[str] = None,
+    hybrid: bool = False
 ) -> List[Dict[str, Any]]:
     """
-    Search for code examples in Supabase using vector similarity.
+    Search for code examples in the vector database using vector similarity.
     
     Args:
-        client: Supabase client
+        vector_db: Vector database adapter
         query: Query text
         match_count: Maximum number of results to return
-        filter_metadata: Optional metadata filter
         source_id: Optional source ID to filter results
+        hybrid: Whether to combine vector search with keyword search on content and summary
         
     Returns:
         List of matching code examples
@@ -714,25 +1295,10 @@ def search_code_examples(
     # Create embedding for the enhanced query
     query_embedding = create_embedding(enhanced_query)
     
-    # Execute the search using the match_code_examples function
     try:
-        # Only include filter parameter if filter_metadata is provided and not empty
-        params = {
-            'query_embedding': query_embedding,
-            'match_count': match_count
-        }
-        
-        # Only add the filter if it's actually provided and not empty
-        if filter_metadata:
-            params['filter'] = filter_metadata
-            
-        # Add source filter if provided
-        if source_id:
-            params['source_filter'] = source_id
-        
-        result = client.rpc('match_code_examples', params).execute()
-        
-        return result.data
+        if hybrid:
+            return vector_db.hybrid_search(query, query_embedding, match_count, source_id, collection_type="code")
+        return vector_db.search_similar(query_embedding, match_count, source_id, collection_type="code")
     except Exception as e:
         print(f"Error searching code examples: {e}")
-        return []
\ No newline at end of file
+        return []
@@ -1,15 +1,209 @@
 """
-Vector Database Adapter for supporting both ChromaDB and Supabase
+Vector Database Adapter for supporting ChromaDB, Supabase, direct Postgres/pgvector and an embedded local store
 """
 from abc import ABC, abstractmethod
 from typing import List, Dict, Any, Optional
+from datetime import datetime, timezone
+from urllib.parse import urlparse
+import asyncio
+import concurrent.futures
+import functools
+import hashlib
+import heapq
+import inspect
+import json
+import math
 import os
 import logging
+import struct
+import threading
+import time
+
+from query_cache import SourceGenerations
+from source_registry import SourceRegistry
 
 logger = logging.getLogger(__name__)
 
+def merge_hybrid_results(vector_results: List[Dict], keyword_results: List[Dict], limit: int) -> List[Dict]:
+    """
+    Combine vector and keyword search results with preference for items appearing in both.
+    
+    Args:
+        vector_results: Results of the vector search (with similarity)
+        keyword_results: Results of the keyword search
+        limit: Maximum number of results to return
+    
+    Returns:
+        Combined list of results
+    """
+    seen_ids = set()
+    combined_results = []
+    
+    # First, add items that appear in both searches (these are the best matches)
+    vector_by_id = {}
+    for vr in vector_results:
+        if vr.get('id'):
+            vector_by_id.setdefault(vr['id'], vr)
+    for kr in keyword_results:
+        vr = vector_by_id.get(kr['id'])
+        if vr is not None and kr['id'] not in seen_ids:
+            # Boost similarity score for items in both results
+            vr['similarity'] = min(1.0, vr.get('similarity', 0) * 1.2)
+            combined_results.append(vr)
+            seen_ids.add(kr['id'])
+    
+    # Then add remaining vector results (semantic matches without exact keyword)
+    for vr in vector_results:
+        if vr.get('id') and vr['id'] not in seen_ids and len(combined_results) < limit:
+            combined_results.append(vr)
+            seen_ids.add(vr['id'])
+    
+    # Finally, add pure keyword matches if we still need more results
+    for kr in keyword_results:
+        if kr['id'] not in seen_ids and len(combined_results) < limit:
+            combined_results.append({**kr, 'similarity': 0.5})  # Default similarity for keyword-only matches
+            seen_ids.add(kr['id'])
+    
+    return combined_results[:limit]
+
+def reciprocal_rank_fusion(rankings: List[List[Any]], limit: int, k: int = 60) -> List[tuple]:
+    """
+    Fuse ranked id lists with reciprocal rank fusion (each list adds 1 / (k + rank) per id).
+    
+    Args:
+        rankings: Lists of ids, best first
+        limit: Maximum number of ids to return
+        k: Rank offset dampening the weight of the top ranks
+    
+    Returns:
+        (id, rrf_score) pairs, best first
+    """
+    scores: Dict[Any, float] = {}
+    for ranking in rankings:
+        for rank, row_id in enumerate(ranking, start=1):
+            scores[row_id] = scores.get(row_id, 0.0) + 1.0 / (k + rank)
+    return heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+
+def _removed_row_deltas(rows: List[Dict[str, Any]], collection_type: str) -> Dict[str, Dict[str, int]]:
+    """Return the source count deltas (negative) for rows that were deleted"""
+    deltas: Dict[str, Dict[str, int]] = {}
+    for row in rows:
+        delta = deltas.setdefault(row["source_id"], {})
+        if collection_type == "code":
+            delta["code_example_count"] = delta.get("code_example_count", 0) - 1
+        else:
+            delta["chunk_count"] = delta.get("chunk_count", 0) - 1
+            delta["total_word_count"] = delta.get("total_word_count", 0) - int((row.get("metadata") or {}).get("word_count") or 0)
+    return deltas
+
+def _is_missing_function(error: Exception) -> bool:
+    """Whether a database error means a function from crawled_pages.sql is not installed"""
+    # PGRST202: PostgREST found no such function; 42883: undefined_function from Postgres
+    code = getattr(error, "code", None) or getattr(error, "sqlstate", None)
+    return str(code) in ("PGRST202", "42883")
+
+def _is_missing_column(error: Exception) -> bool:
+    """Whether a database error means a column from crawled_pages.sql, such as fts, does not exist"""
+    # 42703: undefined_column, passed through by PostgREST and asyncpg alike
+    code = getattr(error, "code", None) or getattr(error, "sqlstate", None)
+    return str(code) == "42703"
+
+MIGRATION_HINT = "run crawled_pages_upgrade.sql on the database to install it"
+
+def rows_from_embeddings(documents: List[str], embeddings: List[List[float]], metadata: List[Dict], collection_type: str = "content") -> List[Dict[str, Any]]:
+    """
+    Build table rows for store_embeddings from documents, embeddings and their metadata.
+    
+    Args:
+        documents: Document contents
+        embeddings: Embeddings of the documents
+        metadata: Metadata of the documents (must include url; chunk_index and source are used when present)
+        collection_type: "content" or "code" (code rows take their summary from metadata)
+    
+    Returns:
+        Rows in the shape of the crawled_pages / code_examples tables
+    """
+    rows = []
+    for i, (document, embedding, meta) in enumerate(zip(documents, embeddings, metadata)):
+        url = meta["url"]
+        parsed_url = urlparse(url)
+        row = {
+            "url": url,
+            "chunk_number": meta.get("chunk_index", i),
+            "content": document,
+            "metadata": meta,
+            "source_id": meta.get("source") or parsed_url.netloc or parsed_url.path,
+            "embedding": embedding
+        }
+        if collection_type == "code":
+            row["summary"] = meta.get("summary", "")
+        rows.append(row)
+    return rows
+
+def _metadata_source(meta: Dict[str, Any]) -> Optional[str]:
+    """Return the source_id rows_from_embeddings derives from a document's metadata"""
+    if meta.get("source"):
+        return meta["source"]
+    parsed_url = urlparse(meta.get("url") or "")
+    return parsed_url.netloc or parsed_url.path or None
+
+# Sources touched by each write method, from its bound arguments (None: unknown, so all)
+_WRITE_SOURCES = {
+    "upsert_rows": lambda args: {row.get("source_id") for row in args["rows"]},
+    "store_embeddings": lambda args: {_metadata_source(meta or {}) for meta in args["metadata"]},
+    "delete_batch": lambda args: {args["source_id"]} if args["source_id"] is not None else None,
+    "delete_source_record": lambda args: {args["source_id"]},
+    "delete_by_ids": lambda args: None,
+    "delete_by_urls": lambda args: None,
+    "update_metadata": lambda args: None
+}
+
+def _bump_generations_after(method, sources):
+    """Wrap an adapter write method to bump the write generations of the sources it touched"""
+    signature = inspect.signature(method)
+    
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            # Also after a failure: part of the write may have been applied
+            bound = signature.bind(self, *args, **kwargs)
+            bound.apply_defaults()
+            touched = sources(bound.arguments)
+            self.generations.bump(None if touched is None or None in touched else touched)
+    
+    wrapper._bumps_generations = True
+    return wrapper
+
 class VectorDBAdapter(ABC):
-    """Abstract base class for vector database adapters"""
+    """Abstract base class for vector database adapters
+    
+    Rows exchanged with an adapter follow the shape of the Supabase tables: url, chunk_number,
+    content, metadata, source_id and embedding, plus summary for code examples. collection_type
+    selects between crawled content ("content") and code examples ("code").
+    """
+    
+    # True if hybrid_search fuses both legs itself (one database call, or concurrent legs);
+    # otherwise callers may run keyword_search while the query is still being embedded
+    native_hybrid_search = False
+    
+    def __init_subclass__(cls, **kwargs):
+        # Every write method of a concrete adapter bumps the write generations when it returns,
+        # which invalidates cached search results of the sources it touched
+        super().__init_subclass__(**kwargs)
+        for name, sources in _WRITE_SOURCES.items():
+            method = cls.__dict__.get(name)
+            if method is not None and not getattr(method, "_bumps_generations", False):
+                setattr(cls, name, _bump_generations_after(method, sources))
+    
+    @property
+    def generations(self) -> SourceGenerations:
+        """Per-source write generation counters of this adapter (see query_cache)"""
+        generations = self.__dict__.get("_generations")
+        if generations is None:
+            generations = self.__dict__.setdefault("_generations", SourceGenerations())
+        return generations
     
     @abstractmethod
     def store_embeddings(self, documents: List[str], embeddings: List[List[float]], metadata: List[Dict]) -> None:
@@ -17,7 +211,7 @@ class VectorDBAdapter(ABC):
         pass
     
     @abstractmethod
-    def search_similar(self, query_embedding: List[float], limit: int = 10, source_filter: Optional[str] = None) -> List[Dict]:
+    def search_similar(self, query_embedding: List[float], limit: int = 10, source_filter: Optional[str] = None, collection_type: str = "content") -> List[Dict]:
         """Search for similar documents using vector similarity"""
         pass
     
@@ -25,11 +219,108 @@ class VectorDBAdapter(ABC):
     def get_sources(self) -> List[str]:
         """Get list of available sources/domains"""
         pass
+    
+    @abstractmethod
+    def upsert_rows(self, rows: List[Dict[str, Any]], collection_type: str = "content") -> int:
+        """Insert or replace rows keyed by (url, chunk_number), returning the number written"""
+        pass
+    
+    @abstractmethod
+    def get_rows_by_url(self, urls: List[str], collection_type: str = "content") -> List[Dict[str, Any]]:
+        """Get the id, url, chunk_number and metadata of every stored row for the given URLs"""
+        pass
+    
+    @abstractmethod
+    def delete_by_ids(self, ids: List[Any], collection_type: str = "content") -> int:
+        """Delete rows by id, returning the number deleted"""
+        pass
+    
+    @abstractmethod
+    def delete_by_urls(self, urls: List[str], collection_type: str = "content") -> None:
+        """Delete every row stored for the given URLs"""
+        pass
+    
+    @abstractmethod
+    def delete_batch(self, collection_type: str = "content", source_id: Optional[str] = None, urls: Optional[List[str]] = None, batch_size: int = 1000) -> int:
+        """Delete up to batch_size rows of a source and/or a list of URLs, lowest ids first
+        
+        Each batch is committed on its own and source statistics are adjusted for the removed
+        rows, so a large delete is done by calling this until it returns less than batch_size,
+        and an interrupted delete resumes by simply calling it again.
+        
+        Returns:
+            Number of rows deleted
+        """
+        pass
+    
+    @abstractmethod
+    def delete_source_record(self, source_id: str) -> None:
+        """Delete a source's entry (summary and statistics)"""
+        pass
+    
+    @abstractmethod
+    def update_metadata(self, row_id: Any, metadata: Dict[str, Any], collection_type: str = "content") -> None:
+        """Replace the metadata of a stored row"""
+        pass
+    
+    @abstractmethod
+    def find_code_examples_by_hash(self, code_hashes: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Map normalized code hashes to stored code examples (id, url, summary, metadata, embedding)"""
+        pass
+    
+    @abstractmethod
+    def update_sources(self, updates: Dict[str, Dict[str, Any]]) -> None:
+        """Bulk-upsert sources: an optional summary and count deltas added to the stored counts
+        
+        Args:
+            updates: Mapping of source_id to {"summary": ..., "chunk_count": delta,
+                "code_example_count": delta, "total_word_count": delta}; every key is optional
+        """
+        pass
+    
+    @abstractmethod
+    def recompute_source_stats(self, source_ids: Optional[List[str]] = None) -> None:
+        """Recompute source counts from the stored rows (all sources if source_ids is None)"""
+        pass
+    
+    @abstractmethod
+    def list_sources(self) -> List[Dict[str, Any]]:
+        """List sources with their summary, word count and timestamps"""
+        pass
+    
+    @abstractmethod
+    def keyword_search(self, query: str, limit: int = 10, source_filter: Optional[str] = None, collection_type: str = "content") -> List[Dict]:
+        """Search for rows containing the query text"""
+        pass
+    
+    def close(self) -> None:
+        """Release resources held by the adapter"""
+        pass
+    
+    def hybrid_search(self, query: str, query_embedding: List[float], limit: int = 10, source_filter: Optional[str] = None, collection_type: str = "content") -> List[Dict]:
+        """Combine vector and keyword search, preferring rows found by both"""
+        # Get double the results to have room for merging
+        vector_results = self.search_similar(query_embedding, limit * 2, source_filter, collection_type)
+        keyword_results = self.keyword_search(query, limit * 2, source_filter, collection_type)
+        return merge_hybrid_results(vector_results, keyword_results, limit)
 
 class ChromaDBAdapter(VectorDBAdapter):
-    """ChromaDB adapter for local vector storage"""
+    """ChromaDB adapter for local vector storage
+    
+    With shard_by_source, every source gets its own pair of collections, so a source-filtered
+    query searches only that source's HNSW index instead of over-scanning a global one, and
+    unfiltered queries fan out to all shards concurrently and merge the top-k by distance.
+    
+    With keyword_index, every write and delete is mirrored into an in-process BM25 index per
+    collection type, which backs keyword_search and the RRF-fused hybrid_search.
+    """
+    
+    # Used when the client does not report its max batch size
+    DEFAULT_MAX_BATCH_SIZE = 5000
+    
+    COLLECTION_NAMES = {"content": "crawled_content", "code": "code_examples"}
     
-    def __init__(self, persist_directory: str = "./data/chroma"):
+    def __init__(self, persist_directory: str = "./data/chroma", write_concurrency: int = 1, shard_by_source: bool = False, query_concurrency: int = 8, keyword_index: bool = True):
         try:
             import chromadb
             from chromadb.config import Settings as ChromaSettings
@@ -41,6 +332,11 @@ class ChromaDBAdapter(VectorDBAdapter):
             path=persist_directory,
             settings=ChromaSettings(anonymized_telemetry=False)
         )
+        self.write_concurrency = max(1, write_concurrency)
+        try:
+            self.max_batch_size = self.client.get_max_batch_size()
+        except Exception:
+            self.max_batch_size = self.DEFAULT_MAX_BATCH_SIZE
         
         # Main collection for crawled content
         self.collection = self.client.get_or_create_collection(
@@ -54,25 +350,341 @@ class ChromaDBAdapter(VectorDBAdapter):
             metadata={"hnsw:space": "cosine"}
         )
         
-        logger.info(f"ChromaDB initialized with persist directory: {persist_directory}")
+        # Per-source shards ({collection_type: {source_id: collection}}), used instead of the two
+        # collections above when shard_by_source is set
+        self.shard_by_source = shard_by_source
+        self.query_concurrency = max(1, query_concurrency)
+        self._shards: Dict[str, Dict[str, Any]] = {collection_type: {} for collection_type in self.COLLECTION_NAMES}
+        self._shards_lock = threading.Lock()
+        self._executor = None
+        self._load_shards()
+        self._migrate_shard_layout()
+        
+        # Per-source statistics, maintained at write time so listing sources never scans the collections
+        self._write_lock = threading.Lock()
+        self.source_registry = SourceRegistry(os.path.join(persist_directory, "source_registry.db"))
+        if self.source_registry.is_empty() and any(
+            collection.count() for collection_type in self.COLLECTION_NAMES for collection in self._collections(collection_type)
+        ):
+            self.rebuild_source_registry()
+        
+        # BM25 keyword indexes ({collection_type: BM25Index}), empty when keyword_index is off
+        self.keyword_indexes: Dict[str, Any] = {}
+        self._keyword_executor = None
+        if keyword_index:
+            from bm25_index import BM25Index
+            self.keyword_indexes = {
+                collection_type: BM25Index(os.path.join(persist_directory, "bm25", collection_type))
+                for collection_type in self.COLLECTION_NAMES
+            }
+            self.native_hybrid_search = True
+            if not any(len(index) for index in self.keyword_indexes.values()) and any(
+                collection.count() for collection_type in self.COLLECTION_NAMES for collection in self._collections(collection_type)
+            ):
+                self.rebuild_keyword_index()
+        
+        logger.info(
+            f"ChromaDB initialized with persist directory: {persist_directory}"
+            + (f" ({sum(len(shards) for shards in self._shards.values())} source shards)" if shard_by_source else "")
+        )
+    
+    def _collection(self, collection_type: str):
+        return self.code_collection if collection_type == "code" else self.collection
+    
+    def _shard_name(self, collection_type: str, source_id: str) -> str:
+        # Collection names are restricted to [a-zA-Z0-9._-], so shards are named by a hash of the source
+        digest = hashlib.sha1(source_id.encode("utf-8")).hexdigest()[:16]
+        return f"{self.COLLECTION_NAMES[collection_type]}__{digest}"
+    
+    def _load_shards(self) -> None:
+        """Discover existing per-source shards from their collection metadata"""
+        for collection in self.client.list_collections():
+            name = collection if isinstance(collection, str) else collection.name
+            for collection_type, base_name in self.COLLECTION_NAMES.items():
+                if name.startswith(f"{base_name}__"):
+                    collection = self.client.get_collection(name)
+                    source_id = (collection.metadata or {}).get("source_id")
+                    if source_id:
+                        self._shards[collection_type][source_id] = collection
+    
+    def _migrate_shard_layout(self) -> None:
+        """Move records written under the other CHROMA_SHARD_BY_SOURCE setting to where they belong now
+        
+        With sharding on, records of a source still in the unsharded collection are moved into
+        the source's shard; with sharding off, every shard is merged back into the unsharded
+        collection and dropped. Ids stay the same, so the source registry and BM25 indexes are
+        unaffected, and an interrupted migration simply continues on the next start.
+        """
+        for collection_type in self.COLLECTION_NAMES:
+            unsharded = self._collection(collection_type)
+            moved = 0
+            if self.shard_by_source:
+                offset = 0
+                while True:
+                    batch = unsharded.get(
+                        limit=self.max_batch_size, offset=offset,
+                        include=["documents", "embeddings", "metadatas"]
+                    )
+                    if not batch["ids"]:
+                        break
+                    by_source: Dict[str, List[int]] = {}
+                    for i, metadata in enumerate(batch["metadatas"]):
+                        source_id = (metadata or {}).get("source")
+                        if source_id:
+                            by_source.setdefault(source_id, []).append(i)
+                    for source_id, positions in by_source.items():
+                        self._move_records(batch, positions, unsharded, self._write_collection(collection_type, source_id))
+                        moved += len(positions)
+                    # Records without a source stay, so the next page starts after them
+                    offset += len(batch["ids"]) - sum(len(positions) for positions in by_source.values())
+            else:
+                for source_id, shard in list(self._shards[collection_type].items()):
+                    while True:
+                        batch = shard.get(limit=self.max_batch_size, include=["documents", "embeddings", "metadatas"])
+                        if not batch["ids"]:
+                            break
+                        self._move_records(batch, range(len(batch["ids"])), shard, unsharded)
+                        moved += len(batch["ids"])
+                    self.client.delete_collection(shard.name)
+                    del self._shards[collection_type][source_id]
+            if moved:
+                logger.info(
+                    f"Moved {moved} {collection_type} records "
+                    + ("into per-source shards" if self.shard_by_source else "out of per-source shards")
+                )
+    
+    @staticmethod
+    def _move_records(batch: Dict[str, Any], positions, source, target) -> None:
+        """Copy the records at positions of a get() result from one collection to another, then delete them"""
+        ids = [batch["ids"][i] for i in positions]
+        target.upsert(
+            ids=ids,
+            documents=[batch["documents"][i] for i in positions],
+            embeddings=[batch["embeddings"][i] for i in positions],
+            metadatas=[batch["metadatas"][i] for i in positions]
+        )
+        source.delete(ids=ids)
+    
+    def _write_collection(self, collection_type: str, source_id: Optional[str]):
+        """Return the collection a record of the source is written to, creating its shard if needed"""
+        if not self.shard_by_source or not source_id:
+            return self._collection(collection_type)
+        with self._shards_lock:
+            shard = self._shards[collection_type].get(source_id)
+            if shard is None:
+                shard = self.client.get_or_create_collection(
+                    name=self._shard_name(collection_type, source_id),
+                    metadata={"hnsw:space": "cosine", "source_id": source_id}
+                )
+                self._shards[collection_type][source_id] = shard
+            return shard
+    
+    def _collections(self, collection_type: str, source_id: Optional[str] = None) -> List[Any]:
+        """Return the collections holding a source's records (or all records if source_id is None)"""
+        if not self.shard_by_source:
+            return [self._collection(collection_type)]
+        with self._shards_lock:
+            if source_id is not None:
+                shard = self._shards[collection_type].get(source_id)
+                return [shard] if shard is not None else []
+            # Records written without a source stay in the unsharded collection
+            return [self._collection(collection_type), *self._shards[collection_type].values()]
+    
+    def _map(self, fn, collections: List[Any]) -> List[Any]:
+        """Apply fn to each collection, concurrently when there are several"""
+        if len(collections) <= 1 or self.query_concurrency == 1:
+            return [fn(collection) for collection in collections]
+        with self._shards_lock:
+            if self._executor is None:
+                self._executor = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=self.query_concurrency,
+                    thread_name_prefix="chroma-query"
+                )
+            executor = self._executor
+        return list(executor.map(fn, collections))
+    
+    def close(self) -> None:
+        """Stop the query pools and checkpoint the keyword indexes"""
+        with self._shards_lock:
+            for executor in (self._executor, self._keyword_executor):
+                if executor is not None:
+                    executor.shutdown(wait=True)
+            self._executor = None
+            self._keyword_executor = None
+        for index in self.keyword_indexes.values():
+            index.close()
+    
+    @staticmethod
+    def _row_id(url: str, chunk_number: int) -> str:
+        return f"{url}#{chunk_number}"
+    
+    @staticmethod
+    def _to_chroma_metadata(row: Dict[str, Any]) -> Dict[str, Any]:
+        """Flatten a row into Chroma metadata (scalar values only)"""
+        metadata = row.get("metadata") or {}
+        chroma_metadata = {
+            "url": row["url"],
+            "chunk_number": row["chunk_number"],
+            "source": row["source_id"],
+            "source_id": row["source_id"],
+            # Nested metadata (lists, dicts) is kept as JSON
+            "metadata_json": json.dumps(metadata)
+        }
+        for key in ("content_hash", "code_hash", "word_count"):
+            if key in metadata:
+                chroma_metadata[key] = metadata[key]
+        if row.get("summary") is not None:
+            chroma_metadata["summary"] = row["summary"]
+        return chroma_metadata
+    
+    @staticmethod
+    def _from_chroma(row_id: str, document: Optional[str], chroma_metadata: Dict[str, Any]) -> Dict[str, Any]:
+        """Rebuild a row from a Chroma record"""
+        chroma_metadata = chroma_metadata or {}
+        if "metadata_json" in chroma_metadata:
+            metadata = json.loads(chroma_metadata["metadata_json"])
+        else:
+            metadata = dict(chroma_metadata)
+        row = {
+            "id": row_id,
+            "url": chroma_metadata.get("url"),
+            "chunk_number": chroma_metadata.get("chunk_number"),
+            "content": document,
+            "metadata": metadata,
+            "source_id": chroma_metadata.get("source_id", chroma_metadata.get("source"))
+        }
+        if "summary" in chroma_metadata:
+            row["summary"] = chroma_metadata["summary"]
+        return row
+    
+    @staticmethod
+    def _source_stats(chroma_metadata: Dict[str, Any]):
+        """Return the source and word count recorded in a Chroma record's metadata"""
+        source = chroma_metadata.get("source")
+        word_count = chroma_metadata.get("word_count")
+        if word_count is None and "metadata_json" in chroma_metadata:
+            word_count = json.loads(chroma_metadata["metadata_json"]).get("word_count")
+        return source, int(word_count or 0)
+    
+    def _add_deltas(self, deltas: Dict[str, Dict[str, int]], metadatas: List[Dict], sign: int, collection_type: str) -> None:
+        """Accumulate registry count deltas for records being written (+1) or removed (-1)"""
+        count_column = "code_example_count" if collection_type == "code" else "chunk_count"
+        for chroma_metadata in metadatas:
+            source, word_count = self._source_stats(chroma_metadata or {})
+            if not source:
+                continue
+            delta = deltas.setdefault(source, {})
+            delta[count_column] = delta.get(count_column, 0) + sign
+            if collection_type != "code":
+                delta["total_word_count"] = delta.get("total_word_count", 0) + sign * word_count
+    
+    def rebuild_source_registry(self) -> None:
+        """Recompute the source registry counts by paging through the metadata of all collections"""
+        counts: Dict[str, Dict[str, int]] = {}
+        for collection_type in self.COLLECTION_NAMES:
+            for collection in self._collections(collection_type):
+                offset = 0
+                while True:
+                    page = collection.get(include=["metadatas"], limit=self.max_batch_size, offset=offset)
+                    if not page["ids"]:
+                        break
+                    self._add_deltas(counts, page["metadatas"], 1, collection_type)
+                    offset += len(page["ids"])
+        self.source_registry.replace_counts(counts)
+        logger.info(f"Rebuilt ChromaDB source registry for {len(counts)} sources")
+    
+    @staticmethod
+    def _keyword_text(document: Optional[str], chroma_metadata: Dict[str, Any]) -> str:
+        """Text indexed for keyword search: the document plus the code summary, if any"""
+        summary = (chroma_metadata or {}).get("summary")
+        return f"{document or ''} {summary}" if summary else document or ""
+    
+    def rebuild_keyword_index(self) -> None:
+        """Rebuild the BM25 keyword indexes by paging through the documents of all collections"""
+        for collection_type, index in self.keyword_indexes.items():
+            index.clear()
+            for collection in self._collections(collection_type):
+                offset = 0
+                while True:
+                    page = collection.get(include=["documents", "metadatas"], limit=self.max_batch_size, offset=offset)
+                    if not page["ids"]:
+                        break
+                    index.add(
+                        page["ids"],
+                        [self._keyword_text(document, metadata) for document, metadata in zip(page["documents"], page["metadatas"])],
+                        [(metadata or {}).get("source") for metadata in page["metadatas"]]
+                    )
+                    offset += len(page["ids"])
+            index.checkpoint()
+            logger.info(f"Rebuilt ChromaDB {collection_type} keyword index with {len(index)} documents")
+    
+    def _upsert(self, collection_type: str, ids: List[str], documents: List[str], embeddings: List[List[float]], metadatas: List[Dict]) -> int:
+        """Upsert records in slices of the client's max batch size, optionally writing slices concurrently"""
+        # Chroma rejects duplicate ids within one call; keep the last record for each id
+        positions = {record_id: i for i, record_id in enumerate(ids)}
+        if len(positions) < len(ids):
+            keep = sorted(positions.values())
+            ids = [ids[i] for i in keep]
+            documents = [documents[i] for i in keep]
+            embeddings = [embeddings[i] for i in keep]
+            metadatas = [metadatas[i] for i in keep]
+        
+        # Group records by target collection (one per source when sharding), then slice each group
+        groups: Dict[Any, List[int]] = {}
+        collections = {}
+        for i, metadata in enumerate(metadatas):
+            collection = self._write_collection(collection_type, (metadata or {}).get("source"))
+            collections[id(collection)] = collection
+            groups.setdefault(id(collection), []).append(i)
+        slices = []
+        for key, positions in groups.items():
+            for start in range(0, len(positions), self.max_batch_size):
+                batch = positions[start:start + self.max_batch_size]
+                slices.append((
+                    collections[key], [ids[i] for i in batch], [documents[i] for i in batch],
+                    [embeddings[i] for i in batch], [metadatas[i] for i in batch]
+                ))
+        
+        def write(batch):
+            collection, batch_ids, batch_documents, batch_embeddings, batch_metadatas = batch
+            # Records being replaced are subtracted from the registry before the new ones are added
+            replaced = collection.get(ids=batch_ids, include=["metadatas"])
+            collection.upsert(ids=batch_ids, documents=batch_documents, embeddings=batch_embeddings, metadatas=batch_metadatas)
+            deltas: Dict[str, Dict[str, int]] = {}
+            self._add_deltas(deltas, replaced["metadatas"], -1, collection_type)
+            self._add_deltas(deltas, batch_metadatas, 1, collection_type)
+            self.source_registry.apply_deltas(deltas)
+            index = self.keyword_indexes.get(collection_type)
+            if index is not None:
+                index.add(
+                    batch_ids,
+                    [self._keyword_text(document, metadata) for document, metadata in zip(batch_documents, batch_metadatas)],
+                    [(metadata or {}).get("source") for metadata in batch_metadatas]
+                )
+            return len(batch_ids)
+        
+        # Serialize overlapping writes so replaced-record lookups stay consistent with the registry
+        with self._write_lock:
+            if len(slices) <= 1 or self.write_concurrency == 1:
+                return sum(write(batch) for batch in slices)
+            
+            with concurrent.futures.ThreadPoolExecutor(max_workers=self.write_concurrency) as executor:
+                return sum(executor.map(write, slices))
     
     def store_embeddings(self, documents: List[str], embeddings: List[List[float]], metadata: List[Dict], collection_type: str = "content") -> None:
         """Store documents with embeddings in ChromaDB"""
         try:
-            collection = self.code_collection if collection_type == "code" else self.collection
+            # Derive stable IDs so re-storing the same chunk replaces it instead of duplicating it
+            ids = []
+            for document, meta in zip(documents, metadata):
+                if meta.get("url") and meta.get("chunk_index") is not None:
+                    ids.append(self._row_id(meta["url"], meta["chunk_index"]))
+                else:
+                    ids.append(hashlib.sha256(document.encode("utf-8", errors="replace")).hexdigest())
             
-            # Generate unique IDs
-            import uuid
-            ids = [str(uuid.uuid4()) for _ in documents]
+            written = self._upsert(collection_type, ids, documents, embeddings, metadata)
             
-            collection.add(
-                documents=documents,
-                embeddings=embeddings,
-                metadatas=metadata,
-                ids=ids
-            )
-            
-            logger.info(f"Stored {len(documents)} documents in ChromaDB {collection_type} collection")
+            logger.info(f"Stored {written} documents in ChromaDB {collection_type} collection")
         except Exception as e:
             logger.error(f"Error storing embeddings in ChromaDB: {e}")
             raise
@@ -80,33 +692,36 @@ class ChromaDBAdapter(VectorDBAdapter):
     def search_similar(self, query_embedding: List[float], limit: int = 10, source_filter: Optional[str] = None, collection_type: str = "content") -> List[Dict]:
         """Search for similar documents in ChromaDB"""
         try:
-            collection = self.code_collection if collection_type == "code" else self.collection
-            
-            # Build where filter for source if specified
+            # A source's shard holds only that source, so no where filter is needed there
+            collections = self._collections(collection_type, source_filter)
             where_filter = None
-            if source_filter:
+            if source_filter and not self.shard_by_source:
                 where_filter = {"source": {"$eq": source_filter}}
             
-            results = collection.query(
-                query_embeddings=[query_embedding],
-                n_results=limit,
-                where=where_filter
-            )
+            def query(collection):
+                return collection.query(
+                    query_embeddings=[query_embedding],
+                    n_results=limit,
+                    where=where_filter
+                )
+            
+            # Gather (distance, id, document, metadata) from every queried collection
+            matches = []
+            for results in self._map(query, collections):
+                if results['documents'] and results['documents'][0]:
+                    matches.extend(zip(
+                        results['distances'][0],
+                        results['ids'][0],
+                        results['documents'][0],
+                        results['metadatas'][0]
+                    ))
             
             # Format results
             formatted_results = []
-            if results['documents'] and results['documents'][0]:
-                for i, (doc, metadata, distance) in enumerate(zip(
-                    results['documents'][0],
-                    results['metadatas'][0],
-                    results['distances'][0]
-                )):
-                    formatted_results.append({
-                        "content": doc,
-                        "metadata": metadata,
-                        "similarity": 1.0 - distance,  # Convert distance to similarity
-                        "source": metadata.get('source', 'unknown')
-                    })
+            for distance, row_id, doc, metadata in heapq.nsmallest(limit, matches, key=lambda match: match[0]):
+                row = self._from_chroma(row_id, doc, metadata)
+                row["similarity"] = 1.0 - distance  # Convert distance to similarity
+                formatted_results.append(row)
             
             return formatted_results
         except Exception as e:
@@ -116,41 +731,381 @@ class ChromaDBAdapter(VectorDBAdapter):
     def get_sources(self) -> List[str]:
         """Get list of available sources from ChromaDB"""
         try:
-            # Get all metadata and extract unique sources
-            results = self.collection.get()
-            sources = set()
-            
-            if results['metadatas']:
-                for metadata in results['metadatas']:
-                    if 'source' in metadata:
-                        sources.add(metadata['source'])
-            
-            return sorted(list(sources))
+            return self.source_registry.source_ids()
         except Exception as e:
             logger.error(f"Error getting sources from ChromaDB: {e}")
             return []
+    
+    def upsert_rows(self, rows: List[Dict[str, Any]], collection_type: str = "content") -> int:
+        """Upsert rows into ChromaDB with ids derived from (url, chunk_number)"""
+        if not rows:
+            return 0
+        return self._upsert(
+            collection_type,
+            [self._row_id(row["url"], row["chunk_number"]) for row in rows],
+            [row["content"] for row in rows],
+            [row["embedding"] for row in rows],
+            [self._to_chroma_metadata(row) for row in rows]
+        )
+    
+    def get_rows_by_url(self, urls: List[str], collection_type: str = "content") -> List[Dict[str, Any]]:
+        """Get stored rows for the given URLs from ChromaDB (without documents or embeddings)"""
+        if not urls:
+            return []
+        rows = []
+        for results in self._map(
+            lambda collection: collection.get(where={"url": {"$in": urls}}, include=["metadatas"]),
+            self._collections(collection_type)
+        ):
+            rows.extend(self._from_chroma(row_id, None, metadata) for row_id, metadata in zip(results["ids"], results["metadatas"]))
+        return rows
+    
+    def delete_by_ids(self, ids: List[Any], collection_type: str = "content") -> int:
+        """Delete rows by id from ChromaDB"""
+        if not ids:
+            return 0
+        return self._delete(collection_type, ids=ids)
+    
+    def delete_by_urls(self, urls: List[str], collection_type: str = "content") -> None:
+        """Delete every row stored for the given URLs from ChromaDB"""
+        if urls:
+            self._delete(collection_type, where={"url": {"$in": urls}})
+    
+    def delete_batch(self, collection_type: str = "content", source_id: Optional[str] = None, urls: Optional[List[str]] = None, batch_size: int = 1000) -> int:
+        """Delete up to batch_size records of a source and/or a list of URLs from ChromaDB"""
+        conditions = []
+        if source_id is not None and not self.shard_by_source:
+            conditions.append({"source": {"$eq": source_id}})
+        if urls is not None:
+            conditions.append({"url": {"$in": urls}})
+        where = {"$and": conditions} if len(conditions) > 1 else (conditions[0] if conditions else None)
+        return self._delete(collection_type, where=where, limit=batch_size, source_id=source_id)
+    
+    def delete_source_record(self, source_id: str) -> None:
+        """Delete a source from the registry, dropping its (emptied) shards when sharding"""
+        if self.shard_by_source:
+            with self._shards_lock:
+                for collection_type, shards in self._shards.items():
+                    shard = shards.get(source_id)
+                    if shard is not None and shard.count() == 0:
+                        self.client.delete_collection(shard.name)
+                        del shards[source_id]
+        self.source_registry.delete_source(source_id)
+    
+    def _delete(self, collection_type: str, ids: Optional[List[str]] = None, where: Optional[Dict[str, Any]] = None, limit: Optional[int] = None, source_id: Optional[str] = None) -> int:
+        """Delete (up to limit) records matching ids or a where filter and subtract them from the source registry"""
+        deleted = 0
+        with self._write_lock:
+            for collection in self._collections(collection_type, source_id):
+                if limit is not None and deleted >= limit:
+                    break
+                removed = collection.get(
+                    ids=ids, where=where, limit=None if limit is None else limit - deleted, include=["metadatas"]
+                )
+                if not removed["ids"]:
+                    continue
+                collection.delete(ids=removed["ids"])
+                deltas: Dict[str, Dict[str, int]] = {}
+                self._add_deltas(deltas, removed["metadatas"], -1, collection_type)
+                self.source_registry.apply_deltas(deltas)
+                if collection_type in self.keyword_indexes:
+                    self.keyword_indexes[collection_type].remove(removed["ids"])
+                deleted += len(removed["ids"])
+        return deleted
+    
+    def update_metadata(self, row_id: Any, metadata: Dict[str, Any], collection_type: str = "content") -> None:
+        """Replace the nested metadata of a stored row in ChromaDB"""
+        for collection in self._collections(collection_type):
+            current = collection.get(ids=[row_id], include=["metadatas"])
+            if current["ids"]:
+                chroma_metadata = {**current["metadatas"][0], "metadata_json": json.dumps(metadata)}
+                collection.update(ids=[row_id], metadatas=[chroma_metadata])
+                return
+    
+    def find_code_examples_by_hash(self, code_hashes: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Look up stored code examples by normalized code hash in ChromaDB"""
+        if not code_hashes:
+            return {}
+        try:
+            pages = self._map(
+                lambda collection: collection.get(
+                    where={"code_hash": {"$in": code_hashes}},
+                    include=["documents", "metadatas", "embeddings"]
+                ),
+                self._collections("code")
+            )
+        except Exception as e:
+            logger.error(f"Error looking up code examples in ChromaDB: {e}")
+            return {}
+        stored = {}
+        for results in pages:
+            for row_id, document, metadata, embedding in zip(
+                results["ids"], results["documents"], results["metadatas"], results["embeddings"]
+            ):
+                row = self._from_chroma(row_id, document, metadata)
+                row["embedding"] = [float(v) for v in embedding]
+                stored.setdefault(metadata.get("code_hash"), row)
+        return stored
+    
+    def update_sources(self, updates: Dict[str, Dict[str, Any]]) -> None:
+        """Set source summaries in the ChromaDB source registry
+        
+        Counts are already applied as chunks are written and deleted, so the deltas are ignored.
+        """
+        self.source_registry.set_summaries({
+            source_id: update["summary"] for source_id, update in updates.items() if update.get("summary") is not None
+        })
+    
+    def recompute_source_stats(self, source_ids: Optional[List[str]] = None) -> None:
+        """Recompute the source registry from the collections"""
+        self.rebuild_source_registry()
+    
+    def list_sources(self) -> List[Dict[str, Any]]:
+        """List sources from the ChromaDB source registry"""
+        try:
+            return self.source_registry.list_sources()
+        except Exception as e:
+            logger.error(f"Error listing sources from ChromaDB: {e}")
+            return []
+    
+    def _get_by_ids(self, ids: List[str], source_filter: Optional[str], collection_type: str, include: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Fetch records by id as {id: {"document", "metadata", "embedding"}}"""
+        records = {}
+        if not ids:
+            return records
+        for results in self._map(
+            lambda collection: collection.get(ids=ids, include=include),
+            self._collections(collection_type, source_filter)
+        ):
+            for i, row_id in enumerate(results["ids"]):
+                records[row_id] = {
+                    "document": results["documents"][i] if "documents" in include else None,
+                    "metadata": results["metadatas"][i],
+                    "embedding": results["embeddings"][i] if "embeddings" in include else None
+                }
+        return records
+    
+    def _keyword_ranking(self, query: str, limit: int, source_filter: Optional[str], collection_type: str) -> List[str]:
+        """Return the ids of the best BM25 matches, best first"""
+        return [row_id for row_id, _ in self.keyword_indexes[collection_type].search(query, limit, source_filter)]
+    
+    def hybrid_search(self, query: str, query_embedding: List[float], limit: int = 10, source_filter: Optional[str] = None, collection_type: str = "content") -> List[Dict]:
+        """Query the BM25 index and the vector index concurrently and fuse them with reciprocal rank fusion"""
+        if collection_type not in self.keyword_indexes:
+            return super().hybrid_search(query, query_embedding, limit, source_filter, collection_type)
+        
+        # The keyword leg runs on its own pool: the vector leg may fan out over the shard pool
+        with self._shards_lock:
+            if self._keyword_executor is None:
+                self._keyword_executor = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=self.query_concurrency,
+                    thread_name_prefix="chroma-keyword"
+                )
+            keyword_future = self._keyword_executor.submit(self._keyword_ranking, query, limit * 2, source_filter, collection_type)
+        vector_results = self.search_similar(query_embedding, limit * 2, source_filter, collection_type)
+        try:
+            keyword_ids = keyword_future.result()
+        except Exception as e:
+            logger.error(f"Error running keyword search in ChromaDB: {e}")
+            keyword_ids = []
+        
+        rows = {row["id"]: row for row in vector_results}
+        fused = reciprocal_rank_fusion([[row["id"] for row in vector_results], keyword_ids], limit)
+        
+        # Keyword-only matches are fetched with their embeddings to report their similarity too
+        missing = self._get_by_ids(
+            [row_id for row_id, _ in fused if row_id not in rows], source_filter, collection_type,
+            ["documents", "metadatas", "embeddings"]
+        )
+        query_norm = math.sqrt(sum(value * value for value in query_embedding)) or 1.0
+        results = []
+        for row_id, rrf_score in fused:
+            if row_id in rows:
+                row = rows[row_id]
+            elif row_id in missing:
+                record = missing[row_id]
+                row = self._from_chroma(row_id, record["document"], record["metadata"])
+                embedding = [float(value) for value in record["embedding"]]
+                norm = math.sqrt(sum(value * value for value in embedding)) or 1.0
+                row["similarity"] = sum(a * b for a, b in zip(embedding, query_embedding)) / (norm * query_norm)
+            else:
+                continue
+            row["rrf_score"] = rrf_score
+            results.append(row)
+        return results
+    
+    def keyword_search(self, query: str, limit: int = 10, source_filter: Optional[str] = None, collection_type: str = "content") -> List[Dict]:
+        """Search ChromaDB by BM25 rank (or, without a keyword index, for documents containing the query text)"""
+        if collection_type in self.keyword_indexes:
+            try:
+                ranking = self._keyword_ranking(query, limit, source_filter, collection_type)
+                records = self._get_by_ids(ranking, source_filter, collection_type, ["documents", "metadatas"])
+                return [
+                    self._from_chroma(row_id, records[row_id]["document"], records[row_id]["metadata"])
+                    for row_id in ranking if row_id in records
+                ]
+            except Exception as e:
+                logger.error(f"Error running keyword search in ChromaDB: {e}")
+                return []
+        try:
+            where_filter = {"source": {"$eq": source_filter}} if source_filter and not self.shard_by_source else None
+            pages = self._map(
+                lambda collection: collection.get(
+                    where=where_filter,
+                    where_document={"$contains": query},
+                    limit=limit,
+                    include=["documents", "metadatas"]
+                ),
+                self._collections(collection_type, source_filter)
+            )
+            return [
+                self._from_chroma(row_id, document, metadata)
+                for results in pages
+                for row_id, document, metadata in zip(results["ids"], results["documents"], results["metadatas"])
+            ][:limit]
+        except Exception as e:
+            logger.error(f"Error running keyword search in ChromaDB: {e}")
+            return []
 
 class SupabaseAdapter(VectorDBAdapter):
     """Supabase adapter for cloud vector storage"""
     
-    def __init__(self, url: str, key: str):
+    native_hybrid_search = True
+    
+    # Serialized size of one embedding value in a JSON payload (e.g. "-0.0123456789,")
+    EMBEDDING_VALUE_BYTES = 20
+    
+    def __init__(self, url: str, key: str, max_batch_bytes: int = 2_000_000, max_batch_rows: int = 500, write_concurrency: int = 4):
         try:
             from supabase import create_client
         except ImportError:
             raise ImportError("Supabase client not installed. Run: uv add supabase")
         
         self.client = create_client(url, key)
+        self.max_batch_bytes = max_batch_bytes
+        self.max_batch_rows = max_batch_rows
+        self.write_concurrency = max(1, write_concurrency)
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        # Cleared when the database predates apply_source_updates
+        self._source_updates_rpc = True
+        # Tables created before the fts column, searched with ilike instead
+        self._tables_without_fts = set()
         logger.info("Supabase adapter initialized")
     
+    @staticmethod
+    def _table(collection_type: str) -> str:
+        return "code_examples" if collection_type == "code" else "crawled_pages"
+    
+    def _get_executor(self) -> concurrent.futures.ThreadPoolExecutor:
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=self.write_concurrency,
+                    thread_name_prefix="supabase-write"
+                )
+            return self._executor
+    
+    def close(self) -> None:
+        """Stop the write pool, waiting for in-flight batches"""
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+    
+    def _estimate_row_bytes(self, row: Dict[str, Any]) -> int:
+        """Approximate the JSON payload size of a row without serializing its embedding"""
+        size = 0
+        for key, value in row.items():
+            if key == "embedding" and value is not None:
+                size += len(value) * self.EMBEDDING_VALUE_BYTES
+            elif isinstance(value, str):
+                size += len(value.encode("utf-8", errors="replace"))
+            else:
+                size += len(json.dumps(value))
+        return size + 16 * len(row)
+    
+    def _split_batches(self, rows: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+        """Split rows into request batches bounded by payload bytes and row count"""
+        batches = []
+        current = []
+        current_bytes = 0
+        for row in rows:
+            row_bytes = self._estimate_row_bytes(row)
+            if current and (current_bytes + row_bytes > self.max_batch_bytes or len(current) >= self.max_batch_rows):
+                batches.append(current)
+                current = []
+                current_bytes = 0
+            current.append(row)
+            current_bytes += row_bytes
+        if current:
+            batches.append(current)
+        return batches
+    
+    def _write_with_retry(self, table_name: str, batch_data: List[Dict[str, Any]], on_conflict: Optional[str] = None) -> int:
+        """
+        Write a batch of rows to a Supabase table with retry logic.
+        
+        Retries the whole batch with exponential backoff, then falls back to writing
+        the records one by one.
+        
+        Args:
+            table_name: Name of the table to write to
+            batch_data: Rows to write
+            on_conflict: Comma-separated unique columns; when given, rows are upserted on them
+        
+        Returns:
+            Number of rows written
+        """
+        def write(rows):
+            query = self.client.table(table_name)
+            if on_conflict:
+                return query.upsert(rows, on_conflict=on_conflict).execute()
+            return query.insert(rows).execute()
+        
+        max_retries = 3
+        retry_delay = 1.0  # Start with 1 second delay
+        
+        for retry in range(max_retries):
+            try:
+                write(batch_data)
+                return len(batch_data)
+            except Exception as e:
+                if retry < max_retries - 1:
+                    logger.warning(f"Error writing batch of {len(batch_data)} rows to {table_name} (attempt {retry + 1}/{max_retries}): {e}. Retrying in {retry_delay} seconds...")
+                    time.sleep(retry_delay)
+                    retry_delay *= 2  # Exponential backoff
+                else:
+                    # Final attempt failed, try writing records one by one as a last resort
+                    logger.error(f"Failed to write batch to {table_name} after {max_retries} attempts: {e}. Writing records individually...")
+                    successful_writes = 0
+                    for record in batch_data:
+                        try:
+                            write(record)
+                            successful_writes += 1
+                        except Exception as individual_error:
+                            logger.error(f"Failed to write individual record for URL {record.get('url')}: {individual_error}")
+                    
+                    if successful_writes > 0:
+                        logger.info(f"Successfully wrote {successful_writes}/{len(batch_data)} records individually")
+                    return successful_writes
+        return 0
+    
+    def _write_rows(self, table_name: str, rows: List[Dict[str, Any]], on_conflict: Optional[str] = None) -> int:
+        """Write rows in byte-sized batches, keeping up to write_concurrency batches in flight"""
+        batches = self._split_batches(rows)
+        if len(batches) <= 1 or self.write_concurrency == 1:
+            return sum(self._write_with_retry(table_name, batch, on_conflict) for batch in batches)
+        
+        executor = self._get_executor()
+        futures = [executor.submit(self._write_with_retry, table_name, batch, on_conflict) for batch in batches]
+        return sum(future.result() for future in futures)
+    
     def store_embeddings(self, documents: List[str], embeddings: List[List[float]], metadata: List[Dict], collection_type: str = "content") -> None:
         """Store documents with embeddings in Supabase"""
         try:
-            # This would implement the original Supabase storage logic
-            # For now, keeping the original implementation structure
-            table_name = "code_examples" if collection_type == "code" else "crawled_pages"
-            
-            # Implementation would go here based on original code
-            logger.info(f"Stored {len(documents)} documents in Supabase {table_name} table")
+            written = self.upsert_rows(rows_from_embeddings(documents, embeddings, metadata, collection_type), collection_type)
+            logger.info(f"Stored {written} documents in Supabase {self._table(collection_type)} table")
         except Exception as e:
             logger.error(f"Error storing embeddings in Supabase: {e}")
             raise
@@ -158,21 +1113,545 @@ class SupabaseAdapter(VectorDBAdapter):
     def search_similar(self, query_embedding: List[float], limit: int = 10, source_filter: Optional[str] = None, collection_type: str = "content") -> List[Dict]:
         """Search for similar documents in Supabase"""
         try:
-            # This would implement the original Supabase search logic
-            # Implementation would go here based on original code
-            return []
+            function_name = "match_code_examples" if collection_type == "code" else "match_crawled_pages"
+            params = {
+                'query_embedding': query_embedding,
+                'match_count': limit
+            }
+            # Only add the filter if it's actually provided
+            if source_filter:
+                params['source_filter'] = source_filter
+            
+            result = self.client.rpc(function_name, params).execute()
+            return result.data or []
         except Exception as e:
             logger.error(f"Error searching Supabase: {e}")
             return []
     
+    def hybrid_search(self, query: str, query_embedding: List[float], limit: int = 10, source_filter: Optional[str] = None, collection_type: str = "content") -> List[Dict]:
+        """Run vector and full-text search in one RPC and fuse them with reciprocal rank fusion
+        
+        Falls back to the client-side merge if the hybrid_search_* functions are not installed.
+        """
+        function_name = "hybrid_search_code_examples" if collection_type == "code" else "hybrid_search_crawled_pages"
+        params = {
+            'query_text': query,
+            'query_embedding': query_embedding,
+            'match_count': limit
+        }
+        if source_filter:
+            params['source_filter'] = source_filter
+        try:
+            result = self.client.rpc(function_name, params).execute()
+            return result.data or []
+        except Exception as e:
+            if _is_missing_function(e):
+                logger.warning(f"{function_name} is missing, falling back to client-side merge; {MIGRATION_HINT}")
+            else:
+                logger.error(f"Error running {function_name} in Supabase, falling back to client-side merge: {e}")
+            return super().hybrid_search(query, query_embedding, limit, source_filter, collection_type)
+    
     def get_sources(self) -> List[str]:
         """Get list of available sources from Supabase"""
+        return [source["source_id"] for source in self.list_sources()]
+    
+    def upsert_rows(self, rows: List[Dict[str, Any]], collection_type: str = "content") -> int:
+        """Upsert rows into Supabase on (url, chunk_number)"""
+        return self._write_rows(self._table(collection_type), rows, on_conflict="url,chunk_number")
+    
+    def get_rows_by_url(self, urls: List[str], collection_type: str = "content") -> List[Dict[str, Any]]:
+        """Get stored rows for the given URLs from Supabase (without content or embeddings)"""
+        rows = []
+        for i in range(0, len(urls), 50):
+            result = self.client.table(self._table(collection_type))\
+                .select("id, url, chunk_number, metadata")\
+                .in_("url", urls[i:i + 50])\
+                .execute()
+            rows.extend(result.data or [])
+        return rows
+    
+    def delete_by_ids(self, ids: List[Any], collection_type: str = "content") -> int:
+        """Delete rows by id from Supabase in batches"""
+        deleted = 0
+        for i in range(0, len(ids), 100):
+            batch_ids = ids[i:i + 100]
+            try:
+                self.client.table(self._table(collection_type)).delete().in_("id", batch_ids).execute()
+                deleted += len(batch_ids)
+            except Exception as e:
+                logger.error(f"Error deleting {len(batch_ids)} rows from {self._table(collection_type)}: {e}")
+        return deleted
+    
+    def delete_by_urls(self, urls: List[str], collection_type: str = "content") -> None:
+        """Delete every row stored for the given URLs from Supabase"""
+        for i in range(0, len(urls), 100):
+            self.client.table(self._table(collection_type)).delete().in_("url", urls[i:i + 100]).execute()
+    
+    def delete_batch(self, collection_type: str = "content", source_id: Optional[str] = None, urls: Optional[List[str]] = None, batch_size: int = 1000) -> int:
+        """Delete up to batch_size rows of a source and/or URLs from Supabase, bounded by their id range"""
+        table_name = self._table(collection_type)
+        
+        def scoped(query):
+            if source_id is not None:
+                query = query.eq("source_id", source_id)
+            if urls is not None:
+                query = query.in_("url", urls)
+            return query
+        
+        result = scoped(self.client.table(table_name).select("id, url, source_id, metadata"))\
+            .order("id")\
+            .limit(batch_size)\
+            .execute()
+        rows = result.data or []
+        if not rows:
+            return 0
+        # The selected rows are exactly the matching rows in [first id, last id], so the delete
+        # only walks one range of the primary key
+        scoped(self.client.table(table_name).delete())\
+            .gte("id", rows[0]["id"])\
+            .lte("id", rows[-1]["id"])\
+            .execute()
+        self.update_sources(_removed_row_deltas(rows, collection_type))
+        return len(rows)
+    
+    def delete_source_record(self, source_id: str) -> None:
+        """Delete a source from the sources table"""
+        self.client.table("sources").delete().eq("source_id", source_id).execute()
+    
+    def update_metadata(self, row_id: Any, metadata: Dict[str, Any], collection_type: str = "content") -> None:
+        """Replace the metadata of a stored row in Supabase"""
+        self.client.table(self._table(collection_type)).update({"metadata": metadata}).eq("id", row_id).execute()
+    
+    def find_code_examples_by_hash(self, code_hashes: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Look up stored code examples by normalized code hash in Supabase"""
+        stored = {}
+        for i in range(0, len(code_hashes), 100):
+            try:
+                result = self.client.table('code_examples')\
+                    .select('id, url, summary, metadata, embedding')\
+                    .in_('metadata->>code_hash', code_hashes[i:i + 100])\
+                    .execute()
+            except Exception as e:
+                logger.error(f"Error looking up stored code examples: {e}")
+                continue
+            for row in result.data or []:
+                # pgvector columns come back from PostgREST as a string like "[0.1,0.2,...]"
+                if isinstance(row.get('embedding'), str):
+                    row['embedding'] = json.loads(row['embedding'])
+                stored.setdefault(row['metadata'].get('code_hash'), row)
+        return stored
+    
+    def update_sources(self, updates: Dict[str, Dict[str, Any]]) -> None:
+        """Bulk-upsert sources with the apply_source_updates function (one round trip)
+        
+        Databases created before the function existed get one upsert per source instead,
+        which keeps summaries and word counts but not chunk or code example counts.
+        """
+        if not updates:
+            return
+        if self._source_updates_rpc:
+            try:
+                self.client.rpc('apply_source_updates', {'updates': updates}).execute()
+                logger.info(f"Updated {len(updates)} sources")
+                return
+            except Exception as e:
+                if not _is_missing_function(e):
+                    raise
+                self._source_updates_rpc = False
+                logger.warning(f"apply_source_updates is missing, updating sources one by one; {MIGRATION_HINT}")
+        self._update_sources_by_row(updates)
+    
+    def _update_sources_by_row(self, updates: Dict[str, Dict[str, Any]]) -> None:
+        """Upsert the summary and word count of each source with the columns of the original schema"""
+        stored = {
+            row['source_id']: row
+            for row in self.client.table('sources')
+                .select('source_id, summary, total_word_count')
+                .in_('source_id', list(updates))
+                .execute().data or []
+        }
+        for source_id, update in updates.items():
+            row = stored.get(source_id, {})
+            self.client.table('sources').upsert({
+                'source_id': source_id,
+                'summary': update.get('summary') or row.get('summary'),
+                'total_word_count': max(0, (row.get('total_word_count') or 0) + update.get('total_word_count', 0))
+            }, on_conflict='source_id').execute()
+        logger.info(f"Updated {len(updates)} sources")
+    
+    def recompute_source_stats(self, source_ids: Optional[List[str]] = None) -> None:
+        """Recompute source counts server-side with the recompute_source_stats function"""
         try:
-            # Implementation would go here based on original code
-            return []
+            self.client.rpc('recompute_source_stats', {'source_ids': source_ids}).execute()
+        except Exception as e:
+            if not _is_missing_function(e):
+                raise
+            logger.warning(f"recompute_source_stats is missing, source counts were not recomputed; {MIGRATION_HINT}")
+    
+    def list_sources(self) -> List[Dict[str, Any]]:
+        """List sources from the Supabase sources table"""
+        try:
+            result = self.client.from_('sources')\
+                .select('*')\
+                .order('source_id')\
+                .execute()
         except Exception as e:
             logger.error(f"Error getting sources from Supabase: {e}")
             return []
+        return [
+            {
+                "source_id": source.get("source_id"),
+                "summary": source.get("summary"),
+                "total_words": source.get("total_word_count"),
+                "chunk_count": source.get("chunk_count"),
+                "code_example_count": source.get("code_example_count"),
+                "created_at": source.get("created_at"),
+                "updated_at": source.get("updated_at")
+            }
+            for source in result.data or []
+        ]
+    
+    def keyword_search(self, query: str, limit: int = 10, source_filter: Optional[str] = None, collection_type: str = "content") -> List[Dict]:
+        """Full-text search Supabase with the GIN-indexed fts column (websearch query syntax)
+        
+        Tables created before the fts column are searched with ilike until the upgrade is run.
+        """
+        table = self._table(collection_type)
+        if collection_type == "code":
+            # fts covers both content and summary
+            columns = 'id, url, chunk_number, content, summary, metadata, source_id'
+        else:
+            columns = 'id, url, chunk_number, content, metadata, source_id'
+        try:
+            keyword_query = self.client.from_(table).select(columns)
+            if table in self._tables_without_fts:
+                if collection_type == "code":
+                    keyword_query = keyword_query.or_(f'content.ilike.%{query}%,summary.ilike.%{query}%')
+                else:
+                    keyword_query = keyword_query.ilike('content', f'%{query}%')
+            else:
+                keyword_query = keyword_query.text_search('fts', query, options={'type': 'websearch', 'config': 'english'})
+            
+            # Apply source filter if provided
+            if source_filter:
+                keyword_query = keyword_query.eq('source_id', source_filter)
+            
+            response = keyword_query.limit(limit).execute()
+            return response.data or []
+        except Exception as e:
+            if _is_missing_column(e) and table not in self._tables_without_fts:
+                logger.warning(f"{table}.fts is missing, keyword search falls back to unindexed ilike; {MIGRATION_HINT}")
+                self._tables_without_fts.add(table)
+                return self.keyword_search(query, limit, source_filter, collection_type)
+            logger.error(f"Error running keyword search in Supabase: {e}")
+            return []
+
+def _encode_vector(values) -> bytes:
+    """Encode a list of floats in pgvector's binary format (dimensions, unused, float4 values)"""
+    values = list(values)
+    return struct.pack(f">HH{len(values)}f", len(values), 0, *values)
+
+def _decode_vector(data: bytes) -> List[float]:
+    """Decode a pgvector binary value into a list of floats"""
+    dimensions = struct.unpack_from(">H", data)[0]
+    return list(struct.unpack_from(f">{dimensions}f", data, 4))
+
+class PostgresAdapter(VectorDBAdapter):
+    """Direct Postgres/pgvector adapter using an asyncpg connection pool
+    
+    Bulk writes use binary COPY into a temporary staging table followed by a single merge, so
+    embeddings travel as 4-byte floats instead of JSON decimal text. Queries run through asyncpg,
+    which prepares each statement once per connection and reuses it. The pool lives on a private
+    event loop thread, so the synchronous adapter methods can be called from any thread.
+    """
+    
+    native_hybrid_search = True
+    
+    # Columns written by upsert_rows, per table
+    COLUMNS = {
+        "crawled_pages": ["url", "chunk_number", "content", "metadata", "source_id", "embedding"],
+        "code_examples": ["url", "chunk_number", "content", "summary", "metadata", "source_id", "embedding"]
+    }
+    COLUMN_TYPES = {
+        "url": "varchar", "chunk_number": "integer", "content": "text", "summary": "text",
+        "metadata": "jsonb", "source_id": "text", "embedding": "vector"
+    }
+    
+    def __init__(self, dsn: str, min_pool_size: int = 2, max_pool_size: int = 10):
+        try:
+            import asyncpg
+        except ImportError:
+            raise ImportError("asyncpg not installed. Run: uv add asyncpg")
+        
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="postgres-adapter", daemon=True)
+        self._thread.start()
+        self.pool = self._run(asyncpg.create_pool(
+            dsn,
+            min_size=min_pool_size,
+            max_size=max_pool_size,
+            init=self._init_connection
+        ))
+        # Cleared when the database predates apply_source_updates
+        self._source_updates_function = True
+        # Tables created before the fts column, searched with ILIKE instead
+        self._tables_without_fts = set()
+        logger.info(f"Postgres adapter initialized with a pool of up to {max_pool_size} connections")
+    
+    def _run(self, coro):
+        """Run a coroutine on the adapter's event loop and wait for its result"""
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+    
+    @staticmethod
+    async def _init_connection(conn) -> None:
+        """Register binary codecs for jsonb and pgvector's vector type on a new connection"""
+        await conn.set_type_codec(
+            "jsonb",
+            schema="pg_catalog",
+            encoder=lambda value: b"\x01" + json.dumps(value).encode("utf-8"),
+            decoder=lambda data: json.loads(data[1:].decode("utf-8")),
+            format="binary"
+        )
+        # pgvector may live outside public (Supabase installs extensions into "extensions")
+        vector_schema = await conn.fetchval(
+            "SELECT n.nspname FROM pg_type t JOIN pg_namespace n ON n.oid = t.typnamespace WHERE t.typname = 'vector'"
+        )
+        if vector_schema:
+            await conn.set_type_codec(
+                "vector", schema=vector_schema, encoder=_encode_vector, decoder=_decode_vector, format="binary"
+            )
+    
+    @staticmethod
+    def _table(collection_type: str) -> str:
+        return "code_examples" if collection_type == "code" else "crawled_pages"
+    
+    @staticmethod
+    def _rows(records) -> List[Dict[str, Any]]:
+        return [dict(record) for record in records]
+    
+    def close(self) -> None:
+        """Close the connection pool and stop the adapter's event loop"""
+        if self._loop.is_running():
+            self._run(self.pool.close())
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+    
+    async def _copy_upsert(self, table_name: str, rows: List[Dict[str, Any]]) -> int:
+        columns = self.COLUMNS[table_name]
+        # One INSERT ... ON CONFLICT cannot touch the same key twice; the last row for a key wins
+        unique_rows = list({(row["url"], row["chunk_number"]): row for row in rows}.values())
+        records = [tuple(row.get(column) for column in columns) for row in unique_rows]
+        updates = ", ".join(f"{column} = EXCLUDED.{column}" for column in columns if column not in ("url", "chunk_number"))
+        column_list = ", ".join(columns)
+        
+        async with self.pool.acquire() as conn:
+            async with conn.transaction():
+                await conn.execute(
+                    f"CREATE TEMP TABLE _staging ({', '.join(f'{c} {self.COLUMN_TYPES[c]}' for c in columns)}) ON COMMIT DROP"
+                )
+                await conn.copy_records_to_table("_staging", records=records, columns=columns)
+                await conn.execute(
+                    f"INSERT INTO {table_name} ({column_list}) SELECT {column_list} FROM _staging "
+                    f"ON CONFLICT (url, chunk_number) DO UPDATE SET {updates}"
+                )
+        return len(unique_rows)
+    
+    def store_embeddings(self, documents: List[str], embeddings: List[List[float]], metadata: List[Dict], collection_type: str = "content") -> None:
+        """Store documents with embeddings in Postgres"""
+        try:
+            written = self.upsert_rows(rows_from_embeddings(documents, embeddings, metadata, collection_type), collection_type)
+            logger.info(f"Stored {written} documents in Postgres {self._table(collection_type)} table")
+        except Exception as e:
+            logger.error(f"Error storing embeddings in Postgres: {e}")
+            raise
+    
+    def search_similar(self, query_embedding: List[float], limit: int = 10, source_filter: Optional[str] = None, collection_type: str = "content") -> List[Dict]:
+        """Search for similar documents with the match_crawled_pages / match_code_examples functions"""
+        function_name = "match_code_examples" if collection_type == "code" else "match_crawled_pages"
+        try:
+            records = self._run(self.pool.fetch(
+                f"SELECT * FROM {function_name}($1, $2, '{{}}'::jsonb, $3)",
+                query_embedding, limit, source_filter
+            ))
+            return self._rows(records)
+        except Exception as e:
+            logger.error(f"Error searching Postgres: {e}")
+            return []
+    
+    def hybrid_search(self, query: str, query_embedding: List[float], limit: int = 10, source_filter: Optional[str] = None, collection_type: str = "content") -> List[Dict]:
+        """Run vector and full-text search in one query fused with reciprocal rank fusion"""
+        function_name = "hybrid_search_code_examples" if collection_type == "code" else "hybrid_search_crawled_pages"
+        try:
+            records = self._run(self.pool.fetch(
+                f"SELECT * FROM {function_name}($1, $2, $3, $4)",
+                query, query_embedding, limit, source_filter
+            ))
+            return self._rows(records)
+        except Exception as e:
+            if _is_missing_function(e):
+                logger.warning(f"{function_name} is missing, falling back to client-side merge; {MIGRATION_HINT}")
+            else:
+                logger.error(f"Error running {function_name} in Postgres, falling back to client-side merge: {e}")
+            return super().hybrid_search(query, query_embedding, limit, source_filter, collection_type)
+    
+    def get_sources(self) -> List[str]:
+        """Get list of available sources from Postgres"""
+        return [source["source_id"] for source in self.list_sources()]
+    
+    def upsert_rows(self, rows: List[Dict[str, Any]], collection_type: str = "content") -> int:
+        """Bulk upsert rows with binary COPY into a staging table and one merge"""
+        if not rows:
+            return 0
+        return self._run(self._copy_upsert(self._table(collection_type), rows))
+    
+    def get_rows_by_url(self, urls: List[str], collection_type: str = "content") -> List[Dict[str, Any]]:
+        """Get stored rows for the given URLs from Postgres (without content or embeddings)"""
+        if not urls:
+            return []
+        return self._rows(self._run(self.pool.fetch(
+            f"SELECT id, url, chunk_number, metadata FROM {self._table(collection_type)} WHERE url = ANY($1::text[])",
+            urls
+        )))
+    
+    def delete_by_ids(self, ids: List[Any], collection_type: str = "content") -> int:
+        """Delete rows by id from Postgres"""
+        if not ids:
+            return 0
+        status = self._run(self.pool.execute(
+            f"DELETE FROM {self._table(collection_type)} WHERE id = ANY($1::bigint[])", ids
+        ))
+        return int(status.split()[-1])
+    
+    def delete_by_urls(self, urls: List[str], collection_type: str = "content") -> None:
+        """Delete every row stored for the given URLs from Postgres"""
+        if urls:
+            self._run(self.pool.execute(
+                f"DELETE FROM {self._table(collection_type)} WHERE url = ANY($1::text[])", urls
+            ))
+    
+    def delete_batch(self, collection_type: str = "content", source_id: Optional[str] = None, urls: Optional[List[str]] = None, batch_size: int = 1000) -> int:
+        """Delete up to batch_size rows of a source and/or URLs from Postgres, lowest ids first"""
+        table_name = self._table(collection_type)
+        removed = self._run(self.pool.fetch(
+            f"WITH doomed AS ("
+            f"  SELECT id FROM {table_name}"
+            f"  WHERE ($1::text IS NULL OR source_id = $1) AND ($2::text[] IS NULL OR url = ANY($2))"
+            f"  ORDER BY id LIMIT $3"
+            f") DELETE FROM {table_name} USING doomed WHERE {table_name}.id = doomed.id "
+            f"RETURNING {table_name}.url, {table_name}.source_id, {table_name}.metadata",
+            source_id, urls, batch_size
+        ))
+        rows = self._rows(removed)
+        self.update_sources(_removed_row_deltas(rows, collection_type))
+        return len(rows)
+    
+    def delete_source_record(self, source_id: str) -> None:
+        """Delete a source from the sources table"""
+        self._run(self.pool.execute("DELETE FROM sources WHERE source_id = $1", source_id))
+    
+    def update_metadata(self, row_id: Any, metadata: Dict[str, Any], collection_type: str = "content") -> None:
+        """Replace the metadata of a stored row in Postgres"""
+        self._run(self.pool.execute(
+            f"UPDATE {self._table(collection_type)} SET metadata = $1 WHERE id = $2", metadata, row_id
+        ))
+    
+    def find_code_examples_by_hash(self, code_hashes: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Look up stored code examples by normalized code hash in Postgres"""
+        if not code_hashes:
+            return {}
+        try:
+            records = self._run(self.pool.fetch(
+                "SELECT id, url, summary, metadata, embedding FROM code_examples "
+                "WHERE metadata->>'code_hash' = ANY($1::text[])",
+                code_hashes
+            ))
+        except Exception as e:
+            logger.error(f"Error looking up stored code examples: {e}")
+            return {}
+        stored = {}
+        for row in self._rows(records):
+            stored.setdefault(row["metadata"].get("code_hash"), row)
+        return stored
+    
+    def update_sources(self, updates: Dict[str, Dict[str, Any]]) -> None:
+        """Bulk-upsert sources with the apply_source_updates function
+        
+        Databases created before the function existed get one upsert per source instead,
+        which keeps summaries and word counts but not chunk or code example counts.
+        """
+        if not updates:
+            return
+        if self._source_updates_function:
+            try:
+                self._run(self.pool.execute("SELECT apply_source_updates($1::jsonb)", updates))
+                return
+            except Exception as e:
+                if not _is_missing_function(e):
+                    raise
+                self._source_updates_function = False
+                logger.warning(f"apply_source_updates is missing, updating sources one by one; {MIGRATION_HINT}")
+        self._run(self.pool.executemany(
+            "INSERT INTO sources (source_id, summary, total_word_count) VALUES ($1, $2, greatest(0, $3)) "
+            "ON CONFLICT (source_id) DO UPDATE SET summary = coalesce(EXCLUDED.summary, sources.summary), "
+            "total_word_count = greatest(0, sources.total_word_count + $3), updated_at = now()",
+            [(source_id, update.get("summary"), update.get("total_word_count", 0)) for source_id, update in updates.items()]
+        ))
+    
+    def recompute_source_stats(self, source_ids: Optional[List[str]] = None) -> None:
+        """Recompute source counts server-side with the recompute_source_stats function"""
+        try:
+            self._run(self.pool.execute("SELECT recompute_source_stats($1::text[])", source_ids))
+        except Exception as e:
+            if not _is_missing_function(e):
+                raise
+            logger.warning(f"recompute_source_stats is missing, source counts were not recomputed; {MIGRATION_HINT}")
+    
+    def list_sources(self) -> List[Dict[str, Any]]:
+        """List sources from the sources table"""
+        try:
+            records = self._run(self.pool.fetch(
+                "SELECT source_id, summary, total_word_count AS total_words, chunk_count, code_example_count, "
+                "created_at::text AS created_at, updated_at::text AS updated_at FROM sources ORDER BY source_id"
+            ))
+            return self._rows(records)
+        except Exception as e:
+            logger.error(f"Error getting sources from Postgres: {e}")
+            return []
+    
+    def keyword_search(self, query: str, limit: int = 10, source_filter: Optional[str] = None, collection_type: str = "content") -> List[Dict]:
+        """Full-text search Postgres with the GIN-indexed fts column, ranked by ts_rank_cd
+        
+        Tables created before the fts column are searched with ILIKE until the upgrade is run.
+        """
+        table = self._table(collection_type)
+        if collection_type == "code":
+            columns = "id, url, chunk_number, content, summary, metadata, source_id"
+            ilike = "(content ILIKE $1 OR summary ILIKE $1)"
+        else:
+            columns = "id, url, chunk_number, content, metadata, source_id"
+            ilike = "content ILIKE $1"
+        try:
+            if table in self._tables_without_fts:
+                records = self._run(self.pool.fetch(
+                    f"SELECT {columns} FROM {table} "
+                    f"WHERE {ilike} AND ($2::text IS NULL OR source_id = $2) LIMIT $3",
+                    f"%{query}%", source_filter, limit
+                ))
+            else:
+                records = self._run(self.pool.fetch(
+                    f"SELECT {columns} FROM {table}, websearch_to_tsquery('english', $1) AS q "
+                    f"WHERE fts @@ q AND ($2::text IS NULL OR source_id = $2) "
+                    f"ORDER BY ts_rank_cd(fts, q) DESC LIMIT $3",
+                    query, source_filter, limit
+                ))
+            return self._rows(records)
+        except Exception as e:
+            if _is_missing_column(e) and table not in self._tables_without_fts:
+                logger.warning(f"{table}.fts is missing, keyword search falls back to unindexed ILIKE; {MIGRATION_HINT}")
+                self._tables_without_fts.add(table)
+                return self.keyword_search(query, limit, source_filter, collection_type)
+            logger.error(f"Error running keyword search in Postgres: {e}")
+            return []
 
 def get_vector_db() -> VectorDBAdapter:
     """Factory function to get the appropriate vector database adapter"""
@@ -180,7 +1659,13 @@ def get_vector_db() -> VectorDBAdapter:
     
     if vector_db_type == "chromadb":
         persist_dir = os.getenv("CHROMA_PERSIST_DIRECTORY", "./data/chroma")
-        return ChromaDBAdapter(persist_dir)
+        return ChromaDBAdapter(
+            persist_dir,
+            write_concurrency=int(os.getenv("CHROMA_WRITE_CONCURRENCY", "1")),
+            shard_by_source=os.getenv("CHROMA_SHARD_BY_SOURCE", "false") == "true",
+            query_concurrency=int(os.getenv("CHROMA_QUERY_CONCURRENCY", "8")),
+            keyword_index=os.getenv("CHROMA_KEYWORD_INDEX", "true") == "true"
+        )
     elif vector_db_type == "supabase":
         supabase_url = os.getenv("SUPABASE_URL")
         supabase_key = os.getenv("SUPABASE_SERVICE_KEY")
@@ -188,6 +1673,31 @@ def get_vector_db() -> VectorDBAdapter:
         if not supabase_url or not supabase_key:
             raise ValueError("SUPABASE_URL and SUPABASE_SERVICE_KEY must be set when using Supabase")
         
-        return SupabaseAdapter(supabase_url, supabase_key)
+        return SupabaseAdapter(
+            supabase_url,
+            supabase_key,
+            max_batch_bytes=int(os.getenv("SUPABASE_MAX_BATCH_BYTES", "2000000")),
+            max_batch_rows=int(os.getenv("SUPABASE_MAX_BATCH_ROWS", "500")),
+            write_concurrency=int(os.getenv("SUPABASE_WRITE_CONCURRENCY", "4"))
+        )
+    elif vector_db_type == "postgres":
+        dsn = os.getenv("POSTGRES_DSN")
+        
+        if not dsn:
+            raise ValueError("POSTGRES_DSN must be set when using Postgres")
+        
+        return PostgresAdapter(
+            dsn,
+            min_pool_size=int(os.getenv("POSTGRES_POOL_MIN_SIZE", "2")),
+            max_pool_size=int(os.getenv("POSTGRES_POOL_MAX_SIZE", "10"))
+        )
+    elif vector_db_type == "local":
+        # Imported here because the local store builds on this module
+        from mmap_vector_store import MmapVectorAdapter
+        
+        return MmapVectorAdapter(
+            os.getenv("LOCAL_VECTOR_DIRECTORY", "./data/vectors"),
+            exact_search_max_rows=int(os.getenv("LOCAL_EXACT_SEARCH_MAX_ROWS", "50000"))
+        )
     else:
         raise ValueError(f"Unsupported vector database type: {vector_db_type}")
@@ -0,0 +1,231 @@
+"""
+Process-wide write-behind buffer for ingestion writes.
+
+Concurrent ingestions (e.g. several agents calling crawl_single_page at once) each produce
+small upsert batches. The buffer accumulates rows from all of them and flushes them to the
+vector database in large batches, when a collection reaches max_rows pending rows or its
+oldest pending row has waited max_delay seconds. Every add() returns a future that resolves
+once the rows are stored, so callers wait on it before reporting success.
+"""
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
+import concurrent.futures
+import logging
+import os
+import threading
+import time
+
+from vector_db_adapter import VectorDBAdapter
+from async_storage import submit_write
+
+logger = logging.getLogger(__name__)
+
+COLLECTION_TYPES = ("content", "code")
+
+
+class WriteBehindBuffer:
+    """Coalesces upserts from concurrent ingestions and flushes them by size or time"""
+
+    def __init__(self, adapter: VectorDBAdapter, max_rows: int = 500, max_delay: float = 0.2, history: int = 100):
+        self.adapter = adapter
+        self.max_rows = max(1, max_rows)
+        self.max_delay = max_delay
+        self._cond = threading.Condition()
+        self._pending: Dict[str, List[Tuple[List[Dict[str, Any]], concurrent.futures.Future]]] = {
+            collection_type: [] for collection_type in COLLECTION_TYPES
+        }
+        self._pending_rows = {collection_type: 0 for collection_type in COLLECTION_TYPES}
+        self._oldest: Dict[str, Optional[float]] = {collection_type: None for collection_type in COLLECTION_TYPES}
+        self._flush_requested = False
+        self._closed = False
+
+        self.flushes = deque(maxlen=history)
+        self.totals = {"flushes": 0, "rows": 0, "requests": 0, "failed_flushes": 0, "partial_flushes": 0, "seconds": 0.0}
+
+        self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+        self._thread.start()
+        logger.info(f"Write-behind buffer started (max {self.max_rows} rows, max delay {max_delay}s)")
+
+    def add(self, rows: List[Dict[str, Any]], collection_type: str = "content") -> concurrent.futures.Future:
+        """
+        Queue rows for upsert and return a future resolved once they are stored.
+
+        Args:
+            rows: Rows to upsert (keyed by url and chunk_number)
+            collection_type: "content" or "code"
+
+        Returns:
+            Future resolving to the number of rows of this call that were stored: all of them,
+            or 0 if the flush carrying them stored only part of its batch (the adapter does not
+            report which rows were dropped)
+        """
+        future = concurrent.futures.Future()
+        if not rows:
+            future.set_result(0)
+            return future
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Write-behind buffer is closed")
+            self._pending[collection_type].append((rows, future))
+            self._pending_rows[collection_type] += len(rows)
+            if self._oldest[collection_type] is None:
+                self._oldest[collection_type] = time.monotonic()
+            self._cond.notify()
+        return future
+
+    def flush(self) -> None:
+        """Flush everything pending now and wait until it is stored."""
+        with self._cond:
+            futures = [future for items in self._pending.values() for _, future in items]
+            self._flush_requested = True
+            self._cond.notify()
+        concurrent.futures.wait(futures)
+
+    def _due(self, now: float) -> List[Tuple[str, str]]:
+        """Return the collections to flush now with the reason. Caller holds the lock."""
+        due = []
+        for collection_type in COLLECTION_TYPES:
+            if not self._pending[collection_type]:
+                continue
+            if self._pending_rows[collection_type] >= self.max_rows:
+                due.append((collection_type, "size"))
+            elif self._flush_requested or self._closed:
+                due.append((collection_type, "explicit"))
+            elif now - self._oldest[collection_type] >= self.max_delay:
+                due.append((collection_type, "time"))
+        return due
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while True:
+                    now = time.monotonic()
+                    due = self._due(now)
+                    if due or self._closed:
+                        break
+                    waits = [
+                        self.max_delay - (now - oldest)
+                        for oldest in self._oldest.values() if oldest is not None
+                    ]
+                    self._cond.wait(timeout=min(waits) if waits else None)
+                if not due:
+                    return
+                batches = []
+                for collection_type, reason in due:
+                    batches.append((collection_type, reason, self._pending[collection_type]))
+                    self._pending[collection_type] = []
+                    self._pending_rows[collection_type] = 0
+                    self._oldest[collection_type] = None
+                self._flush_requested = False
+            for collection_type, reason, items in batches:
+                self._flush(collection_type, reason, items)
+
+    def _flush(self, collection_type: str, reason: str, items: List[Tuple[List[Dict[str, Any]], concurrent.futures.Future]]) -> None:
+        """Write one coalesced batch and resolve the futures of every contributing add()."""
+        # Later writes of the same (url, chunk_number) win; one upsert cannot touch a key twice
+        rows_by_key = {}
+        for rows, _ in items:
+            for row in rows:
+                rows_by_key[(row["url"], row["chunk_number"])] = row
+        rows = list(rows_by_key.values())
+        submitted = sum(len(item_rows) for item_rows, _ in items)
+
+        started = time.perf_counter()
+        written = 0
+        try:
+            written = self.adapter.upsert_rows(rows, collection_type)
+            error = None
+        except Exception as e:
+            error = e
+        seconds = time.perf_counter() - started
+
+        flush = {
+            "collection": collection_type,
+            "reason": reason,
+            "requests": len(items),
+            "rows": len(rows),
+            "duplicates_dropped": submitted - len(rows),
+            "rows_written": written,
+            "seconds": round(seconds, 4),
+            "rows_per_second": round(len(rows) / seconds, 1) if seconds else None,
+            "error": str(error) if error else None
+        }
+        self.flushes.append(flush)
+        self.totals["flushes"] += 1
+        self.totals["rows"] += len(rows)
+        self.totals["requests"] += len(items)
+        self.totals["seconds"] += seconds
+        if error:
+            self.totals["failed_flushes"] += 1
+            logger.error(f"Write-behind flush of {len(rows)} {collection_type} rows failed: {error}")
+        elif written < len(rows):
+            self.totals["partial_flushes"] += 1
+            logger.error(f"Write-behind flush stored only {written} of {len(rows)} {collection_type} rows")
+        else:
+            logger.info(
+                f"Write-behind flush ({reason}): {len(rows)} {collection_type} rows from {len(items)} writers "
+                f"in {seconds:.3f}s"
+            )
+
+        for item_rows, future in items:
+            if error:
+                future.set_exception(error)
+            else:
+                future.set_result(len(item_rows) if written >= len(rows) else 0)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return totals, pending row counts and the most recent flushes."""
+        with self._cond:
+            pending = dict(self._pending_rows)
+        flushes = self.totals["flushes"]
+        return {
+            **self.totals,
+            "average_rows_per_flush": self.totals["rows"] / flushes if flushes else 0.0,
+            "pending_rows": pending,
+            "recent_flushes": list(self.flushes)[-10:]
+        }
+
+    def close(self) -> None:
+        """Flush everything pending and stop the flusher thread."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join()
+
+
+_write_buffer: Optional[WriteBehindBuffer] = None
+_write_buffer_lock = threading.Lock()
+
+
+def get_write_buffer(adapter: VectorDBAdapter) -> Optional[WriteBehindBuffer]:
+    """Return the process-wide write buffer for the adapter, or None unless USE_WRITE_BUFFER is "true"."""
+    global _write_buffer
+    if os.getenv("USE_WRITE_BUFFER", "false") != "true":
+        return None
+    with _write_buffer_lock:
+        if _write_buffer is None or _write_buffer.adapter is not adapter:
+            if _write_buffer is not None:
+                _write_buffer.close()
+            _write_buffer = WriteBehindBuffer(
+                adapter,
+                max_rows=int(os.getenv("WRITE_BUFFER_MAX_ROWS", "500")),
+                max_delay=int(os.getenv("WRITE_BUFFER_MAX_DELAY_MS", "200")) / 1000
+            )
+        return _write_buffer
+
+
+def close_write_buffer() -> None:
+    """Flush and stop the process-wide write buffer if it was started."""
+    global _write_buffer
+    with _write_buffer_lock:
+        if _write_buffer is not None:
+            _write_buffer.close()
+            _write_buffer = None
+
+
+def submit_rows(adapter: VectorDBAdapter, rows: List[Dict[str, Any]], collection_type: str = "content") -> concurrent.futures.Future:
+    """Queue rows on the write buffer, or on the storage write pool when the buffer is disabled."""
+    buffer = get_write_buffer(adapter)
+    if buffer is None:
+        return submit_write(adapter.upsert_rows, rows, collection_type)
+    return buffer.add(rows, collection_type)
@@ -0,0 +1,62 @@
+"""In-memory stand-in for a VectorDBAdapter that records the calls ingestion makes."""
+import copy
+
+
+class RecordingAdapter:
+    """Keeps rows per collection in dicts and records writes and source updates"""
+
+    def __init__(self, rows=None, code_rows=None, fail_reads=False, fail_writes=False, drop_writes=0):
+        self.rows = {row["id"]: row for row in rows or []}
+        self.code_rows = {row["id"]: row for row in code_rows or []}
+        self.fail_reads = fail_reads
+        self.fail_writes = fail_writes
+        # Rows at the end of each upsert that are silently not stored, like a partial batch write
+        self.drop_writes = drop_writes
+        self.calls = []
+        self.next_id = 1000
+
+    def _collection(self, collection_type):
+        return self.code_rows if collection_type == "code" else self.rows
+
+    def get_rows_by_url(self, urls, collection_type="content"):
+        if self.fail_reads:
+            raise RuntimeError("read failed")
+        return [copy.deepcopy(row) for row in self._collection(collection_type).values() if row["url"] in urls]
+
+    def delete_by_ids(self, ids, collection_type="content"):
+        self.calls.append(("delete", sorted(ids)))
+        collection = self._collection(collection_type)
+        return sum(collection.pop(row_id, None) is not None for row_id in ids)
+
+    def upsert_rows(self, rows, collection_type="content"):
+        if self.fail_writes:
+            raise RuntimeError("write failed")
+        self.calls.append(("upsert", len(rows)))
+        collection = self._collection(collection_type)
+        by_key = {(row["url"], row["chunk_number"]): row_id for row_id, row in collection.items()}
+        rows = rows[:max(0, len(rows) - self.drop_writes)]
+        for row in rows:
+            row_id = by_key.get((row["url"], row["chunk_number"]))
+            if row_id is None:
+                row_id = self.next_id
+                self.next_id += 1
+            collection[row_id] = {**copy.deepcopy(row), "id": row_id}
+        return len(rows)
+
+    def find_code_examples_by_hash(self, code_hashes):
+        stored = {}
+        for row in self.code_rows.values():
+            code_hash = row["metadata"].get("code_hash")
+            if code_hash in code_hashes:
+                stored.setdefault(code_hash, copy.deepcopy(row))
+        return stored
+
+    def update_metadata(self, row_id, metadata, collection_type="content"):
+        self.calls.append(("update_metadata", row_id))
+        self._collection(collection_type)[row_id]["metadata"] = metadata
+
+    def update_sources(self, updates):
+        self.calls.append(("update_sources", copy.deepcopy(updates)))
+
+    def recompute_source_stats(self, source_ids=None):
+        self.calls.append(("recompute", source_ids))
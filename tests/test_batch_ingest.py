@@ -0,0 +1,112 @@
+"""Ingestion of finished bulk jobs through the diff-based writers."""
+import json
+import os
+
+import pytest
+
+import batch_ingest
+import utils
+from recording_adapter import RecordingAdapter
+
+URL = "https://docs.example.com/page"
+
+
+@pytest.fixture(autouse=True)
+def offline(monkeypatch):
+    monkeypatch.setenv("USE_WRITE_BUFFER", "false")
+    monkeypatch.setenv("USE_CONTEXTUAL_EMBEDDINGS", "false")
+    embed = lambda texts: [[0.1, 0.2, 0.3] for _ in texts]
+    monkeypatch.setattr(batch_ingest, "create_embeddings_batch", embed)
+    monkeypatch.setattr(utils, "create_embeddings_batch", embed)
+
+
+def write_job(job_dir, chunks, code_examples):
+    """Write the files of a job whose batches finished without any results (all embedded live)"""
+    with open(os.path.join(job_dir, "chunks.jsonl"), "w") as f:
+        f.writelines(json.dumps(chunk) + "\n" for chunk in chunks)
+    with open(os.path.join(job_dir, "code_examples.jsonl"), "w") as f:
+        f.writelines(json.dumps(example) + "\n" for example in code_examples)
+    with open(os.path.join(job_dir, "enrichment.json"), "w") as f:
+        json.dump({
+            "contexts": {},
+            "code_summaries": ["summary"] * len(code_examples),
+            "source_summaries": {"docs.example.com": "Docs"}
+        }, f)
+    return {"embedding_batch_id": None, "counts": {}}
+
+
+def code_example(url, chunk_number, code):
+    return {
+        "url": url,
+        "chunk_number": chunk_number,
+        "code": code,
+        "metadata": {"code_hash": utils.code_example_hash(code), "references": [], "word_count": 1}
+    }
+
+
+def test_retried_ingest_writes_nothing_twice(tmp_path):
+    chunks = [
+        {"url": URL, "chunk_number": n, "content": f"chunk {n}", "metadata": {"word_count": 2}}
+        for n in range(3)
+    ]
+    job = write_job(str(tmp_path), chunks, [code_example(URL, 0, "print(1)")])
+    adapter = RecordingAdapter()
+
+    batch_ingest._ingest(str(tmp_path), None, job, adapter)
+    assert job["counts"]["chunks_stored"] == 3
+    assert job["counts"]["code_examples_stored"] == 1
+    assert ("update_sources", {"docs.example.com": {"chunk_count": 3, "total_word_count": 6}}) in adapter.calls
+
+    adapter.calls.clear()
+    batch_ingest._ingest(str(tmp_path), None, job, adapter)
+    assert job["counts"]["chunks_stored"] == 0
+    assert job["counts"]["chunks_unchanged"] == 3
+    assert job["counts"]["code_examples_unchanged"] == 1
+    assert not any(call[0] == "upsert" for call in adapter.calls)
+    assert not any(
+        call[0] == "update_sources" and any("chunk_count" in delta or "code_example_count" in delta for delta in call[1].values())
+        for call in adapter.calls
+    )
+
+
+def test_code_examples_stored_for_other_pages_only_get_references(tmp_path):
+    other_url = "https://docs.example.com/other"
+    code = "print('shared')"
+    adapter = RecordingAdapter(code_rows=[
+        {"id": 1, "url": other_url, "chunk_number": 0, "metadata": {"code_hash": utils.code_example_hash(code), "references": []}}
+    ])
+    job = write_job(str(tmp_path), [], [code_example(URL, 0, code)])
+
+    batch_ingest._ingest(str(tmp_path), None, job, adapter)
+
+    assert job["counts"]["code_examples_stored"] == 0
+    assert job["counts"]["code_example_references"] == 1
+    assert adapter.code_rows[1]["metadata"]["references"] == [URL]
+
+
+def test_retried_enrichment_reuses_the_downloaded_results(tmp_path):
+    job_dir = tmp_path / "job"
+    job_dir.mkdir()
+    summary = {"choices": [{"message": {"content": "Generated summary"}}]}
+    backend = batch_ingest.LocalBatchBackend(str(tmp_path / "backend"), handler=lambda url, body: summary, background=False)
+    requests_path = str(job_dir / "enrichment_requests.jsonl")
+    with open(requests_path, "w") as f:
+        f.write(json.dumps(batch_ingest._batch_request("source-0", batch_ingest.CHAT_ENDPOINT, {})) + "\n")
+    chunk = {"url": URL, "chunk_number": 0, "content": "chunk", "metadata": {"word_count": 1}}
+    (job_dir / "chunks.jsonl").write_text(json.dumps(chunk) + "\n")
+    (job_dir / "code_examples.jsonl").write_text("")
+    (job_dir / "sources.json").write_text(json.dumps([{"source_id": "docs.example.com"}]))
+    (job_dir / "context_groups.json").write_text("[]")
+    job = {"enrichment_batch_id": backend.submit(requests_path, batch_ingest.CHAT_ENDPOINT), "counts": {}}
+
+    # The embedding batch cannot be submitted on the first attempt
+    submit = backend.submit
+    backend.submit = lambda path, endpoint: (_ for _ in ()).throw(RuntimeError("upload failed"))
+    with pytest.raises(RuntimeError, match="upload failed"):
+        batch_ingest._finish_enrichment(str(job_dir), backend, job)
+
+    backend.submit = submit
+    batch_ingest._finish_enrichment(str(job_dir), backend, job)
+    assert job["status"] == "embedding"
+    with open(job_dir / "enrichment.json") as f:
+        assert json.load(f)["source_summaries"] == {"docs.example.com": "Generated summary"}
@@ -0,0 +1,119 @@
+"""Updates, persistence and recovery of the BM25 keyword index."""
+import os
+
+import pytest
+
+from bm25_index import BM25Index, tokenize
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = BM25Index(str(tmp_path))
+    yield index
+    index.close()
+
+
+def keys(results):
+    return [key for key, _ in results]
+
+
+def test_tokenize_keeps_identifiers_whole():
+    assert tokenize("Call get_rows_by_url() twice") == ["call", "get_rows_by_url", "twice"]
+
+
+def test_search_ranks_by_term_frequency_and_filters_by_source(index):
+    index.add(
+        ["a", "b", "c"],
+        ["python asyncio event loop", "python python python", "rust borrow checker"],
+        ["docs.python.org", "docs.python.org", "doc.rust-lang.org"]
+    )
+
+    assert keys(index.search("python")) == ["b", "a"]
+    assert keys(index.search("python", source_id="doc.rust-lang.org")) == []
+    assert keys(index.search("checker", source_id="doc.rust-lang.org")) == ["c"]
+    assert index.search("python", source_id="unknown.dev") == []
+    assert keys(index.search("python", limit=1)) == ["b"]
+
+
+def test_re_adding_a_key_replaces_its_document(index):
+    index.add(["a"], ["old words"], [None])
+    index.add(["a"], ["new words"], [None])
+
+    assert len(index) == 1
+    assert index.search("old") == []
+    assert keys(index.search("new")) == ["a"]
+
+
+def test_removed_documents_are_not_returned(index):
+    index.add(["a", "b"], ["shared term", "shared term"], [None, None])
+    index.remove(["a", "missing"])
+
+    assert len(index) == 1
+    assert keys(index.search("shared")) == ["b"]
+
+
+def test_checkpoint_compacts_and_reloads(tmp_path):
+    index = BM25Index(str(tmp_path))
+    index.add(["a", "b", "c"], ["alpha beta", "beta gamma", "gamma delta"], ["s1", "s1", "s2"])
+    index.remove(["b"])
+    index.checkpoint()
+    index.add(["d"], ["delta epsilon"], ["s2"])
+    expected = index.search("gamma delta")
+    index.close()
+
+    reloaded = BM25Index(str(tmp_path))
+    try:
+        assert len(reloaded) == 3
+        assert reloaded.search("gamma delta") == expected
+        assert sorted(keys(reloaded.search("delta", source_id="s2"))) == ["c", "d"]
+        assert keys(reloaded.search("beta")) == ["a"]
+    finally:
+        reloaded.close()
+
+
+def test_log_is_replayed_and_a_torn_last_line_ignored(tmp_path):
+    index = BM25Index(str(tmp_path), checkpoint_ops=1000)
+    index.add(["a", "b"], ["first document", "second document"], [None, None])
+    index.remove(["a"])
+    # Simulate a crash: no checkpoint, and a partially written final record
+    index._log.write('{"op": "add", "key": "c", "sour')
+    index._log.flush()
+    index._log.close()
+
+    reloaded = BM25Index(str(tmp_path))
+    try:
+        assert len(reloaded) == 1
+        assert keys(reloaded.search("document")) == ["b"]
+    finally:
+        reloaded.close()
+
+
+def test_adding_after_every_document_was_removed_and_compacted(tmp_path):
+    index = BM25Index(str(tmp_path))
+    index.add(["a", "b"], ["one", "two"], [None, None])
+    index.remove(["a", "b"])
+    index.checkpoint()
+    index.add(["c"], ["three"], [None])
+
+    assert keys(index.search("three")) == ["c"]
+    index.close()
+
+    reloaded = BM25Index(str(tmp_path))
+    try:
+        assert keys(reloaded.search("three")) == ["c"]
+    finally:
+        reloaded.close()
+
+
+def test_clear_removes_the_persisted_index(tmp_path):
+    index = BM25Index(str(tmp_path))
+    index.add(["a"], ["text"], [None])
+    index.checkpoint()
+    index.clear()
+
+    assert len(index) == 0
+    assert not os.path.exists(index.snapshot_path)
+    index.close()
+    reloaded = BM25Index(str(tmp_path))
+    assert len(reloaded) == 0
+    reloaded.close()
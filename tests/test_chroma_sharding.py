@@ -0,0 +1,53 @@
+"""Moving ChromaDB records between the unsharded collections and per-source shards."""
+import pytest
+
+pytest.importorskip("chromadb")
+
+from vector_db_adapter import ChromaDBAdapter
+
+
+def row(url, chunk_number, source_id, embedding):
+    return {
+        "url": url,
+        "chunk_number": chunk_number,
+        "content": f"content of {url}",
+        "metadata": {"word_count": 3},
+        "source_id": source_id,
+        "embedding": embedding
+    }
+
+
+def open_store(directory, shard_by_source):
+    return ChromaDBAdapter(str(directory), shard_by_source=shard_by_source, keyword_index=False)
+
+
+def test_enabling_sharding_moves_existing_records_into_their_shards(tmp_path):
+    store = open_store(tmp_path, shard_by_source=False)
+    store.upsert_rows([
+        row("https://a.dev/x", 0, "a.dev", [1.0, 0.0]),
+        row("https://b.dev/y", 0, "b.dev", [0.0, 1.0])
+    ])
+    store.close()
+
+    sharded = open_store(tmp_path, shard_by_source=True)
+    try:
+        assert sharded.collection.count() == 0
+        assert [r["url"] for r in sharded.search_similar([1.0, 0.0], source_filter="a.dev")] == ["https://a.dev/x"]
+        assert sharded.delete_batch(source_id="b.dev") == 1
+        assert {source["source_id"]: source["chunk_count"] for source in sharded.list_sources()} == {"a.dev": 1, "b.dev": 0}
+    finally:
+        sharded.close()
+
+
+def test_disabling_sharding_merges_the_shards_back(tmp_path):
+    sharded = open_store(tmp_path, shard_by_source=True)
+    sharded.upsert_rows([row("https://a.dev/x", n, "a.dev", [1.0, float(n)]) for n in range(3)])
+    sharded.close()
+
+    store = open_store(tmp_path, shard_by_source=False)
+    try:
+        assert store.collection.count() == 3
+        assert store._shards["content"] == {}
+        assert len(store.search_similar([1.0, 0.0], source_filter="a.dev")) == 3
+    finally:
+        store.close()
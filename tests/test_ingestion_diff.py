@@ -0,0 +1,140 @@
+"""Diff-based ingestion and source count bookkeeping in utils."""
+import pytest
+
+import utils
+from recording_adapter import RecordingAdapter
+
+
+@pytest.fixture(autouse=True)
+def offline(monkeypatch):
+    monkeypatch.setenv("USE_WRITE_BUFFER", "false")
+    monkeypatch.setenv("USE_CONTEXTUAL_EMBEDDINGS", "false")
+    monkeypatch.setattr(utils, "create_embeddings_batch", lambda texts: [[0.1, 0.2, 0.3] for _ in texts])
+
+
+def stored_chunk(row_id, url, chunk_number, content, word_count):
+    return {
+        "id": row_id,
+        "url": url,
+        "chunk_number": chunk_number,
+        "metadata": {"content_hash": utils.chunk_content_hash(content, False), "word_count": word_count}
+    }
+
+
+def ingest(adapter, chunks, summaries=None):
+    urls = [url for url, _, _ in chunks]
+    return utils.add_documents_to_vector_db(
+        adapter,
+        urls,
+        [chunk_number for _, chunk_number, _ in chunks],
+        [content for _, _, content in chunks],
+        [{"word_count": len(content.split())} for _, _, content in chunks],
+        {url: "" for url in urls},
+        source_summaries=summaries
+    )
+
+
+def test_add_source_deltas_counts_words_and_code_examples():
+    deltas = {}
+    utils.add_source_deltas(deltas, [{"url": "https://a.dev/x", "metadata": {"word_count": 5}}], 1)
+    utils.add_source_deltas(deltas, [{"url": "https://a.dev/y", "metadata": {"word_count": 2}}], -1)
+    utils.add_source_deltas(deltas, [{"url": "https://b.dev/z", "source_id": "b"}], 1, "code")
+    assert deltas == {
+        "a.dev": {"chunk_count": 0, "total_word_count": 3},
+        "b": {"code_example_count": 1}
+    }
+
+
+def test_recrawl_writes_only_the_diff_and_applies_deltas_after_the_writes():
+    url = "https://docs.example.com/page"
+    adapter = RecordingAdapter([
+        stored_chunk(1, url, 0, "unchanged text", 2),
+        stored_chunk(2, url, 1, "old text here", 3),
+        stored_chunk(3, url, 2, "gone now", 2)
+    ])
+
+    stats = ingest(adapter, [(url, 0, "unchanged text"), (url, 1, "new text")], {"docs.example.com": "Docs"})
+
+    assert stats == {"upserted": 1, "unchanged": 1, "deleted": 1}
+    assert adapter.calls == [
+        ("update_sources", {"docs.example.com": {"summary": "Docs"}}),
+        ("delete", [3]),
+        ("upsert", 1),
+        # chunk 1 replaced (-3 + 2 words), chunk 2 removed (-1 chunk, -2 words)
+        ("update_sources", {"docs.example.com": {"chunk_count": -1, "total_word_count": -3}})
+    ]
+
+
+def test_unchanged_recrawl_writes_nothing():
+    url = "https://docs.example.com/page"
+    adapter = RecordingAdapter([stored_chunk(1, url, 0, "same", 1)])
+    assert ingest(adapter, [(url, 0, "same")]) == {"upserted": 0, "unchanged": 1, "deleted": 0}
+    assert adapter.calls == [("delete", [])]
+
+
+def test_failed_write_recomputes_counts_instead_of_applying_deltas():
+    url = "https://docs.example.com/page"
+    adapter = RecordingAdapter(fail_writes=True)
+
+    with pytest.raises(RuntimeError, match="write failed"):
+        ingest(adapter, [(url, 0, "some text")])
+
+    assert adapter.calls == [
+        ("update_sources", {"docs.example.com": {}}),
+        ("delete", []),
+        ("recompute", ["docs.example.com"])
+    ]
+
+
+def test_partial_write_recomputes_counts_instead_of_applying_deltas():
+    url = "https://docs.example.com/page"
+    adapter = RecordingAdapter(drop_writes=1)
+
+    stats = ingest(adapter, [(url, 0, "first chunk"), (url, 1, "second chunk")])
+
+    assert stats["upserted"] == 2
+    assert len(adapter.rows) == 1
+    assert adapter.calls == [
+        ("update_sources", {"docs.example.com": {}}),
+        ("delete", []),
+        ("upsert", 2),
+        ("recompute", ["docs.example.com"])
+    ]
+
+
+def test_partial_code_example_write_recomputes_counts():
+    url = "https://docs.example.com/page"
+    adapter = RecordingAdapter(drop_writes=1)
+
+    utils.add_code_examples_to_vector_db(adapter, [url, url], [0, 1], ["print(1)", "print(2)"], ["one", "two"], [{}, {}])
+
+    assert adapter.calls[-1] == ("recompute", ["docs.example.com"])
+    assert not any(call[0] == "update_sources" and call[1].get("docs.example.com") for call in adapter.calls)
+
+
+def test_unreadable_stored_rows_upsert_everything_and_recompute_counts():
+    url = "https://docs.example.com/page"
+    adapter = RecordingAdapter([stored_chunk(1, url, 0, "same", 1)], fail_reads=True)
+
+    stats = ingest(adapter, [(url, 0, "same")])
+
+    assert stats["upserted"] == 1
+    assert ("recompute", ["docs.example.com"]) == adapter.calls[-1]
+    assert not any(call[0] == "update_sources" and any("chunk_count" in delta for delta in call[1].values()) for call in adapter.calls)
+
+
+def test_code_examples_are_diffed_by_code_hash():
+    url = "https://docs.example.com/page"
+    kept = "print('kept')"
+    adapter = RecordingAdapter(code_rows=[
+        {"id": 1, "url": url, "chunk_number": 0, "metadata": {"code_hash": utils.code_example_hash(kept)}},
+        {"id": 2, "url": url, "chunk_number": 1, "metadata": {"code_hash": utils.code_example_hash("print('old')")}}
+    ])
+
+    stats = utils.add_code_examples_to_vector_db(
+        adapter, [url, url], [0, 1], [kept, "print('new')"], ["kept", "new"], [{}, {}]
+    )
+
+    assert stats == {"upserted": 1, "unchanged": 1, "deleted": 1}
+    # One example replaced by another: the count does not move, so no delta is sent
+    assert adapter.calls == [("update_sources", {"docs.example.com": {}}), ("delete", [2]), ("upsert", 1)]
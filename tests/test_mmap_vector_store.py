@@ -0,0 +1,148 @@
+"""Writes, compaction and search of the embedded memory-mapped vector store."""
+import pytest
+
+from mmap_vector_store import MmapVectorAdapter
+
+
+def row(url, chunk_number, embedding, source_id="a.dev", word_count=1, content=None):
+    return {
+        "url": url,
+        "chunk_number": chunk_number,
+        "content": content or f"{url}#{chunk_number}",
+        "metadata": {"word_count": word_count},
+        "source_id": source_id,
+        "embedding": embedding
+    }
+
+
+def search_keys(adapter, embedding, **kwargs):
+    return [(result["url"], result["chunk_number"]) for result in adapter.search_similar(embedding, **kwargs)]
+
+
+def counts(adapter):
+    return {
+        source["source_id"]: (source["chunk_count"], source["total_words"])
+        for source in adapter.list_sources()
+    }
+
+
+@pytest.fixture
+def adapter(tmp_path):
+    return MmapVectorAdapter(str(tmp_path), compact_min_dead_rows=1000)
+
+
+def test_search_returns_the_nearest_rows_first(adapter):
+    adapter.upsert_rows([
+        row("https://a.dev/x", 0, [1.0, 0.0, 0.0]),
+        row("https://a.dev/x", 1, [0.6, 0.8, 0.0]),
+        row("https://b.dev/y", 0, [0.0, 0.0, 1.0], source_id="b.dev")
+    ])
+
+    results = adapter.search_similar([1.0, 0.1, 0.0], limit=2)
+    assert [(r["url"], r["chunk_number"]) for r in results] == [("https://a.dev/x", 0), ("https://a.dev/x", 1)]
+    assert results[0]["similarity"] > results[1]["similarity"]
+    assert search_keys(adapter, [1.0, 0.0, 0.0], source_filter="b.dev") == [("https://b.dev/y", 0)]
+
+
+def test_upsert_replaces_rows_with_the_same_url_and_chunk(adapter):
+    adapter.upsert_rows([row("https://a.dev/x", 0, [1.0, 0.0], word_count=3)])
+    adapter.upsert_rows([
+        row("https://a.dev/x", 0, [0.0, 1.0], word_count=5, content="first"),
+        row("https://a.dev/x", 0, [0.0, 1.0], word_count=5, content="second")
+    ])
+
+    assert [r["content"] for r in adapter.search_similar([0.0, 1.0])] == ["second"]
+    assert counts(adapter) == {"a.dev": (1, 5)}
+
+
+def test_rejects_embeddings_of_another_dimension(adapter):
+    adapter.upsert_rows([row("https://a.dev/x", 0, [1.0, 0.0])])
+
+    with pytest.raises(ValueError):
+        adapter.upsert_rows([row("https://a.dev/x", 1, [1.0, 0.0, 0.0])])
+
+
+def test_deletes_update_search_and_source_counts(adapter):
+    adapter.upsert_rows([row("https://a.dev/x", n, [1.0, float(n)], word_count=2) for n in range(3)])
+    stored = {r["chunk_number"]: r["id"] for r in adapter.get_rows_by_url(["https://a.dev/x"])}
+
+    assert adapter.delete_by_ids([stored[0]]) == 1
+    assert sorted(search_keys(adapter, [1.0, 0.0])) == [("https://a.dev/x", 1), ("https://a.dev/x", 2)]
+    assert counts(adapter) == {"a.dev": (2, 4)}
+
+    adapter.delete_by_urls(["https://a.dev/x"])
+    assert adapter.search_similar([1.0, 0.0]) == []
+    assert adapter.get_sources() == []
+
+
+def test_compact_drops_dead_slots_and_keeps_results(tmp_path, adapter):
+    adapter.upsert_rows([row("https://a.dev/x", n, [1.0, float(n)]) for n in range(4)])
+    adapter.upsert_rows([row("https://a.dev/x", 0, [0.0, 1.0], content="rewritten")])
+    stored = {r["chunk_number"]: r["id"] for r in adapter.get_rows_by_url(["https://a.dev/x"])}
+    adapter.delete_by_ids([stored[3]])
+    before = adapter.search_similar([0.2, 1.0], limit=10)
+    assert adapter._dead_rows("crawled_pages") == 2
+
+    adapter.compact()
+
+    assert adapter._state("crawled_pages")["vector_count"] == 3
+    assert adapter._dead_rows("crawled_pages") == 0
+    after = adapter.search_similar([0.2, 1.0], limit=10)
+    assert [(r["url"], r["chunk_number"], r["content"]) for r in after] == [
+        (r["url"], r["chunk_number"], r["content"]) for r in before
+    ]
+    assert after[0]["content"] == "rewritten"
+
+    reopened = MmapVectorAdapter(str(tmp_path))
+    assert search_keys(reopened, [0.2, 1.0], limit=10) == search_keys(adapter, [0.2, 1.0], limit=10)
+
+
+def test_compacts_automatically_past_the_dead_row_threshold(tmp_path):
+    adapter = MmapVectorAdapter(str(tmp_path), compact_min_dead_rows=2)
+    adapter.upsert_rows([row("https://a.dev/x", n, [1.0, float(n)]) for n in range(3)])
+    adapter.upsert_rows([row("https://a.dev/x", n, [float(n), 1.0]) for n in range(2)])
+
+    assert adapter._state("crawled_pages")["vector_count"] == 3
+    assert search_keys(adapter, [0.0, 1.0], limit=1) == [("https://a.dev/x", 0)]
+
+
+def test_hnsw_search_skips_replaced_rows(tmp_path):
+    pytest.importorskip("hnswlib")
+    adapter = MmapVectorAdapter(str(tmp_path), exact_search_max_rows=0, compact_min_dead_rows=1000)
+    adapter.upsert_rows([row("https://a.dev/x", n, [1.0, n / 10]) for n in range(20)])
+    adapter.upsert_rows([row("https://a.dev/x", 0, [-1.0, 0.0], content="moved")])
+
+    results = adapter.search_similar([1.0, 0.0], limit=3)
+    assert [r["chunk_number"] for r in results] == [1, 2, 3]
+    assert search_keys(adapter, [-1.0, 0.0], limit=1) == [("https://a.dev/x", 0)]
+
+
+def test_hnsw_search_ignores_slots_another_process_has_not_committed_for_this_reader(tmp_path, monkeypatch):
+    pytest.importorskip("hnswlib")
+    writer = MmapVectorAdapter(str(tmp_path), exact_search_max_rows=0)
+    writer.upsert_rows([row("https://a.dev/x", n, [1.0, n / 10]) for n in range(20)])
+    # Saves a graph holding all 20 slots
+    writer.search_similar([1.0, 0.0])
+
+    # A reader whose view of the collection predates the last 10 rows
+    reader = MmapVectorAdapter(str(tmp_path), exact_search_max_rows=0)
+    state = reader._state
+
+    def stale_state(table):
+        current = state(table)
+        return {**current, "vector_count": min(current["vector_count"], 10)}
+
+    monkeypatch.setattr(reader, "_state", stale_state)
+    results = reader.search_similar([1.0, 1.0], limit=3)
+    assert [r["chunk_number"] for r in results] == [9, 8, 7]
+
+
+def test_compact_builds_the_hnsw_graph(tmp_path):
+    pytest.importorskip("hnswlib")
+    adapter = MmapVectorAdapter(str(tmp_path), exact_search_max_rows=0)
+    adapter.upsert_rows([row("https://a.dev/x", n, [1.0, n / 10]) for n in range(5)])
+
+    adapter.compact()
+
+    assert adapter._caches["content"].index is not None
+    assert adapter._caches["content"].index.get_current_count() == 5
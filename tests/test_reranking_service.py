@@ -0,0 +1,56 @@
+"""Batching and score caching of the reranking service."""
+import sys
+import types
+
+import pytest
+
+from reranking_service import RerankingService
+
+
+class FakeCrossEncoder:
+    """Scores a pair by the length of its text and records the size of every predict() call"""
+
+    def __init__(self, model_name, max_length=None, **kwargs):
+        self.max_length = max_length or 512
+        self.calls = []
+
+    def predict(self, pairs, batch_size=32, show_progress_bar=None):
+        self.calls.append(len(pairs))
+        if any(query == "fail" for query, _ in pairs):
+            raise RuntimeError("model failed")
+        return [float(len(text)) for _, text in pairs]
+
+
+@pytest.fixture
+def service(monkeypatch):
+    monkeypatch.setitem(sys.modules, "sentence_transformers", types.SimpleNamespace(CrossEncoder=FakeCrossEncoder))
+    service = RerankingService("fake-model")
+    yield service
+    service.close()
+
+
+def test_groups_are_scored_in_one_model_call(service):
+    scores = service.submit_many([("first", ["a", "bb"]), ("second", ["ccc"]), ("third", [])]).result(timeout=5)
+
+    assert scores == [[1.0, 2.0], [3.0], []]
+    assert service.model.calls == [3]
+
+
+def test_cached_pairs_are_not_scored_again(service):
+    assert service.submit("query", ["a", "bb"]).result(timeout=5) == [1.0, 2.0]
+    assert service.submit_many([("query", ["bb", "dddd"]), ("query", ["a"])]).result(timeout=5) == [[2.0, 4.0], [1.0]]
+
+    assert service.model.calls == [2, 1]
+    assert service.stats()["score_cache"]["hits"] == 2
+
+
+def test_texts_are_clipped_to_the_model_length(service):
+    score = service.submit("query", ["x" * (service.max_chars + 100)]).result(timeout=5)
+
+    assert score == [float(service.max_chars)]
+
+
+def test_model_errors_fail_the_request(service):
+    with pytest.raises(RuntimeError, match="model failed"):
+        service.submit_many([("fail", ["a"]), ("query", ["b"])]).result(timeout=5)
+    assert service.stats()["failed_batches"] == 1
@@ -0,0 +1,128 @@
+"""Flushing and error propagation of the write-behind buffer."""
+import pytest
+
+from write_buffer import WriteBehindBuffer
+
+
+class UpsertRecorder:
+    """Adapter stand-in whose upsert_rows records each batch, or raises when error is set"""
+
+    def __init__(self, error=None):
+        self.error = error
+        self.batches = []
+
+    def upsert_rows(self, rows, collection_type="content"):
+        self.batches.append((collection_type, [(row["url"], row["chunk_number"], row["content"]) for row in rows]))
+        if self.error:
+            raise self.error
+        return len(rows)
+
+
+def rows(url, chunk_numbers, content="text"):
+    return [{"url": url, "chunk_number": n, "content": content} for n in chunk_numbers]
+
+
+@pytest.fixture
+def make_buffer():
+    buffers = []
+
+    def make(adapter, **kwargs):
+        buffer = WriteBehindBuffer(adapter, **kwargs)
+        buffers.append(buffer)
+        return buffer
+
+    yield make
+    for buffer in buffers:
+        buffer.close()
+
+
+def test_flushes_when_max_rows_is_reached(make_buffer):
+    adapter = UpsertRecorder()
+    buffer = make_buffer(adapter, max_rows=4, max_delay=60)
+    first = buffer.add(rows("https://a.dev/x", [0, 1]))
+    second = buffer.add(rows("https://a.dev/y", [0, 1]))
+
+    assert first.result(timeout=5) == 2
+    assert second.result(timeout=5) == 2
+    assert len(adapter.batches) == 1
+    assert len(adapter.batches[0][1]) == 4
+    assert buffer.stats()["recent_flushes"][0]["reason"] == "size"
+
+
+def test_flushes_after_max_delay(make_buffer):
+    adapter = UpsertRecorder()
+    buffer = make_buffer(adapter, max_rows=1000, max_delay=0.05)
+
+    assert buffer.add(rows("https://a.dev/x", [0])).result(timeout=5) == 1
+    assert buffer.stats()["recent_flushes"][0]["reason"] == "time"
+
+
+def test_explicit_flush_writes_each_collection_separately(make_buffer):
+    adapter = UpsertRecorder()
+    buffer = make_buffer(adapter, max_rows=1000, max_delay=60)
+    content = buffer.add(rows("https://a.dev/x", [0]))
+    code = buffer.add(rows("https://a.dev/x", [0]), collection_type="code")
+
+    buffer.flush()
+
+    assert content.done() and code.done()
+    assert sorted(collection for collection, _ in adapter.batches) == ["code", "content"]
+    stats = buffer.stats()
+    assert stats["flushes"] == 2
+    assert stats["pending_rows"] == {"content": 0, "code": 0}
+
+
+def test_later_write_of_the_same_chunk_wins(make_buffer):
+    adapter = UpsertRecorder()
+    buffer = make_buffer(adapter, max_rows=1000, max_delay=60)
+    buffer.add(rows("https://a.dev/x", [0, 1], content="old"))
+    buffer.add(rows("https://a.dev/x", [1], content="new"))
+
+    buffer.flush()
+
+    assert adapter.batches == [("content", [("https://a.dev/x", 0, "old"), ("https://a.dev/x", 1, "new")])]
+    assert buffer.stats()["recent_flushes"][0]["duplicates_dropped"] == 1
+
+
+def test_failed_flush_fails_every_contributing_future(make_buffer):
+    adapter = UpsertRecorder(error=RuntimeError("database unavailable"))
+    buffer = make_buffer(adapter, max_rows=1000, max_delay=60)
+    futures = [buffer.add(rows("https://a.dev/x", [0])), buffer.add(rows("https://a.dev/y", [0]))]
+
+    buffer.flush()
+
+    for future in futures:
+        with pytest.raises(RuntimeError, match="database unavailable"):
+            future.result(timeout=5)
+    stats = buffer.stats()
+    assert stats["failed_flushes"] == 1
+    assert stats["recent_flushes"][0]["error"] == "database unavailable"
+
+
+def test_close_flushes_pending_rows_and_rejects_new_ones():
+    adapter = UpsertRecorder()
+    buffer = WriteBehindBuffer(adapter, max_rows=1000, max_delay=60)
+    future = buffer.add(rows("https://a.dev/x", [0]))
+
+    buffer.close()
+
+    assert future.result(timeout=5) == 1
+    with pytest.raises(RuntimeError):
+        buffer.add(rows("https://a.dev/x", [1]))
+
+
+def test_partial_flush_reports_nothing_stored_for_its_writers(make_buffer):
+    class PartialWriter(UpsertRecorder):
+        def upsert_rows(self, rows, collection_type="content"):
+            super().upsert_rows(rows, collection_type)
+            return len(rows) - 1
+
+    buffer = make_buffer(PartialWriter(), max_rows=1000, max_delay=60)
+    futures = [buffer.add(rows("https://a.dev/x", [0, 1])), buffer.add(rows("https://a.dev/y", [0]))]
+
+    buffer.flush()
+
+    assert [future.result(timeout=5) for future in futures] == [0, 0]
+    stats = buffer.stats()
+    assert stats["partial_flushes"] == 1
+    assert stats["recent_flushes"][0]["rows_written"] == 2